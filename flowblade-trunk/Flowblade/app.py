@@ -52,6 +52,7 @@ import editevent
 import editorpersistance
 import editorstate
 import editorwindow
+import exporting
 import gui
 import keyevents
 import medialog
@@ -63,16 +64,19 @@ import mltprofiles
 import mlttransitions
 import movemodes
 import persistance
+import previewcache
 import positionbar
 import preferenceswindow
 import projectaction
 import projectdata
 import projectinfogui
 import proxyediting
+import proxyrender
 import render
 import renderconsumer
 import respaths
 import resync
+import segmentrender
 import sequence
 import tlinewidgets
 import trimmodes
@@ -89,6 +93,11 @@ instance_autosave_id_str = None
 PID_FILE = "flowbladepidfile"
 BATCH_DIR = "batchrender/"
 autosave_timeout_id = -1
+autosave_thread = None
+autosave_changes_count = -1 # undo.changes_count value when last autosave snapshot was taken
+autosave_snapshot_time = 0.0 # seconds, last autosave time spent in GUI thread
+autosave_write_time = 0.0 # seconds, last autosave time spent in write thread
+autosave_sequence_sections = {} # sequence -> (name, pickled section), for not current sequences
 recovery_dialog_id = -1
 loaded_autosave_file = None
 
@@ -98,6 +107,9 @@ exit_timeout_id = -1
 window_resize_id = -1
 window_state_id = -1
 
+startup_times = [] # (step name, seconds) tuples for startup steps
+startup_step_start_time = 0.0
+
 logger = None
 
 
@@ -106,6 +118,9 @@ def main(root_path):
     Called at application start.
     Initializes application with a default project.
     """
+    global startup_step_start_time
+    startup_step_start_time = time.time()
+
     # Print OS, Python version and GTK+ version
     try:
         os_release_file = open("/etc/os-release","r")
@@ -162,11 +177,13 @@ def main(root_path):
     editorpersistance.create_thumbs_folder_if_needed(user_dir)
     editorpersistance.create_rendered_clips_folder_if_needed(user_dir)
     editorpersistance.save()
+    _mark_startup_time("Preferences")
 
     # Init translations module with translations data
     translations.init_languages()
     translations.load_filters_translations()
     mlttransitions.init_module()
+    _mark_startup_time("Translations")
 
     # RHEL7/CentOS compatibility fix
     if gtk_version == "3.8.8":
@@ -203,15 +220,20 @@ def main(root_path):
     if editorpersistance.prefs.display_splash_screen == True: 
         show_splash_screen()
 
+    _mark_startup_time("GTK init")
+
     # Init MLT framework
     repo = mlt.Factory().init()
+    _mark_startup_time("MLT init")
 
     # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs 
     locale.setlocale(locale.LC_NUMERIC, 'C')
 
     # Check for codecs and formats on the system
     mltenv.check_available_features(repo)
+    _mark_startup_time("MLT environment detection")
     renderconsumer.load_render_profiles()
+    _mark_startup_time("Render profiles")
 
     # Load filter and compositor descriptions from xml files.
     mltfilters.load_filters_xml(mltenv.services)
@@ -219,9 +241,11 @@ def main(root_path):
     
     # Replace some services if better replacements available
     mltfilters.replace_services(mltenv.services)
+    _mark_startup_time("Filters and compositors")
 
     # Create list of available mlt profiles
     mltprofiles.load_profile_list()
+    _mark_startup_time("MLT profiles")
     
     # Launch association file if found in arguments
     launch_file_path = get_assoc_file_path()
@@ -241,6 +265,7 @@ def main(root_path):
         # Set default project as the project being edited.
         editorstate.project = projectdata.get_default_project()
         check_crash = True
+    _mark_startup_time("Project")
 
     # Audiomonitoring being available needs to be known before GUI creation
     audiomonitoring.init(editorstate.project.profile)
@@ -257,11 +282,14 @@ def main(root_path):
     # Inits widgets with current sequence data
     init_sequence_gui()
 
+    _mark_startup_time("GUI")
+
     # Launch player now that data and gui exist
     launch_player()
 
     # Editor and modules need some more initializing
     init_editor_state()
+    _mark_startup_time("Player and editor state")
 
     # Tracks need to be recentered if window is resized.
     # Connect listener for this now that the tline panel size allocation is sure to be available.
@@ -295,12 +323,55 @@ def main(root_path):
     # We prefer to monkeypatch some callbacks into some modules, usually to
     # maintain a simpler and/or non-circular import structure
     monkeypatch_callbacks()
+
+    # Development flag for measuring edit latency with synced clips
+    if "-resyncstresstest" in sys.argv:
+        GLib.idle_add(edit.sync_edit_latency_stress_test)
+
+    # Development flag for measuring project file save and load times
+    if "-projectfilebenchmark" in sys.argv:
+        GLib.idle_add(persistance.project_file_benchmark)
+
+    # Development flag for comparing EDL output and times of segment and frame array cascading
+    if "-edltest" in sys.argv:
+        GLib.idle_add(exporting.edl_engine_test)
+
+    # Development flag for measuring image sequence proxy downscaling speed
+    if "-imgseqproxybenchmark" in sys.argv:
+        GLib.idle_add(proxyrender.img_seq_proxy_benchmark)
+
+    # Development flag for comparing single process and segmented timeline render times
+    if "-segmentrenderbenchmark" in sys.argv:
+        GLib.idle_add(segmentrender.segmented_render_benchmark)
+
+    # Development flag for printing time spent in startup steps
+    if "-startuptimes" in sys.argv:
+        GLib.idle_add(_print_startup_times)
     
     # Launch gtk+ main loop
     Gtk.main()
 
     Gdk.threads_leave()
 
+# ----------------------------------- startup timing
+def _mark_startup_time(step_name):
+    # Records time spent since previous mark for step that just ended
+    global startup_step_start_time
+    now = time.time()
+    startup_times.append((step_name, now - startup_step_start_time))
+    startup_step_start_time = now
+
+def _print_startup_times():
+    # Called in first idle after startup, so last step is time to get main loop running
+    _mark_startup_time("Main loop start")
+    print "Startup times:"
+    total = 0.0
+    for step_name, step_time in startup_times:
+        print "  " + step_name + ": " + str(round(step_time, 3)) + " s"
+        total += step_time
+    print "  Total: " + str(round(total, 3)) + " s"
+    return False
+
 # ----------------------------------- callback setting
 def monkeypatch_callbacks():
     # Prefences setting
@@ -328,6 +399,9 @@ def monkeypatch_callbacks():
     editevent.display_clip_menu_pop_up = clipmenuaction.display_clip_menu
     editevent.compositor_menu_item_activated = clipmenuaction._compositor_menu_item_activated
     
+    # Hidden track displays preview cache clips
+    sequence.get_preview_cache_clips = previewcache.get_cache_clips
+
     # Posionbar in gmic.py doesnot need trimmodes.py dependency and is avoided 
     positionbar.trimmodes_set_no_edit_trim_mode = trimmodes.set_no_edit_trim_mode
     
@@ -506,7 +580,6 @@ def open_project(new_project):
 
     audiomonitoring.close_audio_monitor()
     audiowaveformrenderer.clear_cache()
-    audiowaveform.frames_cache = {}
 
     editorstate.project = new_project
 
@@ -544,6 +617,7 @@ def open_project(new_project):
 
 def change_current_sequence(index):
     stop_autosave()
+    persistance.build_sequence_mlt_if_needed(editorstate.project.sequences[index])
     editorstate.project.c_seq = editorstate.project.sequences[index]
 
     # Inits widgets with current sequence data
@@ -635,8 +709,12 @@ def start_autosave():
 
     print "Autosave started..."
     autosave_timeout_id = GObject.timeout_add(autosave_delay_millis, do_autosave)
-    autosave_file = utils.get_hidden_user_dir_path() + get_instance_autosave_file()
-    persistance.save_project(editorstate.PROJECT(), autosave_file)
+
+    # Project was loaded or changed, save it now.
+    global autosave_changes_count, autosave_sequence_sections
+    autosave_changes_count = -1
+    autosave_sequence_sections = {}
+    do_autosave()
 
 def get_autosave_files():
     autosave_dir = utils.get_hidden_user_dir_path() + AUTOSAVE_DIR
@@ -649,11 +727,76 @@ def stop_autosave():
     GObject.source_remove(autosave_timeout_id)
     autosave_timeout_id = -1
 
+    # Autosave file may be deleted or project replaced after this, so wait for write to complete.
+    if autosave_thread != None:
+        autosave_thread.join()
+
 def do_autosave():
+    """
+    Pickles project in GUI thread and writes it to autosave file in a thread.
+    Nothing is done if project has not changed since last autosave.
+    """
+    global autosave_thread, autosave_changes_count, autosave_snapshot_time
+    if undo.changes_count == autosave_changes_count:
+        return True
+    if autosave_thread != None and autosave_thread.is_alive():
+        return True # Try again next time.
+
+    start = time.time()
+    autosave_changes_count = undo.changes_count
+
+    # Edits are only done on current sequence, so sections written for other
+    # sequences in earlier autosaves can be written again as is.
+    pickled_sequences = {}
+    for seq, name_and_section in autosave_sequence_sections.items():
+        name, section = name_and_section
+        if seq in editorstate.PROJECT().sequences and seq != editorstate.current_sequence() and seq.name == name:
+            pickled_sequences[seq] = section
+    s_proj = persistance.get_p_project(editorstate.PROJECT(), None, pickled_sequences)
+    sections = persistance.get_project_sections(s_proj)
+    autosave_snapshot_time = time.time() - start
+
     autosave_file = utils.get_hidden_user_dir_path() + get_instance_autosave_file()
-    persistance.save_project(editorstate.PROJECT(), autosave_file)
+    autosave_thread = persistance.ProjectWriteThread(sections, autosave_file, _autosave_write_completed)
+    autosave_thread.sequences = list(editorstate.PROJECT().sequences)
+    autosave_thread.sequence_names = [seq.name for seq in autosave_thread.sequences]
+    autosave_thread.current_sequence = editorstate.current_sequence()
+    autosave_thread.start()
     return True
 
+def clear_autosave_sequence_sections():
+    """
+    Makes next autosave pickle all sequences again, called after edits that change
+    sequences other than the current one.
+    """
+    global autosave_sequence_sections
+    # Write in progress would set sections pickled before the edit when it completes.
+    if autosave_thread != None:
+        autosave_thread.join()
+    autosave_sequence_sections = {}
+
+def _autosave_write_completed(write_thread, succeeded):
+    # Called from autosave thread.
+    global autosave_changes_count, autosave_write_time, autosave_sequence_sections
+    autosave_write_time = write_thread.write_time
+    if succeeded == False:
+        autosave_changes_count = -1 # save again on next autosave
+        return
+
+    sequence_sections = {}
+    for i in range(0, len(write_thread.sequences)):
+        seq = write_thread.sequences[i]
+        if seq != write_thread.current_sequence:
+            sequence_sections[seq] = (write_thread.sequence_names[i], write_thread.sections[i + 1]) # section 0 is project
+    autosave_sequence_sections = sequence_sections
+    print "Autosave: snapshot %.3f s, write %.3f s" % (autosave_snapshot_time, autosave_write_time)
+
+def get_autosave_times():
+    """
+    Returns (snapshot time, write time) in seconds for last autosave, used for tuning autosave interval.
+    """
+    return (autosave_snapshot_time, autosave_write_time)
+
 # ------------------------------------------------- splash screen
 def show_splash_screen():
     global splash_screen
@@ -765,6 +908,9 @@ def _shutdown_dialog_callback(dialog, response_id):
     # No more auto saving
     stop_autosave()
 
+    # Stop preview cache render process
+    previewcache.shutdown()
+
     # Save window dimensions on exit
     alloc = gui.editor_window.window.get_allocation()
     x, y, w, h = alloc.x, alloc.y, alloc.width, alloc.height 
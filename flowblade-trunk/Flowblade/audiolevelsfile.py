@@ -0,0 +1,281 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module handles reading and writing audio levels cache files.
+
+File layout is a fixed size header followed by one quantized level value per media frame
+and a min/max peaks pyramid used when drawing zoomed out timeline:
+
+    4 bytes  magic "FBAL"
+    1 byte   format version
+    1 byte   bits per level, 8 or 16
+    1 byte   number of pyramid levels
+    1 byte   padding
+    4 bytes  frame count, unsigned little endian
+    frame count * (bits / 8) bytes of unsigned little endian levels, 0 == 0.0, max value == 1.0
+    for each bucket size in PYRAMID_BUCKET_SIZES: ceil(frame count / bucket size) min, max value pairs
+
+Files are read memory mapped so that opening a levels file for a long media file does
+not create a Python float for every frame. Files written with earlier versions
+containing a pickled list of floats or no pyramid are converted to current format when read.
+"""
+
+import array
+import mmap
+import os
+import pickle
+import struct
+import sys
+
+FORMAT_MAGIC = "FBAL"
+FORMAT_VERSION = 2
+
+BITS_8 = 8
+BITS_16 = 16
+
+PYRAMID_BUCKET_SIZES = (4, 16, 64, 256) # frames per bucket, each level is built from the previous one
+
+_HEADER = struct.Struct("<4sBBBxI")
+HEADER_SIZE = _HEADER.size
+
+_LEVEL_8 = struct.Struct("<B")
+_LEVEL_16 = struct.Struct("<H")
+
+_ARRAY_TYPECODES = {BITS_8:"B", BITS_16:"H"}
+_MAX_VALUES = {BITS_8:255, BITS_16:65535}
+
+
+# --------------------------------------------------- interface
+def write_levels(file_path, frame_levels, bits=BITS_16):
+    """
+    Writes list of float frame levels in range 0.0 - 1.0 to file.
+    Data is written to a temp file first and renamed so readers never see partial files.
+    """
+    max_value = _MAX_VALUES[bits]
+    quantized = array.array(_ARRAY_TYPECODES[bits])
+    for level in frame_levels:
+        if level == None or level < 0.0:
+            level = 0.0
+        elif level > 1.0:
+            level = 1.0
+        quantized.append(int(level * max_value + 0.5))
+    pyramid = _get_pyramid(quantized, bits)
+    if sys.byteorder != "little":
+        quantized.byteswap()
+        pyramid.byteswap()
+
+    temp_path = file_path + ".tmp" + str(os.getpid())
+    write_file = open(temp_path, "wb")
+    write_file.write(_HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, bits, len(PYRAMID_BUCKET_SIZES), len(quantized)))
+    write_file.write(quantized.tostring())
+    write_file.write(pyramid.tostring())
+    write_file.close()
+    os.rename(temp_path, file_path)
+
+def read_levels(file_path):
+    """
+    Returns LevelsData object for levels file, or None if file is not a readable levels file.
+    Pickled levels files are converted to current format.
+    """
+    try:
+        levels_data = _open_levels_file(file_path)
+    except (IOError, OSError, ValueError, struct.error):
+        return None
+
+    if levels_data != None:
+        return levels_data
+
+    # Not a levels file in current format, try to migrate pickled list or levels file without pyramid.
+    try:
+        frame_levels = _read_old_levels(file_path)
+        write_levels(file_path, frame_levels)
+        print "audio levels file converted to current format:", file_path
+        return _open_levels_file(file_path)
+    except Exception:
+        return None
+
+
+# --------------------------------------------------- writing
+def _get_pyramid(quantized, bits):
+    # Returns array with interleaved min, max pairs for all pyramid levels.
+    pyramid = array.array(_ARRAY_TYPECODES[bits])
+    prev_bucket_size = 1
+    prev_mins = quantized
+    prev_maxs = quantized
+    for bucket_size in PYRAMID_BUCKET_SIZES:
+        group = bucket_size / prev_bucket_size
+        mins = []
+        maxs = []
+        for i in range(0, len(prev_mins), group):
+            mins.append(min(prev_mins[i:i + group]))
+            maxs.append(max(prev_maxs[i:i + group]))
+        for i in range(0, len(mins)):
+            pyramid.append(mins[i])
+            pyramid.append(maxs[i])
+        prev_bucket_size = bucket_size
+        prev_mins = mins
+        prev_maxs = maxs
+    return pyramid
+
+
+# --------------------------------------------------- reading
+def _open_levels_file(file_path):
+    # Returns None if file is not in current format.
+    f = open(file_path, "rb")
+    try:
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[0:4] != FORMAT_MAGIC:
+            return None
+
+        magic, version, bits, pyramid_levels, frame_count = _HEADER.unpack(header)
+        if version > FORMAT_VERSION or not(bits in _MAX_VALUES):
+            raise ValueError("unsupported audio levels file version or bit depth")
+        if version < FORMAT_VERSION:
+            return None
+
+        if frame_count == 0:
+            return LevelsData(header, bits, 0)
+
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(data) < _get_file_size(bits, frame_count):
+            data.close()
+            raise ValueError("truncated audio levels file")
+    finally:
+        f.close()
+
+    return LevelsData(data, bits, frame_count)
+
+def _read_old_levels(file_path):
+    # Returns list of float levels from pickled levels file or levels file with earlier format version.
+    f = open(file_path, "rb")
+    header = f.read(HEADER_SIZE)
+    if header[0:4] != FORMAT_MAGIC:
+        f.seek(0)
+        frame_levels = pickle.load(f)
+        f.close()
+        return frame_levels
+
+    magic, version, bits, pyramid_levels, frame_count = _HEADER.unpack(header)
+    quantized = array.array(_ARRAY_TYPECODES[bits])
+    quantized.fromstring(f.read(frame_count * (bits / 8)))
+    f.close()
+    if sys.byteorder != "little":
+        quantized.byteswap()
+    max_value = float(_MAX_VALUES[bits])
+    return [value / max_value for value in quantized]
+
+def _get_bucket_count(frame_count, bucket_size):
+    return (frame_count + bucket_size - 1) / bucket_size
+
+def _get_file_size(bits, frame_count):
+    values_count = frame_count
+    for bucket_size in PYRAMID_BUCKET_SIZES:
+        values_count += 2 * _get_bucket_count(frame_count, bucket_size)
+    return HEADER_SIZE + values_count * (bits / 8)
+
+
+class LevelsData:
+    """
+    Read-only sequence of float frame levels backed by memory mapped levels file data.
+    """
+    def __init__(self, data, bits, frame_count):
+        self.data = data
+        self.bits = bits
+        self.frame_count = frame_count
+        self.released = False
+
+        # Create peaks objects for frame levels and all pyramid levels.
+        value_size = bits / 8
+        self.peaks_levels = [PeaksLevel(data, bits, HEADER_SIZE, value_size, frame_count, 1)]
+        offset = HEADER_SIZE + frame_count * value_size
+        for bucket_size in PYRAMID_BUCKET_SIZES:
+            bucket_count = _get_bucket_count(frame_count, bucket_size)
+            self.peaks_levels.append(PeaksLevel(data, bits, offset, 2 * value_size, bucket_count, bucket_size))
+            offset += bucket_count * 2 * value_size
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, frame):
+        if frame < 0:
+            frame += self.frame_count
+        if frame < 0 or frame >= self.frame_count:
+            raise IndexError("levels frame index out of range")
+
+        return self.peaks_levels[0].get_max(frame)
+
+    def __iter__(self):
+        for frame in range(0, self.frame_count):
+            yield self[frame]
+
+    def get_size(self):
+        return len(self.data)
+
+    def release(self):
+        """
+        Closes memory map, data must be read again from file after this.
+        """
+        if self.frame_count > 0:
+            self.data.close()
+        self.released = True
+
+    def get_peaks_level(self, frames_per_pixel):
+        """
+        Returns PeaksLevel with largest bucket size not larger then frames_per_pixel,
+        so that drawing it creates from one to four buckets per pixel.
+        """
+        peaks_level = self.peaks_levels[0]
+        for level in self.peaks_levels:
+            if level.bucket_size > frames_per_pixel:
+                break
+            peaks_level = level
+        return peaks_level
+
+
+class PeaksLevel:
+    """
+    Min and max levels for consecutive buckets of bucket_size frames.
+    Frame levels are level with bucket size 1 and have same min and max values.
+    """
+    def __init__(self, data, bits, offset, stride, bucket_count, bucket_size):
+        self.data = data
+        self.offset = offset
+        self.stride = stride
+        self.bucket_count = bucket_count
+        self.bucket_size = bucket_size
+        self.max_value = float(_MAX_VALUES[bits])
+        if bits == BITS_8:
+            self.value_struct = _LEVEL_8
+        else:
+            self.value_struct = _LEVEL_16
+        if bucket_size == 1:
+            self.max_offset = 0 # frame levels have single value per bucket
+        else:
+            self.max_offset = stride / 2
+
+    def __len__(self):
+        return self.bucket_count
+
+    def get_min(self, bucket):
+        return self.value_struct.unpack_from(self.data, self.offset + bucket * self.stride)[0] / self.max_value
+
+    def get_max(self, bucket):
+        return self.value_struct.unpack_from(self.data, self.offset + bucket * self.stride + self.max_offset)[0] / self.max_value
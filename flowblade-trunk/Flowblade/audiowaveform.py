@@ -26,7 +26,6 @@ import math
 import md5
 import mlt
 import os
-import pickle
 import struct
 import threading
 import time
@@ -34,6 +33,8 @@ import time
 from gi.repository import Gtk, Gdk
 
 import appconsts
+import audiolevelsfile
+import audiowaveformrenderer
 import dialogutils
 from editorstate import PROJECT
 import gui
@@ -41,10 +42,6 @@ import guiutils
 import updater
 import utils
 
-# Frame level value cache for audio levels
-# path -> list of frame levels
-frames_cache = {}
-
 waveform_thread = None
 
 LEFT_CHANNEL = "_audio_level.0"
@@ -54,19 +51,18 @@ RIGHT_CHANNEL = "_audio_level.1"
 def set_waveform_displayer_clip_from_popup(data):
     clip, track, item_id, item_data = data
 
-    global frames_cache
-    if clip.path in frames_cache:
-        frame_levels = frames_cache[clip.path]
+    frame_levels = audiowaveformrenderer.get_cached_levels(clip.path)
+    if frame_levels != None:
         clip.waveform_data = frame_levels
         return
 
     cache_file_path = utils.get_hidden_user_dir_path() + appconsts.AUDIO_LEVELS_DIR + _get_unique_name_for_media(clip.path)
     if os.path.isfile(cache_file_path):
-        f = open(cache_file_path)
-        frame_levels = pickle.load(f)
-        frames_cache[clip.path] = frame_levels
-        clip.waveform_data = frame_levels
-        return
+        frame_levels = audiolevelsfile.read_levels(cache_file_path)
+        if frame_levels != None:
+            audiowaveformrenderer.cache_levels(clip.path, frame_levels)
+            clip.waveform_data = frame_levels
+            return
 
     progress_bar = Gtk.ProgressBar()
     title = _("Audio Levels Data Render")
@@ -113,9 +109,7 @@ class WaveformCreator(threading.Thread):
         self.dialog = dialog
         
     def run(self):
-        global frames_cache
-        frame_levels = [None] * self.clip_media_length 
-        frames_cache[self.clip.path] = frame_levels
+        frame_levels = [0.0] * self.clip_media_length 
 
         Gdk.threads_enter()
         self.dialog.progress_bar.set_fraction(0.0)
@@ -125,39 +119,21 @@ class WaveformCreator(threading.Thread):
         Gdk.threads_leave()
         time.sleep(0.2)
 
-        for frame in range(0, len(frame_levels)):
-            if self.abort:
-                break
-            self.temp_clip.seek(frame)
-            mlt.frame_get_waveform(self.temp_clip.get_frame(), 10, 50)
-            val = self.levels.get(RIGHT_CHANNEL)
-            if val == None:
-                val = 0.0
-            frame_levels[frame] = float(val)
-            self.last_rendered_frame = frame
-            if frame % 500 == 0:
-                render_fraction = float(self.last_rendered_frame) / float(self.clip_media_length)
-                Gdk.threads_enter()
-                self.dialog.progress_bar.set_fraction(render_fraction)
-                pros = int(render_fraction * 100)
-                self.dialog.progress_bar.set_text(str(pros) + "%")
-                while(Gtk.events_pending()):
-                    Gtk.main_iteration()
-                Gdk.threads_leave()
-                time.sleep(0.1)
+        audiowaveformrenderer.stream_frame_levels(self.temp_clip, self.levels, frame_levels, 
+                                                  self._batch_done, self._render_aborted)
 
         if not self.abort:
-            self.clip.waveform_data = frame_levels
-            write_file = file(self.file_cache_path, "wb")
-            pickle.dump(frame_levels, write_file)
+            audiolevelsfile.write_levels(self.file_cache_path, frame_levels)
+            # Use levels data read from file for drawing, it has peaks pyramid for zoomed out display
+            levels_data = audiolevelsfile.read_levels(self.file_cache_path)
 
             Gdk.threads_enter()
+            if levels_data != None:
+                audiowaveformrenderer.cache_levels(self.clip.path, levels_data)
+            self.clip.waveform_data = levels_data
             self.dialog.progress_bar.set_fraction(1.0)
             self.dialog.progress_bar.set_text(_("Saving to Hard Drive"))
             Gdk.threads_leave()
-        
-        else:
-            frames_cache.pop(self.clip.path, None)
 
         updater.repaint_tline()
 
@@ -167,17 +143,26 @@ class WaveformCreator(threading.Thread):
         
         _waveform_render_stop(self.dialog, None)
 
+    def _batch_done(self, rendered_frames):
+        self.last_rendered_frame = rendered_frames - 1
+        render_fraction = float(rendered_frames) / float(self.clip_media_length)
+        Gdk.threads_enter()
+        self.dialog.progress_bar.set_fraction(render_fraction)
+        pros = int(render_fraction * 100)
+        self.dialog.progress_bar.set_text(str(pros) + "%")
+        while(Gtk.events_pending()):
+            Gtk.main_iteration()
+        Gdk.threads_leave()
+
+    def _render_aborted(self):
+        return self.abort
+
     def _get_temp_producer(self, clip):
         service = clip.get("mlt_service")
         if service.startswith("xml"):
             service = "xml-nogl"
         temp_producer = mlt.Producer(PROJECT().profile, service.encode('utf-8'), clip.get("resource"))
-        channels = mlt.Filter(PROJECT().profile, "audiochannels")
-        converter = mlt.Filter(PROJECT().profile, "audioconvert")
-        self.levels = mlt.Filter(PROJECT().profile, "audiolevel")
-        temp_producer.attach(channels)
-        temp_producer.attach(converter)
-        temp_producer.attach(self.levels)
+        self.levels = audiowaveformrenderer.attach_levels_filters(temp_producer, PROJECT().profile)
         temp_producer.path = clip.path
         return temp_producer
 
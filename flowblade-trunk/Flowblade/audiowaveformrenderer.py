@@ -22,20 +22,23 @@
 Modules handles creating and caching audio waveform images for clips.
 """
 
+import collections
 import locale
 import math
 import md5
 import mlt
+import multiprocessing
 import os
-import pickle
 import struct
 import subprocess
 import sys
 import threading
+import time
 
 from gi.repository import Gtk, Gdk
 
 import appconsts
+import audiolevelsfile
 import editorpersistance
 import editorstate
 import mltenv
@@ -52,40 +55,119 @@ LEFT_CHANNEL = "_audio_level.0"
 RIGHT_CHANNEL = "_audio_level.1"
 
 FILE_SEPARATOR = "#&#file:"
+FILE_DONE_TAG = "#&#done:" # render process writes this + file path to stdout when levels file for media is ready
+BENCHMARK_ARG = "--benchmark"
+
+LEVELS_BATCH_SIZE = 500 # frames decoded between progress callbacks and abort checks
 
-_waveforms = {} # Memory cache for waveform data
 _queued_waveform_renders = [] # Media queued for render during one timeline repaint
 _render_already_requested = [] # Files that have been sent to rendering since last project load
 
 
 # ------------------------------------------------- waveform cache
+class LevelsCache:
+    """
+    Memory cache for audio levels data with a byte budget and least recently used eviction.
+    
+    Keys are (media path, profile description) tuples. Evicted levels data objects are released
+    so that clips holding a reference to them know to get their data again.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.items = collections.OrderedDict() # oldest first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            try:
+                levels_data = self.items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.items[key] = levels_data # re-inserted as most recently used
+            self.hits += 1
+            return levels_data
+
+    def put(self, key, levels_data):
+        with self.lock:
+            old_data = self.items.pop(key, None)
+            if old_data != None:
+                self.used_bytes -= old_data.get_size()
+                if old_data is not levels_data:
+                    old_data.release()
+            self.items[key] = levels_data
+            self.used_bytes += levels_data.get_size()
+            self._evict()
+
+    def set_max_bytes(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        # Always keeps the most recently used item even if it alone exceeds budget.
+        while self.used_bytes > self.max_bytes and len(self.items) > 1:
+            key, levels_data = self.items.popitem(last=False)
+            self.used_bytes -= levels_data.get_size()
+            levels_data.release()
+            self.evictions += 1
+
+    def get_stats(self):
+        return (self.hits, self.misses, self.evictions, len(self.items), self.used_bytes, self.max_bytes)
+
+
+_levels_cache = LevelsCache(editorpersistance.AUDIO_LEVELS_CACHE_DEFAULT * 1024 * 1024)
+
+
 def clear_cache():
-    global _waveforms, _queued_waveform_renders, _render_already_requested
+    # Levels cache is not cleared when project changes, it is bounded and keyed by profile.
+    global _queued_waveform_renders, _render_already_requested
 
-    _waveforms = {}
+    _levels_cache.set_max_bytes(editorpersistance.prefs.audio_levels_cache_size * 1024 * 1024)
     _queued_waveform_renders = []
     _render_already_requested = []
 
+def get_cache_stats():
+    """
+    Returns tuple (hits, misses, evictions, items count, used bytes, max bytes) for levels memory cache.
+    """
+    return _levels_cache.get_stats()
+
+def get_cache_stats_str():
+    hits, misses, evictions, items_count, used_bytes, max_bytes = get_cache_stats()
+    return "audio levels cache: hits " + str(hits) + ", misses " + str(misses) + ", evictions " + str(evictions) \
+           + ", items " + str(items_count) + ", " + str(used_bytes / 1024) + "/" + str(max_bytes / 1024) + " kB"
+
+def get_cached_levels(media_path):
+    return _levels_cache.get(_get_cache_key(media_path))
+
+def cache_levels(media_path, levels_data):
+    _levels_cache.put(_get_cache_key(media_path), levels_data)
+
 def get_waveform_data(clip):
     # Return from memory if present
-    global _waveforms
-    try:
-        waveform = _waveforms[clip.path]
+    waveform = get_cached_levels(clip.path)
+    if waveform != None:
         return waveform
-    except:
-        pass
         
     # Load from disk if found, otherwise queue for levels render
     levels_file_path = _get_levels_file_path(clip.path, editorstate.PROJECT().profile)
     if os.path.isfile(levels_file_path):
-        f = open(levels_file_path)
-        waveform = pickle.load(f)
-        _waveforms[clip.path] = waveform
-        return waveform
-    else:
-        global _queued_waveform_renders
-        _queued_waveform_renders.append(clip.path)
-        return None
+        waveform = audiolevelsfile.read_levels(levels_file_path)
+        if waveform != None:
+            cache_levels(clip.path, waveform)
+            return waveform
+        # Unreadable levels file, remove it so that levels get rendered again
+        print "removing unreadable audio levels file", levels_file_path
+        os.remove(levels_file_path)
+
+    global _queued_waveform_renders
+    _queued_waveform_renders.append(clip.path)
+    return None
     
 # ------------------------------------------------- launching render
 def render_queued():
@@ -123,10 +205,68 @@ def launch_audio_levels_rendering(file_names):
     single_render_launch_thread = AudioRenderLaunchThread(rendered_media, profile_desc)
     single_render_launch_thread.start()
 
+def _get_cache_key(media_file_path):
+    return (media_file_path, editorstate.PROJECT().profile_desc)
+
 def _get_levels_file_path(media_file_path, profile):
     return utils.get_hidden_user_dir_path() + appconsts.AUDIO_LEVELS_DIR + utils.get_unique_name_for_audio_levels_file(media_file_path, profile)
  
 
+# ------------------------------------------------- levels extraction
+def attach_levels_filters(producer, profile, audio_only=True):
+    """
+    Attaches filters needed to get audio levels to producer and returns the levels filter.
+    If audio_only is True video decoding is turned off for producers that support it.
+    """
+    if audio_only:
+        producer.set("video_index", "-1")
+    channels = mlt.Filter(profile, "audiochannels")
+    converter = mlt.Filter(profile, "audioconvert")
+    levels = mlt.Filter(profile, "audiolevel")
+    producer.attach(channels)
+    producer.attach(converter)
+    producer.attach(levels)
+    return levels
+
+def stream_frame_levels(producer, levels, frame_levels, batch_done_callback=None, stop_check=None):
+    """
+    Fills frame_levels list with audio levels of producer frames by decoding media
+    linearly from start to end without seeking between frames.
+
+    batch_done_callback is called with count of rendered frames after every batch of frames
+    and stop_check is called before every batch, returning True ends rendering.
+    """
+    length = len(frame_levels)
+    producer.seek(0)
+    producer.set_speed(1) # producer advances one frame per get_frame() call
+    for batch_start in range(0, length, LEVELS_BATCH_SIZE):
+        if stop_check != None and stop_check() == True:
+            break
+        batch_end = min(batch_start + LEVELS_BATCH_SIZE, length)
+        for frame in range(batch_start, batch_end):
+            mlt.frame_get_waveform(producer.get_frame(), 10, 50)
+            val = levels.get(RIGHT_CHANNEL)
+            if val == None:
+                val = 0.0
+            frame_levels[frame] = float(val)
+        if batch_done_callback != None:
+            batch_done_callback(batch_end)
+    producer.set_speed(0)
+
+def seek_frame_levels(producer, levels, frame_levels):
+    """
+    Fills frame_levels list by seeking producer to each frame separately.
+    This is the old way to get levels and it is kept here for benchmarking.
+    """
+    for frame in range(0, len(frame_levels)):
+        producer.seek(frame)
+        mlt.frame_get_waveform(producer.get_frame(), 10, 50)
+        val = levels.get(RIGHT_CHANNEL)
+        if val == None:
+            val = 0.0
+        frame_levels[frame] = float(val)
+
+
 class AudioRenderLaunchThread(threading.Thread):
     def __init__(self, rendered_media, profile_desc):
         threading.Thread.__init__(self)
@@ -134,53 +274,81 @@ class AudioRenderLaunchThread(threading.Thread):
         self.profile_desc = profile_desc
 
     def run(self):      
-        # Launch render process and wait for it to end
+        # Launch render process and wait for it to end, render process reports
+        # each completed levels file on stdout so that we can repaint as files become available.
         FLOG = open(utils.get_hidden_user_dir_path() + "log_audio_levels_render", 'w')
         process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeaudiorender", \
                   self.rendered_media, self.profile_desc, respaths.ROOT_PATH], \
-                  stdin=FLOG, stdout=FLOG, stderr=FLOG)
+                  stdin=FLOG, stdout=subprocess.PIPE, stderr=FLOG)
+
+        for line in iter(process.stdout.readline, ""):
+            if line.startswith(FILE_DONE_TAG):
+                Gdk.threads_enter()
+                updater.repaint_tline()
+                Gdk.threads_leave()
+            else:
+                FLOG.write(line)
+                
         process.wait()
+        FLOG.close()
         
         Gdk.threads_enter()
         updater.repaint_tline()
         Gdk.threads_leave()
 
-def set_waveform_displayer_clip_from_popup(data):
-    clip, track, item_id, item_data = data
-
-    global frames_cache
-    if clip.path in frames_cache:
-        frame_levels = frames_cache[clip.path]
-        clip.waveform_data = frame_levels
-        return
-
-    cache_file_path = utils.get_hidden_user_dir_path() + appconsts.AUDIO_LEVELS_DIR + _get_unique_name_for_media(clip.path)
-    if os.path.isfile(cache_file_path):
-        f = open(cache_file_path)
-        frame_levels = pickle.load(f)
-        frames_cache[clip.path] = frame_levels
-        clip.waveform_data = frame_levels
-        return
-    
-    global waveform_thread
-    waveform_thread = WaveformCreator(clip, track.height, dialog)
-    waveform_thread.start()
-
-
 # --------------------------------------------------------- rendering
 def main():
     # Set paths.
     root_path = sys.argv[3]
     respaths.set_paths(root_path)
 
+    # Load editor prefs and list of recent projects
+    editorpersistance.load()
+
+    profile_desc = sys.argv[2]
+        
+    files_paths = sys.argv[1]
+    files_paths = files_paths.lstrip(FILE_SEPARATOR)
+    
+    files = files_paths.split(FILE_SEPARATOR)
+
+    if len(sys.argv) > 4 and sys.argv[4] == BENCHMARK_ARG:
+        _init_render_environment()
+        for f in files:
+            benchmark_levels_extraction(f, profile_desc)
+        return
+
+    workers_count = min(_get_render_workers_count(), len(files))
+    if workers_count < 2:
+        _init_render_environment()
+        for f in files:
+            _report_file_done(_render_levels_file((f, profile_desc)))
+        return
+
+    # Render files concurrently in worker processes, each worker initializes its own MLT environment
+    # and files are reported as done in the order they get completed.
+    pool = multiprocessing.Pool(workers_count, _init_render_environment)
+    render_jobs = [(f, profile_desc) for f in files]
+    for done_file in pool.imap_unordered(_render_levels_file, render_jobs):
+        _report_file_done(done_file)
+    pool.close()
+    pool.join()
+
+def _get_render_workers_count():
+    workers_count = editorpersistance.prefs.audio_levels_render_workers
+    if workers_count < 1:
+        try:
+            workers_count = multiprocessing.cpu_count()
+        except NotImplementedError:
+            workers_count = 1
+    return workers_count
+
+def _init_render_environment():
     try:
         editorstate.mlt_version = mlt.LIBMLT_VERSION
     except:
         editorstate.mlt_version = "0.0.99" # magic string for "not found"
-        
-    # Load editor prefs and list of recent projects
-    editorpersistance.load()
-    
+
     # Init translations module with translations data
     translations.init_languages()
     translations.load_filters_translations()
@@ -202,18 +370,42 @@ def main():
     # Create list of available mlt profiles
     mltprofiles.load_profile_list()
 
-    profile_desc = sys.argv[2]
-    profile = mltprofiles.get_profile(profile_desc)
-        
-    files_paths = sys.argv[1]
-    files_paths = files_paths.lstrip(FILE_SEPARATOR)
-    
-    files = files_paths.split(FILE_SEPARATOR)
+def _render_levels_file(render_job):
+    # This is run in worker processes when rendering with a pool, so it can't let exceptions escape
+    # or the whole pool would go down with one bad media file. Extraction is run directly in
+    # this worker instead of as a started thread so that its exceptions are caught here.
+    clip_path, profile_desc = render_job
+    try:
+        WaveformCreator(clip_path, profile_desc).run()
+    except Exception as e:
+        print "audio levels render failed for", clip_path, e
+        return None
+    return clip_path
 
-    for f in files:
-       t = WaveformCreator(f, profile_desc)
-       t.start()
-       t.join()
+def benchmark_levels_extraction(clip_path, profile_desc):
+    """
+    Prints frames per second for seek-per-frame and streaming levels extraction modes.
+    Run with: flowbladeaudiorender <media file> <profile> <root path> --benchmark
+    """
+    profile = mltprofiles.get_profile(profile_desc)
+    modes = (("seek per frame", seek_frame_levels, False),
+             ("stream, audio and video", stream_frame_levels, False),
+             ("stream, audio only", stream_frame_levels, True))
+    for desc, extract_func, audio_only in modes:
+        producer = mlt.Producer(profile, str(clip_path))
+        levels = attach_levels_filters(producer, profile, audio_only)
+        frame_levels = [0.0] * producer.get_length()
+        start_time = time.time()
+        extract_func(producer, levels, frame_levels)
+        elapsed = time.time() - start_time
+        print "%s: %d frames in %.2f s, %.1f fps" % (desc, len(frame_levels), elapsed, len(frame_levels) / max(elapsed, 0.001))
+    sys.stdout.flush()
+
+def _report_file_done(clip_path):
+    if clip_path == None:
+        return
+    sys.stdout.write(FILE_DONE_TAG + clip_path + "\n")
+    sys.stdout.flush()
 
 
 class WaveformCreator(threading.Thread):    
@@ -226,33 +418,18 @@ class WaveformCreator(threading.Thread):
         self.last_rendered_frame = 0
 
     def run(self):
-        frame_levels = [None] * self.clip_media_length 
+        frame_levels = [0.0] * self.clip_media_length 
+        stream_frame_levels(self.temp_clip, self.levels, frame_levels, self._batch_done)
 
-        for frame in range(0, len(frame_levels)):
-            self.temp_clip.seek(frame)
-            mlt.frame_get_waveform(self.temp_clip.get_frame(), 10, 50)
-            val = self.levels.get(RIGHT_CHANNEL)
-            if val == None:
-                val = 0.0
-            frame_levels[frame] = float(val)
-            self.last_rendered_frame = frame
+        audiolevelsfile.write_levels(self.file_cache_path, frame_levels)
 
-        write_file = file(self.file_cache_path, "wb")
-        pickle.dump(frame_levels, write_file)
+    def _batch_done(self, rendered_frames):
+        self.last_rendered_frame = rendered_frames - 1
 
     def _get_temp_producer(self, clip_path, profile):
         temp_producer = mlt.Producer(profile, str(clip_path))
-        channels = mlt.Filter(profile, "audiochannels")
-        converter = mlt.Filter(profile, "audioconvert")
-        self.levels = mlt.Filter(profile, "audiolevel")
-        temp_producer.attach(channels)
-        temp_producer.attach(converter)
-        temp_producer.attach(self.levels)
+        self.levels = attach_levels_filters(temp_producer, profile)
         temp_producer.path = clip_path
         self.clip_media_length = temp_producer.get_length()
 
         return temp_producer
-
-
-
-
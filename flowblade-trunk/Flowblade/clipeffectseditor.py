@@ -39,6 +39,7 @@ import propertyedit
 import propertyeditorbuilder
 import respaths
 import translations
+import undo
 import updater
 import utils
 
@@ -331,6 +332,7 @@ def toggle_all_pressed():
         filter_object = clip.filters[i]
         filter_object.active = (filter_object.active == False)
         filter_object.update_mlt_disabled_value()
+    undo.project_changed()
     
     update_stack_view()
 
@@ -341,12 +343,14 @@ def reset_filter_values():
     row_index = max(row)
     
     clip.filters[row_index].reset_values(PROJECT().profile, clip)
+    undo.project_changed()
     effect_selection_changed()
 
 def toggle_filter_active(row, update_stack_view=True):
     filter_object = clip.filters[row]
     filter_object.active = (filter_object.active == False)
     filter_object.update_mlt_disabled_value()
+    undo.project_changed()
     if update_stack_view == True:
         update_stack_view_changed_blocked()
             
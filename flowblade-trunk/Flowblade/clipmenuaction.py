@@ -97,8 +97,8 @@ def _compositor_menu_item_activated(widget, data):
                                  _("Clip used to create this Compositor has been removed\nor moved to different track."), 
                                  gui.editor_window.window)
             return
-        clip_index = track.clips.index(origin_clip)
-        clip_start = track.clip_start(clip_index)
+        clip_index = track.clips_index.clip_index(origin_clip)
+        clip_start = track.clips_index.clip_start(clip_index)
         clip_end = clip_start + origin_clip.clip_out - origin_clip.clip_in
         data = {"compositor":compositor,"clip_in":clip_start,"clip_out":clip_end}
         action = edit.move_compositor_action(data)
@@ -191,7 +191,7 @@ def _add_filter(data):
     
     # (re)open clip in editor
     frame = tlinewidgets.get_frame(x)
-    index = track.get_clip_index_at(frame)
+    index = track.clips_index.get_clip_index_at(frame)
     clipeffectseditor.set_clip(clip, track, index)
 
 def _add_compositor(data):
@@ -199,11 +199,11 @@ def _add_compositor(data):
     x, compositor_type = item_data
 
     frame = tlinewidgets.get_frame(x)
-    clip_index = track.get_clip_index_at(frame)
+    clip_index = track.clips_index.get_clip_index_at(frame)
 
     target_track_index = track.id - 1
 
-    compositor_in = current_sequence().tracks[track.id].clip_start(clip_index)
+    compositor_in = current_sequence().tracks[track.id].clips_index.clip_start(clip_index)
     clip_length = clip.clip_out - clip.clip_in
     compositor_out = compositor_in + clip_length
 
@@ -313,7 +313,7 @@ def _clear_waveform(data):
 
 def  _clone_filters_from_next(data):
     clip, track, item_id, item_data = data
-    index = track.clips.index(clip)
+    index = track.clips_index.clip_index(clip)
     if index == len(track.clips) - 1:
         return # clip is last clip
     clone_clip = track.clips[index + 1]
@@ -321,7 +321,7 @@ def  _clone_filters_from_next(data):
 
 def _clone_filters_from_prev(data):
     clip, track, item_id, item_data = data
-    index = track.clips.index(clip)
+    index = track.clips_index.clip_index(clip)
     if index == 0:
         return # clip is first clip
     clone_clip = track.clips[index - 1]
@@ -1293,11 +1293,16 @@ def save_snaphot_progess(media_copy_txt, project_txt):
     dialog.media_copy_info = Gtk.Label(label=media_copy_txt)
     media_copy_row = guiutils.get_left_justified_box([dialog.media_copy_info])
 
+    dialog.progress_bar = Gtk.ProgressBar()
+    dialog.progress_bar.set_show_text(True)
+    dialog.progress_bar.set_text("")
+
     dialog.saving_project_info = Gtk.Label(label=project_txt)
     project_row = guiutils.get_left_justified_box([dialog.saving_project_info])
 
     progress_vbox = Gtk.VBox(False, 2)
     progress_vbox.pack_start(media_copy_row, False, False, 0)
+    progress_vbox.pack_start(dialog.progress_bar, False, False, 0)
     progress_vbox.pack_start(project_row, True, True, 0)
 
     alignment = guiutils.set_margins(progress_vbox, 12, 12, 12, 12)
@@ -25,6 +25,8 @@ and sequence state changes as output.
 Edits, undos and redos are done by creating and calling methods on these 
 EditAction objects and placing them on the undo/redo stack.
 """
+import time
+
 import audiowaveform
 import appconsts
 import compositeeditor
@@ -33,6 +35,7 @@ from editorstate import get_track
 from editorstate import PLAYER
 import mltfilters
 import movemodes
+import patternproducer
 import resync
 import trimmodes
 import undo
@@ -42,6 +45,9 @@ import utils
 # GUI updates are turned off for example when doing resync action
 do_gui_update = False
 
+# Maps track id -> index of first clip changed by atomic edit ops during current edit
+_changed_tracks = {}
+
 
 # ---------------------------------- atomic edit ops
 def append_clip(track, clip, clip_in, clip_out):
@@ -53,6 +59,7 @@ def append_clip(track, clip, clip_in, clip_out):
     track.clips.append(clip) # py
     track.append(clip, clip_in, clip_out) # mlt
     resync.clip_added_to_timeline(clip, track)
+    _track_clips_changed(track, len(track.clips) - 1)
 
 def _insert_clip(track, clip, index, clip_in, clip_out):
     """
@@ -63,6 +70,7 @@ def _insert_clip(track, clip, index, clip_in, clip_out):
     track.clips.insert(index, clip) # py
     track.insert(clip, index, clip_in, clip_out) # mlt
     resync.clip_added_to_timeline(clip, track)
+    _track_clips_changed(track, index)
 
 def _insert_blank(track, index, length):
     track.insert_blank(index, length - 1) # -1 MLT API says so
@@ -72,6 +80,7 @@ def _insert_blank(track, index, length):
     blank_clip.clip_out = length - 1 # -1, end inclusive
     blank_clip.is_blanck_clip = True
     track.clips.insert(index, blank_clip)
+    _track_clips_changed(track, index)
     
 def _remove_clip(track, index):
     """
@@ -81,6 +90,7 @@ def _remove_clip(track, index):
     clip = track.clips.pop(index)
     updater.clip_removed_during_edit(clip)
     resync.clip_removed_from_timeline(clip)
+    _track_clips_changed(track, index)
     
     return clip
 
@@ -120,9 +130,24 @@ def _add_blank_to_py(track, index, length):
     blank_clip.clip_out = length - 1 # -1, end inclusive
     blank_clip.is_blanck_clip = True
     track.clips.insert(index, blank_clip)
+    _track_clips_changed(track, index)
     return blank_clip
 
 # --------------------------------- util methods
+def _track_clips_changed(track, index):
+    track.clips_index.invalidate()
+    _changed_tracks[track.id] = min(index, _changed_tracks.get(track.id, index))
+
+def _clip_display_changed(clip):
+    # Clips on track stay the same, but track of clip needs to be repainted, e.g. for mute icon.
+    for track in current_sequence().tracks:
+        try:
+            index = track.clips_index.clip_index(clip)
+        except ValueError:
+            continue
+        _changed_tracks[track.id] = min(index, _changed_tracks.get(track.id, index))
+        return
+
 def _set_in_out(clip, c_in, c_out):
     """
     Affects MLT c-struct and python obj values.
@@ -180,10 +205,12 @@ def _create_mute_volume_filter(seq):
     
 def _do_clip_mute(clip, volume_filter):
     mltfilters.do_clip_mute(clip, volume_filter)
+    _clip_display_changed(clip)
 
 def _do_clip_unmute(clip):
     clip.detach(clip.mute_filter.mlt_filter)
     clip.mute_filter = None
+    _clip_display_changed(clip)
 
 def _remove_consecutive_blanks(track, index):
     lengths = []
@@ -206,10 +233,10 @@ def _overwrite_cut_track(track, frame, add_cloned_filters=False):
     
     If cut was made it also clones fliters to new clip created by cut if requested.
     """
-    index = track.get_clip_index_at(frame)
+    index = track.clips_index.get_clip_index_at(frame)
     clip = track.clips[index]
     orig_in_out = (clip.clip_in, clip.clip_out)
-    clip_start_in_tline = track.clip_start(index)
+    clip_start_in_tline = track.clips_index.clip_start(index)
     clip_frame = frame - clip_start_in_tline + clip.clip_in
     
     if not _frame_on_cut(clip, clip_frame):
@@ -236,7 +263,7 @@ def _overwrite_cut_range_out(track, self):
         self.out_clip_length = clip_out - clip_in + 1 # Cut blank can't be reconstructed with clip_in data as it is always 0 for blank, so we use this
         if clip_in != -1: # if we did cut we'll need to restore the dut out clip
                           # which is the original clip because 
-            orig_index = track.get_clip_index_at(self.over_out - 1)
+            orig_index = track.clips_index.get_clip_index_at(self.over_out - 1)
             self.orig_out_clip = track.clips[orig_index] 
     else:
         self.out_clip_in = -1
@@ -319,6 +346,7 @@ class EditAction:
             self.stop_for_edit = True
 
     def undo(self):
+        _changed_tracks.clear()
         PLAYER().stop_playback()
 
         # HACK, see above.
@@ -333,7 +361,9 @@ class EditAction:
 
         _remove_all_trailing_blanks(None)
 
-        resync.calculate_and_set_child_clip_sync_states()
+        sync_changed_track_ids = resync.calculate_and_set_child_clip_sync_states(_changed_tracks)
+        self._report_changed_tracks(sync_changed_track_ids)
+        current_sequence().compositors_changed() # edits may move compositors with clips
 
         # HACK, see above.
         if self.stop_for_edit:
@@ -343,6 +373,7 @@ class EditAction:
             self._update_gui()
             
     def redo(self):
+        _changed_tracks.clear()
         PLAYER().stop_playback()
 
         # HACK, see above.
@@ -355,7 +386,9 @@ class EditAction:
 
         _consolidate_all_blanks_redo(self)
         _remove_trailing_blanks_redo(self)
-        resync.calculate_and_set_child_clip_sync_states()
+        sync_changed_track_ids = resync.calculate_and_set_child_clip_sync_states(_changed_tracks)
+        self._report_changed_tracks(sync_changed_track_ids)
+        current_sequence().compositors_changed() # edits may move compositors with clips
 
         # HACK, see above.
         if self.stop_for_edit:
@@ -364,6 +397,13 @@ class EditAction:
         if do_gui_update:
             self._update_gui()
 
+    def _report_changed_tracks(self, sync_changed_track_ids):
+        # Edits that do not change clips on tracks or their display, e.g. filter edits,
+        # are not reported and timeline is repainted fully.
+        self.changed_track_ids = set(_changed_tracks.keys())
+        if len(self.changed_track_ids) > 0:
+            updater.damage_tline_tracks(self.changed_track_ids | sync_changed_track_ids)
+
     def _update_gui(self):
         updater.update_tline_scrollbar() # Slider needs to adjust to possily new program length.
                                          # This REPAINTS TIMELINE as a side effect.
@@ -642,8 +682,8 @@ def _sync_over_redo(self):
 
     # Splice out clips in overwrite range
     self.removed_clips = []
-    self.in_index = track.get_clip_index_at(self.frame)
-    self.out_index = track.get_clip_index_at(self.over_out)
+    self.in_index = track.clips_index.get_clip_index_at(self.frame)
+    self.out_index = track.clips_index.get_clip_index_at(self.over_out)
     for i in range(self.in_index, self.out_index):
         removed_clip = _remove_clip(track, self.in_index)
         self.removed_clips.append(removed_clip)
@@ -857,7 +897,7 @@ def _overwrite_move_undo(self):
         
     # Remove moved clips
     moved_clips_count = self.selected_range_out - self.selected_range_in + 1 # + 1 == out inclusive
-    moved_index = track.get_clip_index_at(self.over_in)
+    moved_index = track.clips_index.get_clip_index_at(self.over_in)
     for i in range(0, moved_clips_count):
         _remove_clip(track, moved_index)
         
@@ -918,8 +958,8 @@ def _overwrite_move_redo(self):
     
     # Splice out clips in overwrite range
     self.removed_clips = []
-    in_index = track.get_clip_index_at(self.over_in)
-    out_index = track.get_clip_index_at(self.over_out)
+    in_index = track.clips_index.get_clip_index_at(self.over_in)
+    out_index = track.clips_index.get_clip_index_at(self.over_out)
 
     for i in range(in_index, out_index):
         removed_clip = _remove_clip(track, in_index)
@@ -949,7 +989,7 @@ def _multitrack_overwrite_move_undo(self):
 
     # Remove moved clips
     moved_clips_count = self.selected_range_out - self.selected_range_in + 1 # + 1 == out inclusive
-    moved_index = to_track.get_clip_index_at(self.over_in)
+    moved_index = to_track.clips_index.get_clip_index_at(self.over_in)
     for i in range(0, moved_clips_count):
         _remove_clip(to_track, moved_index)
 
@@ -1011,8 +1051,8 @@ def _multitrack_overwrite_move_redo(self):
 
     # Splice out clips in overwrite range
     self.removed_clips = []
-    in_index = to_track.get_clip_index_at(self.over_in)
-    out_index = to_track.get_clip_index_at(self.over_out)
+    in_index = to_track.clips_index.get_clip_index_at(self.over_in)
+    out_index = to_track.clips_index.get_clip_index_at(self.over_out)
 
     for i in range(in_index, out_index):
         removed_clip = _remove_clip(to_track, in_index)
@@ -1525,7 +1565,7 @@ def _audio_splice_undo(self):
     to_track = self.to_track
 
     # Remove add audio clip
-    in_index = to_track.get_clip_index_at(self.over_in)
+    in_index = to_track.clips_index.get_clip_index_at(self.over_in)
     _remove_clip(to_track, in_index)
         
     # Fix in clip and remove cut created clip if in was cut
@@ -1584,8 +1624,8 @@ def _audio_splice_redo(self):
     
     # Splice out clips in overwrite range
     self.removed_clips = []
-    in_index = to_track.get_clip_index_at(self.over_in)
-    out_index = to_track.get_clip_index_at(self.over_out)
+    in_index = to_track.clips_index.get_clip_index_at(self.over_in)
+    out_index = to_track.clips_index.get_clip_index_at(self.over_out)
 
     for i in range(in_index, out_index):
         self.removed_clips.append(_remove_clip(to_track, in_index))
@@ -1657,7 +1697,7 @@ def _create_and_do_sync_actions_list(resync_data_list):
 
         # Get new in and out frames for clip
         diff = pos_offset - clip.sync_data.pos_offset
-        over_in = track.clip_start(index) - diff
+        over_in = track.clips_index.clip_start(index) - diff
         over_out = over_in + (clip.clip_out - clip.clip_in + 1)
         data = {"track":track,
                 "over_in":over_in,
@@ -1692,10 +1732,10 @@ def _resync_clips_sequence_redo(self):
     else:
         # Get new in and out frames for clips 
         diff = pos_offset - clip.sync_data.pos_offset
-        over_in = track.clip_start(index) - diff
+        over_in = track.clips_index.clip_start(index) - diff
 
         clip_last, track, index_last, pos_offset = resync_data[-1]
-        last_over_in = track.clip_start(index_last) - diff
+        last_over_in = track.clips_index.clip_start(index_last) - diff
         over_out = last_over_in + (clip_last.clip_out - clip_last.clip_in + 1)
 
         # Create, do and sacve edit action.
@@ -1732,8 +1772,8 @@ def _set_sync_redo(self):
     parent_clip = get_track(current_sequence().first_video_index).clips[self.parent_index]
 
     # Get offset
-    child_clip_start = self.child_track.clip_start(self.child_index) - child_clip.clip_in
-    parent_clip_start = self.parent_track.clip_start(self.parent_index) - parent_clip.clip_in
+    child_clip_start = self.child_track.clips_index.clip_start(self.child_index) - child_clip.clip_in
+    parent_clip_start = self.parent_track.clips_index.clip_start(self.parent_index) - parent_clip.clip_in
     pos_offset = child_clip_start - parent_clip_start
     
     # Set sync data
@@ -2132,7 +2172,7 @@ def _append_media_log_redo(self):
 # NOTE: RANGE SPLICE OUT NOT IMPLEMENTED YET; SO THIS IS CURRENTLY DEAD CODE
 def _track_put_back_range(over_in, track, track_extract_data):
     # get index for first clip that was removed
-    moved_index = track.get_clip_index_at(over_in)
+    moved_index = track.clips_index.get_clip_index_at(over_in)
 
     # Fix in clip and remove cut created clip if in was cut
     if track_extract_data.in_clip_out != -1:
@@ -2197,15 +2237,15 @@ def _track_extract_range(over_in, over_out, track):
         track_extract_data.out_clip_length = clip_out - clip_in + 1 # Cut blank can't be reconstructed with clip_in data as it is always 0 for blank, so we use this
         if clip_in != -1: # if we did cut we'll need to restore the dut out clip
                           # which is the original clip because 
-            orig_index = track.get_clip_index_at(over_out - 1)
+            orig_index = track.clips_index.get_clip_index_at(over_out - 1)
             track_extract_data.orig_out_clip = track.clips[orig_index] 
     else:
         track_extract_data.out_clip_in = -1
         
     # Splice out clips in overwrite range
     track_extract_data.removed_clips = []
-    track_extract_data.in_index = track.get_clip_index_at(over_in)
-    out_index = track.get_clip_index_at(over_out)
+    track_extract_data.in_index = track.clips_index.get_clip_index_at(over_in)
+    out_index = track.clips_index.get_clip_index_at(over_out)
 
     for i in range(track_extract_data.in_index, out_index):
         removed_clip = _remove_clip(track, track_extract_data.in_index)
@@ -2233,3 +2273,78 @@ def _replace_with_speed_changed_clip_redo(self):
 
 
     
+
+
+# ------------------------------------------------ SYNC EDIT LATENCY STRESS TEST
+def sync_edit_latency_stress_test(children_counts=(0, 100, 250, 500, 1000), edits_count=20):
+    """
+    Prints edit latency against number of synced child clips.
+
+    For each children count color clips are appended on tracks V1 and A1 and A1 clips are synced
+    to V1 clips. Then edit that does not affect sync and edit that affects all child clips are timed,
+    and full sync state calculation is timed for comparison. Added clips are removed after test.
+
+    Run with 'flowblade -resyncstresstest' with empty tracks V1, V2 and A1.
+    """
+    global do_gui_update
+    gui_update = do_gui_update
+    do_gui_update = False
+
+    seq = current_sequence()
+    parent_track = seq.first_video_track()
+    other_track = seq.tracks[seq.first_video_index + 1]
+    child_track = seq.tracks[seq.first_video_index - 1]
+    color_clip_data = patternproducer.BinColorClip(-1, "stress test", "#ffff00000000")
+
+    print "children, insert V2 ms, insert A1 ms, full resync ms, incremental resync ms"
+    setup_actions = []
+    for children_count in children_counts:
+        # Add synced clip pairs to get children count
+        while len(resync.sync_children) < children_count:
+            index = len(parent_track.clips)
+            for track in [parent_track, child_track]:
+                data = {"track":track,
+                        "clip":seq.create_pattern_producer(color_clip_data),
+                        "clip_in":0,
+                        "clip_out":24}
+                setup_actions.append(append_action(data))
+                setup_actions[-1].redo()
+            data = {"child_index":index,
+                    "child_track":child_track,
+                    "parent_index":index,
+                    "parent_track":parent_track}
+            setup_actions.append(set_sync_action(data))
+            setup_actions[-1].redo()
+
+        insert_clip = seq.create_pattern_producer(color_clip_data)
+        insert_times = []
+        for track in [other_track, child_track]:
+            data = {"track":track,
+                    "clip":insert_clip,
+                    "index":0,
+                    "clip_in":0,
+                    "clip_out":4}
+            action = insert_action(data)
+            start = time.time()
+            for i in range(0, edits_count):
+                action.redo()
+                action.undo()
+            insert_times.append((time.time() - start) * 1000.0 / (2 * edits_count))
+
+        start = time.time()
+        for i in range(0, edits_count):
+            resync.calculate_and_set_child_clip_sync_states()
+        full_time = (time.time() - start) * 1000.0 / edits_count
+
+        start = time.time()
+        for i in range(0, edits_count):
+            resync.calculate_and_set_child_clip_sync_states({other_track.id:0})
+        incremental_time = (time.time() - start) * 1000.0 / edits_count
+
+        print "%d, %.2f, %.2f, %.2f, %.2f" % (len(resync.sync_children), insert_times[0], insert_times[1], full_time, incremental_time)
+
+    for action in reversed(setup_actions):
+        action.undo()
+
+    do_gui_update = gui_update
+    updater.repaint_tline()
@@ -139,7 +139,7 @@ def  _attempt_dnd_overwrite(track, clip, frame):
         updater.display_tline_cut_frame(track, index + 1)
         return True
     else: # Clip dropped before end of last clip on track
-        index = track.get_clip_index_at(frame)
+        index = track.clips_index.get_clip_index_at(frame)
         overwritten_clip = track.clips[index]
         
         # dnd overwrites can only done on blank clips
@@ -148,8 +148,8 @@ def  _attempt_dnd_overwrite(track, clip, frame):
             return False
 
         drop_length = clip.mark_out - clip.mark_in + 1 # +1 , mark out incl.
-        blank_start = track.clip_start(index)
-        blank_end = track.clip_start(index + 1)
+        blank_start = track.clips_index.clip_start(index)
+        blank_end = track.clips_index.clip_start(index + 1)
         
         movemodes.clear_selected_clips()
   
@@ -547,7 +547,7 @@ def tline_canvas_mouse_pressed(event, frame):
 
     #  Check if compositor is hit and if so handle compositor editing
     if editorstate.current_is_move_mode() and timeline_visible():
-        hit_compositor = tlinewidgets.compositor_hit(frame, event.y, current_sequence().compositors)
+        hit_compositor = tlinewidgets.compositor_hit(frame, event.y)
         if hit_compositor != None:
             movemodes.clear_selected_clips()
             if event.button == 1 or (event.button == 3 and event.get_state() & Gdk.ModifierType.CONTROL_MASK):
@@ -698,7 +698,7 @@ def tline_canvas_double_click(frame, x, y):
         set_default_edit_mode()
         return
 
-    hit_compositor = tlinewidgets.compositor_hit(frame, y, current_sequence().compositors)
+    hit_compositor = tlinewidgets.compositor_hit(frame, y)
     if hit_compositor != None:
         compositeeditor.set_compositor(hit_compositor)
         return
@@ -25,6 +25,7 @@ Module handles saving and loading data that is related to the editor and not any
 
 from gi.repository import Gtk
 
+import multiprocessing
 import os
 import pickle
 
@@ -39,6 +40,14 @@ MAX_RECENT_PROJS = 15
 UNDO_STACK_DEFAULT = 30
 UNDO_STACK_MIN = 10
 UNDO_STACK_MAX = 100
+AUDIO_LEVELS_WORKERS_MAX = 64
+MEDIA_IMPORT_WORKERS_MAX = 64
+PROXY_RENDER_WORKERS_MAX = 64
+IMG_SEQ_PROXY_COMPRESSION_MAX = 9
+TIMELINE_RENDER_PROCESSES_MAX = 16
+AUDIO_LEVELS_CACHE_DEFAULT = 128 # MB
+AUDIO_LEVELS_CACHE_MIN = 8
+AUDIO_LEVELS_CACHE_MAX = 4096
 
 GLASS_STYLE = 0
 SIMPLE_STYLE = 1
@@ -160,12 +169,14 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     # Unpack widgets
     gen_opts_widgets, edit_prefs_widgets, view_prefs_widgets = widgets_tuples_tuple
 
-    default_profile_combo, open_in_last_opened_check, open_in_last_rendered_check, undo_max_spin, load_order_combo = gen_opts_widgets
+    default_profile_combo, open_in_last_opened_check, open_in_last_rendered_check, undo_max_spin, load_order_combo, \
+    levels_workers_spin, levels_cache_spin, import_workers_spin, proxy_workers_spin, \
+    img_seq_proxy_format_combo, img_seq_proxy_compression_spin, render_processes_spin, smart_render_check = gen_opts_widgets
     
     auto_play_in_clip_monitor_check, auto_center_check, grfx_insert_length_spin, \
     trim_exit_click, trim_quick_enter, remember_clip_frame, overwrite_clip_drop, cover_delete = edit_prefs_widgets
     
-    use_english, disp_splash, buttons_style, dark_theme, theme_combo, audio_levels_combo = view_prefs_widgets
+    use_english, disp_splash, buttons_style, dark_theme, theme_combo, audio_levels_combo, layer_cache_check = view_prefs_widgets
 
     global prefs
     prefs.open_in_last_opended_media_dir = open_in_last_opened_check.get_active()
@@ -173,6 +184,14 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     prefs.default_profile_name = mltprofiles.get_profile_name_for_index(default_profile_combo.get_active())
     prefs.undos_max = undo_max_spin.get_adjustment().get_value()
     prefs.media_load_order = load_order_combo.get_active()
+    prefs.audio_levels_render_workers = int(levels_workers_spin.get_adjustment().get_value())
+    prefs.audio_levels_cache_size = int(levels_cache_spin.get_adjustment().get_value())
+    prefs.media_import_workers = int(import_workers_spin.get_adjustment().get_value())
+    prefs.proxy_render_workers = int(proxy_workers_spin.get_adjustment().get_value())
+    prefs.img_seq_proxy_format = img_seq_proxy_format_combo.get_active()
+    prefs.img_seq_proxy_compression = int(img_seq_proxy_compression_spin.get_adjustment().get_value())
+    prefs.timeline_render_processes = int(render_processes_spin.get_adjustment().get_value())
+    prefs.smart_render = smart_render_check.get_active()
 
     prefs.auto_play_in_clip_monitor = auto_play_in_clip_monitor_check.get_active()
     prefs.auto_center_on_play_stop = auto_center_check.get_active()
@@ -189,6 +208,7 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     prefs.dark_theme = (dark_theme.get_active() == 1)
     prefs.theme_fallback_colors = theme_combo.get_active() 
     prefs.display_all_audio_levels = (audio_levels_combo.get_active() == 0)
+    prefs.tline_layer_cache = layer_cache_check.get_active()
 
 def get_graphics_default_in_out_length():
     in_fr = int(15000/2) - int(prefs.default_grfx_length/2)
@@ -209,6 +229,12 @@ def create_rendered_clips_folder_if_needed(user_dir):
             os.mkdir(render_folder + "/")
         prefs.render_folder = render_folder
 
+def _get_cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
 
 class EditorPreferences:
     """
@@ -257,3 +283,12 @@ class EditorPreferences:
         self.display_all_audio_levels = True
         self.overwrite_clip_drop = True
         self.trans_cover_delete = True
+        self.audio_levels_render_workers = _get_cpu_count() # number of processes rendering audio levels files concurrently
+        self.audio_levels_cache_size = AUDIO_LEVELS_CACHE_DEFAULT # MB of audio levels data kept in memory
+        self.tline_layer_cache = True # draw timeline tracks from cached images
+        self.media_import_workers = _get_cpu_count() # number of processes probing and thumbnailing imported media concurrently
+        self.proxy_render_workers = max(1, _get_cpu_count() / 4) # number of proxy encodes running concurrently, encoders use several threads each
+        self.img_seq_proxy_format = 0 # proxyrender.IMG_SEQ_PROXY_PNG
+        self.img_seq_proxy_compression = 1 # 0 - 9, PNG compress level or JPEG quality 95 - 50
+        self.timeline_render_processes = 1 # more than 1 renders timeline in segments that are joined after render
+        self.smart_render = False # True copies timeline spans of unchanged source video to render without re-encoding
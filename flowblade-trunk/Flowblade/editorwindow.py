@@ -58,6 +58,7 @@ import panels
 import patternproducer
 from positionbar import PositionBar
 import preferenceswindow
+import previewcache
 import projectaction
 import projectinfogui
 import proxyediting
@@ -170,6 +171,10 @@ class EditorWindow:
             ('AddFade', None, _('Add Single Track Fade'), None, None, lambda a:tlineaction.add_fade_menu_item_selected()),
             ('ClearFilters', None, _('Clear Filters'), None, None, lambda a:clipmenuaction.clear_filters()),
             ('SyncCompositors', None, _('Sync All Compositors'), None, None, lambda a:tlineaction.sync_all_compositors()),
+            ('PreviewCacheMenu', None, _('Preview Render Cache')),
+            ('PreviewCacheAddMarked', None, _('Cache Marked Range'), None, None, lambda a:previewcache.add_marked_range()),
+            ('PreviewCacheAutoDetect', None, _('Cache Ranges With Many Effects'), None, None, lambda a:previewcache.add_auto_detected_ranges()),
+            ('PreviewCacheClear', None, _('Clear Cached Ranges'), None, None, lambda a:previewcache.clear_ranges()),
             ('ChangeSequenceTracks', None, _('Change Sequence Tracks Count...'), None, None, lambda a:projectaction.change_sequence_track_count()),
             ('Watermark', None, _('Watermark...'), None, None, lambda a:menuactions.edit_watermark()),
             ('ProfilesManager', None, _('Profiles Manager'), None, None, lambda a:menuactions.profiles_manager()),
@@ -258,6 +263,12 @@ class EditorWindow:
                     <menuitem action='AddTransition'/>
                     <menuitem action='AddFade'/>
                     <separator/>
+                    <menu action='PreviewCacheMenu'>
+                        <menuitem action='PreviewCacheAddMarked'/>
+                        <menuitem action='PreviewCacheAutoDetect'/>
+                        <menuitem action='PreviewCacheClear'/>
+                    </menu>
+                    <separator/>
                     <menuitem action='ChangeSequenceTracks'/>
                     <menuitem action='Watermark'/>
                     <separator/>
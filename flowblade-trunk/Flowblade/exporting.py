@@ -22,6 +22,7 @@
 
 from gi.repository import Gtk
 from gi.repository import GLib
+import bisect
 import os, sys
 from xml.dom import minidom
 from decimal import Decimal,getcontext,ROUND_DOWN
@@ -29,6 +30,7 @@ from math import modf, floor
 import mlt
 import time
 import md5
+import random
 import re
 import shutil
 
@@ -39,6 +41,7 @@ from editorstate import PROJECT
 from editorstate import current_sequence
 import gui
 import guiutils
+import mltxmlwriter
 import renderconsumer
 import utils
 
@@ -68,10 +71,11 @@ def _export_melt_xml_dialog_callback(dialog, response_id):
     if response_id == Gtk.ResponseType.ACCEPT:
         filenames = dialog.get_filenames()
         save_path = filenames[0]
-        global _xml_render_monitor
-        _xml_render_player = renderconsumer.XMLRenderPlayer(save_path,
-                                                          _xml_render_done,
-                                                          None)
+        global _xml_render_player
+        _xml_render_player = mltxmlwriter.XMLWriteThread(current_sequence(),
+                                                         save_path,
+                                                         _xml_render_done,
+                                                         None)
         _xml_render_player.start()
         
         dialog.destroy()
@@ -92,10 +96,11 @@ def _export_edl_dialog_callback(dialog, response_id, data):
     if response_id == Gtk.ResponseType.YES:
         file_name, out_folder, track_select_combo, cascade_check, op_combo, audio_track_select_combo = data
         edl_path = out_folder.get_filename()+ "/" + file_name.get_text() + ".edl" 
-        global _xml_render_monitor
-        _xml_render_player = renderconsumer.XMLRenderPlayer(get_edl_temp_xml_path(),
-                                                            _edl_xml_render_done,
-                                                            (edl_path, track_select_combo, cascade_check, op_combo, audio_track_select_combo))
+        global _xml_render_player
+        _xml_render_player = mltxmlwriter.XMLWriteThread(current_sequence(),
+                                                         get_edl_temp_xml_path(),
+                                                         _edl_xml_render_done,
+                                                         (edl_path, track_select_combo, cascade_check, op_combo, audio_track_select_combo))
         _xml_render_player.start()
 
         dialog.destroy()
@@ -123,7 +128,9 @@ def get_edl_temp_xml_path():
 
 class MLTXMLToEDLParse:
     def __init__(self, xmlfile, title):
-        self.xmldoc = minidom.parse(xmlfile)
+        # xmlfile is None when playlists are created without MLT XML, see edl_engine_test()
+        if xmlfile != None:
+            self.xmldoc = minidom.parse(xmlfile)
         self.title = title
         self.reel_name_type = REEL_NAME_FILE_NAME_START
         self.from_clip_comment = False
@@ -208,7 +215,8 @@ class MLTXMLToEDLParse:
             p_dict["pid"] = p.attributes["id"].value
             p_dict["inTime"] = p.attributes["in"].value
             p_dict["outTime"] = p.attributes["out"].value
-            properties = p.getElementsByTagName("property")
+            # Only direct children, producer may have filter elements with properties of their own.
+            properties = [node for node in p.childNodes if node.localName == "property"]
             for props in properties:
                 p_dict[props.attributes["name"].value.replace(".","_")] = props.firstChild.data 
             producer_list.append(p_dict)
@@ -277,18 +285,20 @@ class MLTXMLToEDLParse:
         # Write video events
         if not cascade:
             playlist = playlists[track_index]
-            track_frames = self.get_track_frame_array(playlist)
+            track_segments = self.get_track_segments(playlist)
         else:
-            track_frames = self.cascade_playlists(playlists, event_dict)
+            track_segments = self.cascade_playlists(playlists, event_dict,
+                                                    current_sequence().first_video_index,
+                                                    len(current_sequence().tracks))
 
         if audio_op == AUDIO_FROM_VIDEO:
             src_channel = "AA/V"
         else:
             src_channel = "V"
 
-        if len(track_frames) != 0:
+        if len(track_segments) != 0:
             edl_event_count = self.write_track_events(str_list, 
-                                            track_frames, src_channel, 
+                                            track_segments, src_channel, 
                                             source_links, 
                                             reel_names, event_dict, 
                                             edl_event_count)
@@ -297,17 +307,72 @@ class MLTXMLToEDLParse:
         if audio_op == AUDIO_FROM_AUDIO_TRACK:
             src_channel = "AA"
             playlist = playlists[audio_track_index]
-            track_frames = self.get_track_frame_array(playlist)
-            self.write_track_events(str_list, track_frames, src_channel, 
+            track_segments = self.get_track_segments(playlist)
+            self.write_track_events(str_list, track_segments, src_channel, 
                                     source_links, reel_names, event_dict, 
                                     edl_event_count)
             
         print ''.join(str_list).strip("\n")
         return ''.join(str_list).strip("\n")
 
-    def write_track_events(self, str_list, track_frames, src_channel, 
+    def write_track_events(self, str_list, track_segments, src_channel, 
                             source_links, reel_names, event_dict, 
                             edl_event_count):
+        segment_starts = [segment[0] for segment in track_segments]
+        track_length = self.get_segments_length(track_segments)
+        prog_in = 0
+        prog_out = 0
+        running = True
+        while running:
+            # Blank events advance prog_in by blank length, this can go past track end in cascaded tracks
+            if prog_in >= track_length:
+                raise IndexError("EDL event program in frame " + str(prog_in) + " is after track end")
+            segment_index = bisect.bisect_right(segment_starts, prog_in) - 1
+            segment_start, prog_out, current_clip = track_segments[segment_index]
+            event = event_dict[current_clip]
+            if segment_index == len(track_segments) - 1:
+                running = False
+
+            if event["type"] == "entry":
+                # Get media producer atrrs
+                producer = event["producer"]
+                resource = source_links[producer]
+                reel_name = reel_names[resource]
+                src_in = int(event["inTime"]) # source clip IN time
+                src_out = int(event["outTime"]) # source clip OUT time
+                src_out = src_out + 1 # EDL out is exclusive, MLT out is inclusive
+        
+                if self.blender_fix:
+                    src_in = src_in + 1
+                    src_out =  src_in + 1
+
+                self.write_producer_edl_event_CMX3600(str_list, resource, 
+                                                     edl_event_count, reel_name, src_channel,
+                                                     src_in, src_out, prog_in, prog_out)
+                prog_in = prog_out
+            elif event["type"] == "blank":
+                reel_name = "BL"
+                src_in = 0
+                src_out = int(event["length"])
+                prog_out = prog_in + int(event["length"])
+                resource = None
+
+                self.write_producer_edl_event_CMX3600(str_list, resource, 
+                                                     edl_event_count, reel_name, src_channel,
+                                                     src_in, src_out, prog_in, prog_out)
+                prog_in = prog_out
+            else:
+                print "event type error at create_edl"
+                break
+                    
+            edl_event_count = edl_event_count + 1
+        
+        return edl_event_count
+
+    def write_track_frames_events(self, str_list, track_frames, src_channel, 
+                            source_links, reel_names, event_dict, 
+                            edl_event_count):
+        # Per frame array version of write_track_events(), kept as reference for edl_engine_test().
         prog_in = 0
         prog_out = 0
         running = True
@@ -389,25 +454,99 @@ class MLTXMLToEDLParse:
             str_list.append(self.frames_to_tc(prog_out))
             str_list.append("\n")
 
-    def cascade_playlists(self, playlists, event_dict):
-        tracks_count = len(current_sequence().tracks) - current_sequence().first_video_index - 1
+    # Track contents are handled as lists of (start, end, eid) segments covering frames start - (end - 1)
+    # from frame 0 to track end. Adjacent segments never have the same eid, so each segment is one EDL event.
+    # Tracks without clips after the shorter track ends in cascades have segments with eid None.
+    def cascade_playlists(self, playlists, event_dict, first_video_index, tracks_len):
+        # Last track is the hidden track and is not cascaded.
+        top_track_segments = self.get_track_segments(playlists[tracks_len - 2])
+        for i in range(tracks_len - 3, first_video_index - 1, -1):
+            bottom_track_segments = self.get_track_segments(playlists[i])
+            top_track_segments = self.combine_two_tracks(top_track_segments, bottom_track_segments, event_dict)
+
+        return top_track_segments
+
+    def combine_two_tracks(self, t_segments, b_segments, event_dict):
+        if len(t_segments) == 0:
+            return b_segments
+
+        if len(b_segments) == 0:
+            return t_segments
+
+        # Pad shorter track to same length and merge segments of both tracks.
+        length = max(self.get_segments_length(t_segments), self.get_segments_length(b_segments))
+        t_segments = self.pad_segments(t_segments, length)
+        b_segments = self.pad_segments(b_segments, length)
+
+        combined_segments = []
+        t_index = 0
+        b_index = 0
+        start = 0
+        while start < length:
+            t_start, t_end, t_eid = t_segments[t_index]
+            b_start, b_end, b_eid = b_segments[b_index]
+            end = min(t_end, b_end)
+
+            if t_eid != None and event_dict[t_eid]["type"] != "blank":
+                eid = t_eid
+            elif b_eid != None:
+                eid = b_eid
+            else:
+                eid = None
+            self.append_segment(combined_segments, start, end, eid)
+
+            if t_end == end:
+                t_index += 1
+            if b_end == end:
+                b_index += 1
+            start = end
 
-        # Handle 1 and 2 video tracks cases
-        if tracks_count == 1:
-            return self.get_track_frame_array(playlists[len(current_sequence().tracks) - 2])
-        if tracks_count == 2:
-            top_track_frames = self.get_track_frame_array(playlists[len(current_sequence().tracks) - 2])
-            bottom_track_frames =  self.get_track_frame_array(playlists[len(current_sequence().tracks) - 3])
-            return self.combine_two_tracks(top_track_frames, bottom_track_frames, event_dict)
+        return combined_segments
 
-        top_track_frames = self.get_track_frame_array(playlists[len(current_sequence().tracks) - 2])
-        for i in range(len(current_sequence().tracks) - 3, current_sequence().first_video_index - 1, -1):
+    def get_track_segments(self, track):
+        segments = []
+        start = 0
+        for event in track["events"]:
+            if event["type"] == "entry":
+                count = int(event["outTime"]) - int(event["inTime"]) + 1
+            elif event["type"] == "blank":
+                count = int(event["length"])
+            else:
+                continue
+            if count > 0:
+                self.append_segment(segments, start, start + count, event["eid"])
+                start = start + count
+
+        return segments
+
+    def append_segment(self, segments, start, end, eid):
+        if len(segments) > 0 and segments[-1][2] == eid:
+            last_start, last_end, last_eid = segments[-1]
+            segments[-1] = (last_start, end, eid)
+        else:
+            segments.append((start, end, eid))
+
+    def pad_segments(self, segments, length):
+        segments_length = self.get_segments_length(segments)
+        if segments_length < length:
+            return segments + [(segments_length, length, None)]
+        return segments
+
+    def get_segments_length(self, segments):
+        if len(segments) == 0:
+            return 0
+        return segments[-1][1]
+
+    # Per frame array versions of cascade functions, kept as reference for edl_engine_test().
+    def cascade_playlists_frames(self, playlists, event_dict, first_video_index, tracks_len):
+        top_track_frames = self.get_track_frame_array(playlists[tracks_len - 2])
+        for i in range(tracks_len - 3, first_video_index - 1, -1):
             bottom_track_frames = self.get_track_frame_array(playlists[i])
-            top_track_frames = self.combine_two_tracks(top_track_frames, bottom_track_frames, event_dict)
+            top_track_frames = self.combine_two_tracks_frames(top_track_frames, bottom_track_frames, event_dict)
 
         return top_track_frames
 
-    def combine_two_tracks(self, t_frames, b_frames, event_dict):
+    def combine_two_tracks_frames(self, t_frames, b_frames, event_dict):
         if len(t_frames) == 0 and len(b_frames) == 0:
             return []
             
@@ -522,6 +661,108 @@ class MLTXMLToEDLParse:
         return tc
         
 
+def edl_engine_test(cases_count=200, benchmark_hours=3, benchmark_tracks=4):
+    """
+    Development test that compares EDL output of segment based cascading and writing to 
+    per frame array versions on random timelines and prints times for a long timeline.
+    Run by starting application with -edltest flag.
+    """
+    mlt_parse = MLTXMLToEDLParse(None, "edltest")
+    rand = random.Random(0)
+
+    # Regression test, errors must also match, they happen e.g. when a blank continues past
+    # end of a track below it in cascade.
+    mismatches = 0
+    errors = 0
+    for case in range(0, cases_count):
+        tracks_len = rand.randint(3, 7)
+        first_video_index = rand.randint(1, tracks_len - 2)
+        playlists, event_dict, source_links, reel_names = _get_test_playlists(rand, tracks_len, (0, 40), 60)
+        track_index = rand.randint(0, tracks_len - 1)
+        for cascade in (False, True):
+            if cascade:
+                segments_call = lambda: mlt_parse.cascade_playlists(playlists, event_dict, first_video_index, tracks_len)
+                frames_call = lambda: mlt_parse.cascade_playlists_frames(playlists, event_dict, first_video_index, tracks_len)
+            else:
+                segments_call = lambda: mlt_parse.get_track_segments(playlists[track_index])
+                frames_call = lambda: mlt_parse.get_track_frame_array(playlists[track_index])
+
+            segments_edl = _get_test_edl(mlt_parse, mlt_parse.write_track_events, segments_call,
+                                         event_dict, source_links, reel_names)
+            frames_edl = _get_test_edl(mlt_parse, mlt_parse.write_track_frames_events, frames_call,
+                                       event_dict, source_links, reel_names)
+            if segments_edl != frames_edl:
+                mismatches += 1
+                print "EDL mismatch, case", case, "cascade", cascade
+                print "segments:\n", segments_edl
+                print "frames:\n", frames_edl
+            elif segments_edl.startswith("error"):
+                errors += 1
+
+    print "EDL engine test:", cases_count * 2, "cases,", mismatches, "mismatches,", errors, "cases raised same error"
+
+    # Benchmark, clips are 2 - 10 seconds with short blanks at 50 fps
+    events_count = benchmark_hours * 60 * 60 * 50 / 180 # average event is ~180 frames
+    playlists, event_dict, source_links, reel_names = _get_test_playlists(rand, benchmark_tracks + 1, (events_count, events_count), 500, True)
+    # Long clip at the end of bottom track makes sure that all cascaded frames are covered
+    long_event = {"eid":len(event_dict), "type":"entry", "producer":"producer0", "inTime":"0", "outTime":str(events_count * 500)}
+    playlists[0]["events"].append(long_event)
+    event_dict[long_event["eid"]] = long_event
+    source_links["producer0"] = "/test/media/producer0.mp4"
+    reel_names[source_links["producer0"]] = "PRODUCER"
+    for name, write_func, cascade_func in (("frame arrays", mlt_parse.write_track_frames_events, mlt_parse.cascade_playlists_frames),
+                                           ("segments", mlt_parse.write_track_events, mlt_parse.cascade_playlists)):
+        start_time = time.time()
+        track = cascade_func(playlists, event_dict, 0, len(playlists))
+        cascade_time = time.time() - start_time
+        try:
+            write_func([], track, "V", source_links, reel_names, event_dict, 1)
+        except (IndexError, KeyError) as e:
+            print name, "write raised", e.__class__.__name__
+        write_time = time.time() - start_time - cascade_time
+        print "%s: %d tracks, %d events per track, cascade %.3f s, write %.3f s" % (name, benchmark_tracks, events_count, cascade_time, write_time)
+    return False
+
+def _get_test_playlists(rand, tracks_count, events_range, max_length, short_blanks=False):
+    # Returns random playlists with events in same format as MLTXMLToEDLParse.get_playlists() creates.
+    playlists = []
+    event_dict = {}
+    source_links = {}
+    reel_names = {}
+    eid = 0
+    for i in range(0, tracks_count):
+        events = []
+        for j in range(0, rand.randint(*events_range)):
+            if rand.random() < 0.3:
+                if short_blanks:
+                    length = rand.randint(1, 25)
+                else:
+                    length = rand.randint(1, max_length)
+                event = {"eid":eid, "type":"blank", "length":str(length)}
+            else:
+                producer = "producer" + str(rand.randint(0, 20))
+                in_time = rand.randint(0, 1000)
+                out_time = in_time + rand.randint(0, max_length)
+                event = {"eid":eid, "type":"entry", "producer":producer, "inTime":str(in_time), "outTime":str(out_time)}
+                source_links[producer] = "/test/media/" + producer + ".mp4"
+                reel_names[source_links[producer]] = producer.upper()[0:8]
+            events.append(event)
+            event_dict[eid] = event
+            eid = eid + 1
+        playlists.append({"pid":"playlist" + str(i), "events":events})
+    return (playlists, event_dict, source_links, reel_names)
+
+def _get_test_edl(mlt_parse, write_func, track_func, event_dict, source_links, reel_names):
+    str_list = []
+    try:
+        track = track_func()
+        if len(track) != 0:
+            write_func(str_list, track, "V", source_links, reel_names, event_dict, 1)
+    except (IndexError, KeyError) as e:
+        return "error " + e.__class__.__name__
+    return ''.join(str_list)
+
+
 ####---------------Screenshot--------------####
 def screenshot_export():
     length = current_sequence().tractor.get_length()
@@ -312,7 +312,7 @@ class MediaListView(ImageTextTextListView):
         self.storemodel.clear()
         for file_id in current_bin().file_ids:
             media_file = PROJECT().media_files[file_id]
-            row_data = [media_file.icon,
+            row_data = [media_file.get_icon(),
                         media_file.name, 
                         utils.clip_length_string(media_file.length)]
             self.storemodel.append(row_data)
@@ -613,7 +613,7 @@ class ClipInfoPanel(Gtk.VBox):
         self.track.set_text(_("<b>Track: </b>"))
         self.track_value.set_text(track.get_name())
         self.position.set_text(_("<b>Position:</b>"))
-        clip_start_in_tline = track.clip_start(index)
+        clip_start_in_tline = track.clips_index.clip_start(index)
         tc_str = utils.get_tc_string(clip_start_in_tline)
         self.position_value.set_text(tc_str)
         self._set_use_mark_up()
@@ -732,7 +732,13 @@ class MediaPanel():
     def __init__(self, media_file_popup_cb, double_click_cb):
         self.widget = Gtk.VBox()
         self.row_widgets = []
+        self.widget_for_mediafile = {}
         self.selected_objects = []
+        self.row_box = None
+        self.row_filler = None
+        self.end_filler = None
+        self.row_column = 0
+        self.bin_index = 0
         self.columns = editorpersistance.prefs.media_columns
         self.media_file_popup_cb = media_file_popup_cb
         self.double_click_cb = double_click_cb
@@ -812,14 +818,38 @@ class MediaPanel():
         self.widget_for_mediafile = {}
         self.selected_objects = []
 
-        column = 0
-        bin_index = 0
-        row_box = Gtk.HBox()
-        dnd.connect_media_drop_widget(row_box)
-        row_box.set_size_request(MEDIA_OBJECT_WIDGET_WIDTH * self.columns, MEDIA_OBJECT_WIDGET_HEIGHT)
+        # Layout state kept so that media files appended to bin can be added without rebuilding all widgets
+        self.row_box = None # last row if not full
+        self.row_filler = None
+        self.end_filler = None
+        self.row_column = 0
+        self.bin_index = 0
+
+        media_files = []
         for file_id in current_bin().file_ids:
-            media_file = PROJECT().media_files[file_id]
-            
+            media_files.append(PROJECT().media_files[file_id])
+        self._add_media_file_widgets(media_files)
+
+        self.widget.show_all()
+
+    def append_media_files(self, media_files):
+        """
+        Adds widgets for media files that have been appended to current bin
+        after last fill_data_model() call.
+        """
+        self._add_media_file_widgets(media_files)
+
+    def _add_media_file_widgets(self, media_files):
+        # Fillers after last widget are removed and added again after new widgets
+        if self.row_filler != None:
+            self.row_box.remove(self.row_filler)
+            self.row_filler = None
+        if self.end_filler != None:
+            self.widget.remove(self.end_filler)
+            self.row_widgets.remove(self.end_filler)
+            self.end_filler = None
+
+        for media_file in media_files:
             # Filter view
             if ((editorstate.media_view_filter == appconsts.SHOW_VIDEO_FILES) 
                 and (media_file.type != appconsts.VIDEO)):
@@ -836,35 +866,39 @@ class MediaPanel():
             if ((editorstate.media_view_filter == appconsts.SHOW_PATTERN_PRODUCERS) 
                 and (media_file.type != appconsts.PATTERN_PRODUCER)):
                 continue
-                
-            media_object = MediaObjectWidget(media_file, self.media_object_selected, bin_index, self.monitor_indicator)
+
+            if self.row_box == None:
+                self.row_box = Gtk.HBox()
+                dnd.connect_media_drop_widget(self.row_box)
+                self.row_box.set_size_request(MEDIA_OBJECT_WIDGET_WIDTH * self.columns, MEDIA_OBJECT_WIDGET_HEIGHT)
+                self.widget.pack_start(self.row_box, False, False, 0)
+                self.row_widgets.append(self.row_box)
+
+            media_object = MediaObjectWidget(media_file, self.media_object_selected, self.bin_index, self.monitor_indicator)
             dnd.connect_media_files_object_widget(media_object.widget)
             dnd.connect_media_files_object_cairo_widget(media_object.img)
             self.widget_for_mediafile[media_file] = media_object
-            row_box.pack_start(media_object.widget, False, False, 0)
-            column += 1
-            if column == self.columns:
+            self.row_box.pack_start(media_object.widget, False, False, 0)
+            self.row_column += 1
+            if self.row_column == self.columns:
                 filler = self._get_empty_filler()
-                row_box.pack_start(filler, True, True, 0)
-                self.widget.pack_start(row_box, False, False, 0)
-                self.row_widgets.append(row_box)
-                row_box = Gtk.HBox()
-                column = 0
-            bin_index += 1
-
-        if column != 0:
-            filler = self._get_empty_filler()
-            dnd.connect_media_drop_widget(filler)
-            row_box.pack_start(filler, True, True, 0)
-            self.widget.pack_start(row_box, False, False, 0)
-            self.row_widgets.append(row_box)
-
-        filler = self._get_empty_filler()
-        dnd.connect_media_drop_widget(filler)
-        self.row_widgets.append(filler)
-        self.widget.pack_start(filler, True, True, 0)
-
-        self.widget.show_all()
+                self.row_box.pack_start(filler, True, True, 0)
+                self.row_box.show_all()
+                self.row_box = None
+                self.row_column = 0
+            self.bin_index += 1
+
+        if self.row_box != None:
+            self.row_filler = self._get_empty_filler()
+            dnd.connect_media_drop_widget(self.row_filler)
+            self.row_box.pack_start(self.row_filler, True, True, 0)
+            self.row_box.show_all()
+
+        self.end_filler = self._get_empty_filler()
+        dnd.connect_media_drop_widget(self.end_filler)
+        self.row_widgets.append(self.end_filler)
+        self.widget.pack_start(self.end_filler, True, True, 0)
+        self.end_filler.show_all()
 
     def _get_empty_filler(self):
         filler = Gtk.EventBox()
@@ -911,7 +945,7 @@ class MediaObjectWidget:
         
     def _draw_icon(self, event, cr, allocation):
         x, y, w, h = allocation
-        cr.set_source_surface(self.media_file.icon, 0, 0)
+        cr.set_source_surface(self.media_file.get_icon(), 0, 0)
         cr.paint()
         if self.media_file == editorstate.MONITOR_MEDIA_FILE():
             cr.set_source_surface(self.indicator_icon, 29, 22)
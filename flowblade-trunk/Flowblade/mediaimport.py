@@ -0,0 +1,148 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module handles probing lengths and writing thumbnails for media files being added to project.
+
+Work is done in a separate import process that runs a pool of worker processes, so that
+decoding happens concurrently and outside the application process. Import process reads file paths
+from stdin and writes a line to stdout for each file as it gets done, in completion order.
+"""
+
+import locale
+import mlt
+import multiprocessing
+import subprocess
+import sys
+
+import editorpersistance
+import mltprofiles
+import projectdata
+import respaths
+import utils
+
+FILE_DONE_TAG = "#&#done:" # import process writes this + file path, length and icon path to stdout when file is ready
+FILE_FAILED_TAG = "#&#fail:" # import process writes this + file path to stdout when file is not valid media
+VALUE_SEPARATOR = "#&#val:"
+
+_thumbnailer = None # Thumbnailer object in import worker processes
+
+
+# ------------------------------------------------- launching import
+def probe_files(file_paths, profile_desc, file_done_callback):
+    """
+    Launches import process for files and calls file_done_callback(file_path, length, icon_path)
+    for each file when it is ready. Length and icon path are None for files that are not valid media.
+
+    Files that import process does not report, e.g. because it crashed, get no callback.
+    Blocks until import process exits, so this needs to be called from a non-GTK thread.
+    """
+    FLOG = open(utils.get_hidden_user_dir_path() + "log_media_import", 'w')
+    process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowblademediaimport", \
+              profile_desc, respaths.ROOT_PATH], \
+              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=FLOG)
+
+    # Import process reads all paths before writing anything, so this does not block on full stdout pipe.
+    process.stdin.write("\n".join(file_paths))
+    process.stdin.close()
+
+    for line in iter(process.stdout.readline, ""):
+        line = line.rstrip("\n")
+        if line.startswith(FILE_DONE_TAG):
+            file_path, length, icon_path = line[len(FILE_DONE_TAG):].split(VALUE_SEPARATOR)
+            file_done_callback(file_path, int(length), icon_path)
+        elif line.startswith(FILE_FAILED_TAG):
+            file_done_callback(line[len(FILE_FAILED_TAG):], None, None)
+        else:
+            FLOG.write(line + "\n")
+
+    process.wait()
+    FLOG.close()
+
+
+# ------------------------------------------------- import process
+def main():
+    # Set paths.
+    root_path = sys.argv[2]
+    respaths.set_paths(root_path)
+
+    # Load editor prefs for thumbnails folder and workers count.
+    editorpersistance.load()
+
+    profile_desc = sys.argv[1]
+    files = [f for f in sys.stdin.read().split("\n") if f != ""]
+    if len(files) == 0:
+        return
+
+    workers_count = min(_get_import_workers_count(), len(files))
+    if workers_count < 2:
+        _init_import_environment(profile_desc)
+        for f in files:
+            _report_file_done(_probe_file(f))
+        return
+
+    # Probe files concurrently in worker processes, each worker initializes its own MLT environment.
+    pool = multiprocessing.Pool(workers_count, _init_import_environment, (profile_desc,))
+    for result in pool.imap_unordered(_probe_file, files):
+        _report_file_done(result)
+    pool.close()
+    pool.join()
+
+def _get_import_workers_count():
+    workers_count = editorpersistance.prefs.media_import_workers
+    if workers_count < 1:
+        try:
+            workers_count = multiprocessing.cpu_count()
+        except NotImplementedError:
+            workers_count = 1
+    return workers_count
+
+def _init_import_environment(profile_desc):
+    # Producers and thumbnail consumers need only MLT and profiles, filters and render profiles are not loaded.
+    mlt.Factory().init()
+
+    # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs
+    locale.setlocale(locale.LC_NUMERIC, 'C')
+
+    mltprofiles.load_profile_list()
+
+    global _thumbnailer
+    _thumbnailer = projectdata.Thumbnailer()
+    _thumbnailer.set_context(mltprofiles.get_profile(profile_desc))
+
+def _probe_file(file_path):
+    # This is run in worker processes when importing with a pool, so it can't let exceptions escape
+    # or the whole pool would go down with one bad media file.
+    try:
+        (icon_path, length) = _thumbnailer.probe_file(file_path)
+    except Exception as e:
+        # stdout is used for reporting results, so messages go to log via stderr
+        sys.stderr.write("media import failed for " + file_path + " " + str(e) + "\n")
+        return (file_path, None, None)
+
+    return (file_path, length, icon_path)
+
+def _report_file_done(result):
+    file_path, length, icon_path = result
+    if length == None:
+        sys.stdout.write(FILE_FAILED_TAG + file_path + "\n")
+    else:
+        sys.stdout.write(FILE_DONE_TAG + file_path + VALUE_SEPARATOR + str(length) + VALUE_SEPARATOR + icon_path + "\n")
+    sys.stdout.flush()
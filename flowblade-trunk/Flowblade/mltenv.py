@@ -27,6 +27,7 @@ import mlt
 import dialogutils
 import editorstate
 import gui
+import mltenvcache
 
 acodecs = None
 vcodecs = None
@@ -45,6 +46,15 @@ def check_available_features(repo):
         global services
         global transitions
         global environment_detection_success
+        # Detection starts avformat consumers and is slow, use values detected earlier if available.
+        cached_env = mltenvcache.get("mltenv")
+        if cached_env != None:
+            acodecs, vcodecs, formats, services, transitions = cached_env
+            print "MLT environment read from cache, " + str(len(formats)) + " formats, "  \
+            + str(len(vcodecs)) + " video codecs and " + str(len(acodecs)) + " audio codecs found."
+            environment_detection_success = True
+            return
+
         acodecs = []
         vcodecs = []
         formats = []
@@ -90,6 +100,7 @@ def check_available_features(repo):
         print str(len(services)) + " MLT services found."
 
         environment_detection_success = True
+        mltenvcache.set("mltenv", (acodecs, vcodecs, formats, services, transitions))
 
     except:
         print "Environment detection failed, environment unknown."
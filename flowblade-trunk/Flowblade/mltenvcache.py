@@ -0,0 +1,122 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module caches detected MLT environment and objects parsed from filter, compositor
+and render encoding XML files on disk, so that application and tool processes do not
+need to start avformat consumers and parse XML on every launch.
+
+Cache is invalidated when MLT version, MLT install or any of the XML files change.
+Values are cached with names by modules that create them, see mltenv.py, mltfilters.py,
+mlttransitions.py and renderconsumer.py.
+"""
+
+import cPickle
+import os
+
+import mlt
+
+import respaths
+import utils
+
+CACHE_FILE = "mltenvcache"
+CACHE_VERSION = 1 # increase when cached objects change
+
+# Paths to MLT install to check for changes, MLT_REPOSITORY env variable is used if set.
+MLT_REPOSITORY_DIRS = ["/usr/lib/mlt", "/usr/lib/x86_64-linux-gnu/mlt", "/usr/lib/i386-linux-gnu/mlt",
+                       "/usr/lib64/mlt", "/usr/local/lib/mlt"]
+
+_cache = None # name -> value dict of cached values for current cache key
+
+
+def get(name):
+    """
+    Returns cached value or None if value is not cached or cache is not valid.
+    """
+    _load_cache()
+    try:
+        return _cache[name]
+    except KeyError:
+        return None
+
+def set(name, value):
+    """
+    Adds value to cache and writes cache file.
+    """
+    _load_cache()
+    _cache[name] = value
+    _write_cache()
+
+def _load_cache():
+    global _cache
+    if _cache != None:
+        return
+
+    _cache = {}
+    try:
+        f = open(_get_cache_path(), "rb")
+        cache_key, cached_values = cPickle.load(f)
+        f.close()
+    except Exception:
+        return # No cache or cache not readable.
+
+    if cache_key == _get_cache_key():
+        _cache = cached_values
+    else:
+        print "MLT environment cache is out of date."
+
+def _write_cache():
+    # Tool processes may write cache at the same time, so we write temp file and rename.
+    cache_path = _get_cache_path()
+    temp_path = cache_path + ".tmp" + str(os.getpid())
+    try:
+        f = open(temp_path, "wb")
+        cPickle.dump((_get_cache_key(), _cache), f, cPickle.HIGHEST_PROTOCOL)
+        f.close()
+        os.rename(temp_path, cache_path)
+    except Exception as e:
+        print "MLT environment cache write failed:", e
+
+def _get_cache_path():
+    return utils.get_hidden_user_dir_path() + CACHE_FILE
+
+def _get_cache_key():
+    try:
+        mlt_version = mlt.LIBMLT_VERSION
+    except:
+        mlt_version = "0.0.99"
+
+    key_paths = [respaths.FILTERS_XML_DOC,
+                 respaths.COMPOSITORS_XML_DOC,
+                 respaths.ROOT_PATH + "/res/render/renderencoding.xml",
+                 os.path.dirname(mlt.__file__)]
+    if os.getenv("MLT_REPOSITORY") != None:
+        key_paths.append(os.getenv("MLT_REPOSITORY"))
+    else:
+        key_paths = key_paths + MLT_REPOSITORY_DIRS
+
+    mtimes = []
+    for path in key_paths:
+        try:
+            mtimes.append((path, os.stat(path).st_mtime))
+        except Exception:
+            mtimes.append((path, None))
+
+    return (CACHE_VERSION, mlt_version, mtimes)
@@ -33,6 +33,7 @@ import xml.dom.minidom
 import appconsts
 import editorstate
 from editorstate import PROJECT
+import mltenvcache
 import mltrefhold
 import propertyparse
 import respaths
@@ -370,14 +371,20 @@ def load_filters_xml(services):
     
     print "Loading filters..."
     
-    global filters_doc
-    filters_doc = xml.dom.minidom.parse(respaths.FILTERS_XML_DOC)
+    # Parsing filters document is slow, use FilterInfo objects created earlier if available.
+    # Version and service checks below are done every time.
+    filter_infos = mltenvcache.get("filterinfos")
+    if filter_infos == None:
+        global filters_doc
+        filters_doc = xml.dom.minidom.parse(respaths.FILTERS_XML_DOC)
+        filter_infos = []
+        filter_nodes = filters_doc.getElementsByTagName(FILTER)
+        for f_node in filter_nodes:
+            filter_infos.append(FilterInfo(f_node))
+        mltenvcache.set("filterinfos", filter_infos)
 
     load_groups = {}
-    filter_nodes = filters_doc.getElementsByTagName(FILTER)
-    for f_node in filter_nodes:
-        filter_info = FilterInfo(f_node)
-
+    for filter_info in filter_infos:
         if filter_info.mlt_drop_version != "":
             if editorstate.mlt_version_is_equal_or_greater(filter_info.mlt_drop_version):
                 print filter_info.name + " dropped, MLT version too high for this filter."
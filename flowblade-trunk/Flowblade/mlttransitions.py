@@ -28,6 +28,7 @@ import os
 import xml.dom.minidom
 
 import appconsts
+import mltenvcache
 import mltrefhold
 import patternproducer
 import propertyparse
@@ -343,12 +344,17 @@ def load_compositors_xml(transitions):
     Load filters document and create MLTCompositorInfo objects and
     put them in dict mlt_compositor_infos with names as keys.
     """
-    compositors_doc = xml.dom.minidom.parse(respaths.COMPOSITORS_XML_DOC)
-
     print "Loading transitions..."
-    compositor_nodes = compositors_doc.getElementsByTagName(COMPOSITOR)
-    for c_node in compositor_nodes:
-        compositor_info = CompositorTransitionInfo(c_node)
+    compositor_infos = mltenvcache.get("compositorinfos")
+    if compositor_infos == None:
+        compositors_doc = xml.dom.minidom.parse(respaths.COMPOSITORS_XML_DOC)
+        compositor_infos = []
+        compositor_nodes = compositors_doc.getElementsByTagName(COMPOSITOR)
+        for c_node in compositor_nodes:
+            compositor_infos.append(CompositorTransitionInfo(c_node))
+        mltenvcache.set("compositorinfos", compositor_infos)
+
+    for compositor_info in compositor_infos:
         if (not compositor_info.mlt_service_id in transitions) and len(transitions) > 0:
             print "MLT transition " + compositor_info.mlt_service_id + " not found."
             global not_found_transitions
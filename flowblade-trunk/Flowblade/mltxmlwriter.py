@@ -0,0 +1,263 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module writes MLT XML for a sequence directly from sequence.Sequence object model.
+
+Document is created in one pass over tracks, clips, filters and compositors without
+connecting an MLT "xml" consumer to the sequence tractor, so app player does not need to be
+stopped and disconnected when sequence is exported as MLT XML or EDL.
+"""
+
+from gi.repository import Gdk
+
+import mlt
+import threading
+from xml.sax.saxutils import escape, quoteattr
+
+import sequence
+
+# Same properties that MLT "xml" consumer leaves out, in and out are written as attributes.
+NOT_SERIALIZED_PROPERTIES = ["mlt_type", "in", "out", "id", "title", "root", "width", "height"]
+
+# track.mute_state values as "hide" attribute values of tractor tracks
+TRACK_HIDE_VALUES = {1:"video", 2:"audio", 3:"both"}
+
+INDENT = "  "
+
+
+# ------------------------------------------------- writing
+def get_sequence_xml(seq):
+    """
+    Returns MLT XML document for sequence as string.
+    """
+    writer = SequenceXMLWriter(seq)
+    return writer.get_xml()
+
+
+class SequenceXMLWriter:
+    """
+    Creates MLT XML document lines for a sequence.
+    """
+    def __init__(self, seq):
+        self.seq = seq
+        self.lines = []
+        self.producer_ids = {} # python object id -> MLT XML producer id
+        self.filters_count = 0
+        self.transitions_count = 0
+
+    def get_xml(self):
+        try:
+            mlt_version = mlt.LIBMLT_VERSION
+        except:
+            mlt_version = "0.0.99"
+
+        self.lines.append('<?xml version="1.0" encoding="utf-8"?>')
+        self.lines.append('<mlt LC_NUMERIC="C" version=' + quoteattr(str(mlt_version)) \
+                          + ' title=' + quoteattr(str(self.seq.name)) + ' producer="tractor0">')
+        self._write_profile(self.seq.profile)
+
+        for track in self.seq.tracks:
+            self._write_track_producers(track)
+            self._write_playlist(track)
+
+        self._write_tractor()
+        self.lines.append('</mlt>')
+        self.lines.append("")
+
+        return "\n".join(self.lines)
+
+    def _write_profile(self, profile):
+        attrs = [("description", profile.description()),
+                 ("width", profile.width()),
+                 ("height", profile.height()),
+                 ("progressive", profile.progressive()),
+                 ("sample_aspect_num", profile.sample_aspect_num()),
+                 ("sample_aspect_den", profile.sample_aspect_den()),
+                 ("display_aspect_num", profile.display_aspect_num()),
+                 ("display_aspect_den", profile.display_aspect_den()),
+                 ("frame_rate_num", profile.frame_rate_num()),
+                 ("frame_rate_den", profile.frame_rate_den()),
+                 ("colorspace", profile.colorspace())]
+        self.lines.append(INDENT + '<profile' + _get_attrs_str(attrs) + '/>')
+
+    def _write_track_producers(self, track):
+        # Producers need to be declared before playlists that refer to them.
+        for clip in self._get_track_clips(track):
+            if clip.is_blanck_clip == True or id(clip) in self.producer_ids:
+                continue
+
+            producer_id = "producer" + str(len(self.producer_ids))
+            self.producer_ids[id(clip)] = producer_id
+
+            attrs = [("id", producer_id), ("in", 0), ("out", clip.get_length() - 1)]
+            self.lines.append(INDENT + '<producer' + _get_attrs_str(attrs) + '>')
+            self._write_properties(clip, 2)
+            for mlt_filter in _get_clip_mlt_filters(clip):
+                self._write_filter(mlt_filter, 2)
+            self.lines.append(INDENT + '</producer>')
+
+    def _write_playlist(self, track):
+        self.lines.append(INDENT + '<playlist id=' + quoteattr(_get_playlist_id(track)) + '>')
+        for clip in self._get_track_clips(track):
+            if clip.is_blanck_clip == True:
+                length = clip.clip_out - clip.clip_in + 1
+                self.lines.append(INDENT * 2 + '<blank length="' + str(length) + '"/>')
+            else:
+                attrs = [("producer", self.producer_ids[id(clip)]), ("in", clip.clip_in), ("out", clip.clip_out)]
+                self.lines.append(INDENT * 2 + '<entry' + _get_attrs_str(attrs) + '/>')
+
+        for mlt_filter in [getattr(track, "gain_filter", None), getattr(track, "pan_filter", None)]:
+            if mlt_filter != None:
+                self._write_filter(mlt_filter, 2)
+        self.lines.append(INDENT + '</playlist>')
+
+    def _write_tractor(self):
+        seq = self.seq
+        attrs = [("id", "tractor0"), ("in", 0), ("out", seq.get_length() - 1)]
+        self.lines.append(INDENT + '<tractor' + _get_attrs_str(attrs) + '>')
+        for track in seq.tracks:
+            attrs = [("producer", _get_playlist_id(track))]
+            if int(track.mute_state) in TRACK_HIDE_VALUES:
+                attrs.append(("hide", TRACK_HIDE_VALUES[int(track.mute_state)]))
+            self.lines.append(INDENT * 2 + '<track' + _get_attrs_str(attrs) + '/>')
+
+        # Audio mix transitions are not kept in sequence, these are the ones Sequence.add_track() plants.
+        for track in seq.tracks[sequence.AUDIO_MIX_DOWN_TRACK + 1:len(seq.tracks) - 1]:
+            props = [("mlt_service", "mix"),
+                     ("a_track", sequence.AUDIO_MIX_DOWN_TRACK),
+                     ("b_track", track.id),
+                     ("always_active", 1),
+                     ("combine", 1)]
+            self._write_transition_element(props, None, 2)
+
+        for compositor in seq.compositors:
+            self._write_transition(compositor, 2)
+
+        # Output filters for monitor (vectorscope, rgbparade) are not part of sequence and are left out.
+        for mlt_filter in [seq.tractor.gain_filter, getattr(seq.tractor, "pan_filter", None), seq.watermark_filter]:
+            if mlt_filter != None:
+                self._write_filter(mlt_filter, 2)
+        self.lines.append(INDENT + '</tractor>')
+
+    def _write_transition(self, compositor, indent_level):
+        mlt_transition = compositor.transition.mlt_transition
+        props = _get_properties(mlt_transition)
+        self._write_transition_element(props, (compositor.clip_in, compositor.clip_out), indent_level)
+
+    def _write_transition_element(self, props, in_out, indent_level):
+        attrs = [("id", "transition" + str(self.transitions_count))]
+        if in_out != None:
+            attrs = attrs + [("in", in_out[0]), ("out", in_out[1])]
+        self.transitions_count += 1
+        self.lines.append(INDENT * indent_level + '<transition' + _get_attrs_str(attrs) + '>')
+        self._write_props_list(props, indent_level + 1)
+        self.lines.append(INDENT * indent_level + '</transition>')
+
+    def _write_filter(self, mlt_filter, indent_level):
+        attrs = [("id", "filter" + str(self.filters_count))]
+        for name in ["in", "out"]:
+            value = mlt_filter.get(name)
+            if value != None and value != "":
+                attrs.append((name, value))
+        self.filters_count += 1
+        self.lines.append(INDENT * indent_level + '<filter' + _get_attrs_str(attrs) + '>')
+        self._write_properties(mlt_filter, indent_level + 1)
+        self.lines.append(INDENT * indent_level + '</filter>')
+
+    def _write_properties(self, mlt_properties, indent_level):
+        self._write_props_list(_get_properties(mlt_properties), indent_level)
+
+    def _write_props_list(self, props, indent_level):
+        for name, value in props:
+            self.lines.append(INDENT * indent_level + '<property name=' + quoteattr(name) + '>' \
+                              + escape(str(value)) + '</property>')
+
+    def _get_track_clips(self, track):
+        # Hidden track only displays monitor and trim clips in editor and is written empty.
+        if track.id == len(self.seq.tracks) - 1:
+            return []
+        return track.clips
+
+
+# ------------------------------------------------- module funcs
+def _get_playlist_id(track):
+    return "playlist" + str(track.id)
+
+def _get_attrs_str(attrs):
+    attrs_str = ""
+    for name, value in attrs:
+        attrs_str += " " + name + "=" + quoteattr(str(value))
+    return attrs_str
+
+def _get_properties(mlt_properties):
+    # Returns list of (name, value) tuples of serialized properties of MLT object.
+    props = []
+    for i in range(0, mlt_properties.count()):
+        name = mlt_properties.get_name(i)
+        if name == None or name.startswith("_") or name in NOT_SERIALIZED_PROPERTIES:
+            continue
+        value = mlt_properties.get(i)
+        if value == None or value == "":
+            continue
+        props.append((name, value))
+    return props
+
+def _get_clip_mlt_filters(clip):
+    mlt_filters = []
+    for filter_object in clip.filters:
+        try:
+            mlt_filters = mlt_filters + filter_object.mlt_filters # mltfilters.MultipartFilterObject
+        except AttributeError:
+            mlt_filters.append(filter_object.mlt_filter)
+    if clip.mute_filter != None:
+        mlt_filters.append(clip.mute_filter.mlt_filter)
+    return mlt_filters
+
+
+# ------------------------------------------------- worker thread
+class XMLWriteThread(threading.Thread):
+    """
+    Writes MLT XML for sequence and calls render_done_callback(data) when done.
+    Player keeps running, document is created while holding GDK lock so that no edits
+    are done to sequence while it is being read.
+    """
+    def __init__(self, seq, file_name, callback, data):
+        self.seq = seq
+        self.file_name = file_name
+        self.render_done_callback = callback
+        self.data = data
+
+        threading.Thread.__init__(self)
+
+    def run(self):
+        Gdk.threads_enter()
+        try:
+            xml_str = get_sequence_xml(self.seq)
+        finally:
+            Gdk.threads_leave()
+
+        f = open(self.file_name, "w")
+        f.write(xml_str)
+        f.close()
+
+        Gdk.threads_enter()
+        self.render_done_callback(self.data)
+        Gdk.threads_leave()
@@ -34,6 +34,7 @@ from editorstate import current_sequence
 from editorstate import get_track
 from editorstate import PLAYER
 import gui
+import previewcache
 import updater
 import tlinewidgets
 import utils
@@ -66,6 +67,7 @@ edit_data = None
 # These four buttons act differently in trimmodes and move modes
 def play_pressed():
     # This handles only move modes, see trimmodes.py module for others.
+    previewcache.refresh_display()
     PLAYER().start_playback()  
 
 def stop_pressed():
@@ -103,6 +105,7 @@ def set_range_selection(track_index, range_in, range_out, is_selected):
     track = get_track(track_index)
     for i in range(range_in, range_out + 1): #+1, range_out is inclusive
         track.clips[i].selected = is_selected
+    tlinewidgets.damage_track_layers([track.id])
     
 
 def select_clip(track_index, clip_index):
@@ -151,7 +154,7 @@ def _get_blanck_range_limit(track, clip_index, delta):
     return clip_index - delta
 
 def select_blank_range(track, clip):
-    clip_index = track.clips.index(clip)
+    clip_index = track.clips_index.clip_index(clip)
     range_in, range_out = _get_blanck_range(track, clip_index)
     _select_multiple_clips(track.id, range_in, range_out)
             
@@ -200,7 +203,7 @@ def insert_move_release(x, y, frame, state):
     # Get tracks and insert index
     track = edit_data["track_object"]
     to_track = edit_data["to_track_object"]
-    insert_index = to_track.get_clip_index_at(attempt_insert_frame)
+    insert_index = to_track.clips_index.get_clip_index_at(attempt_insert_frame)
     
     # Check locking of target track. Source track checked at press event.
     if _track_is_locked(to_track):
@@ -211,7 +214,7 @@ def insert_move_release(x, y, frame, state):
 
     # Update data for editmode overlay
     edit_data["current_frame"] = frame
-    edit_data["insert_frame"] = track.clip_start(insert_index)
+    edit_data["insert_frame"] = track.clips_index.clip_start(insert_index)
 
     # Collect selection data
     range_in = edit_data["selected_range_in"]
@@ -241,7 +244,7 @@ def insert_move_release(x, y, frame, state):
             select_index = insert_index
             if (range_in < insert_index):#when moving forward clips are removed affecting later indexes
                 select_index = insert_index - (old_range_length + 1)
-            PLAYER().seek_frame(track.clip_start(select_index), False)
+            PLAYER().seek_frame(track.clips_index.clip_start(select_index), False)
         else:
             _move_mode_released()
     else: # insert to different track 
@@ -249,7 +252,7 @@ def insert_move_release(x, y, frame, state):
         clear_selected_clips()
         action = edit.multitrack_insert_move_action(data)
         action.do_edit()
-        PLAYER().seek_frame(to_track.clip_start(insert_index), False)
+        PLAYER().seek_frame(to_track.clips_index.clip_start(insert_index), False)
 
     # Clear edit mode data
     edit_data = None
@@ -486,7 +489,7 @@ def _move_mode_pressed(event, frame):
         clip_lengths.append(clip.clip_out - clip.clip_in + 1)
 
     # Overwrite mode ignores this
-    insert_frame = track.clip_start(selected_range_in)
+    insert_frame = track.clips_index.clip_start(selected_range_in)
     
     # Set edit mode data. This is not used unless mouse delta big enough
     # to initiate move.
@@ -534,9 +537,9 @@ def _move_mode_move(frame, x, y):
     edit_data["to_track_object"] = to_track
 
     # Get index for insert in target track
-    insert_index = to_track.get_clip_index_at(attempt_insert_frame)
+    insert_index = to_track.clips_index.get_clip_index_at(attempt_insert_frame)
     edit_data["insert_index"] = insert_index
-    edit_data["insert_frame"] = to_track.clip_start(insert_index)
+    edit_data["insert_frame"] = to_track.clips_index.clip_start(insert_index)
     
     _set_current_move_frame_and_check_move_start(frame, x, y)
 
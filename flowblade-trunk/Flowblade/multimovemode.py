@@ -65,7 +65,7 @@ class MultimoveData:
             else:
                 clip_index = current_sequence().get_clip_index(track, self.first_moved_frame)
                 first_frame_clip = track.clips[clip_index]
-                clip_first_frame = track.clip_start(clip_index)
+                clip_first_frame = track.clips_index.clip_start(clip_index)
 
                 # Case: frame after track last clip, no clips are moved
                 if clip_index == -1:
@@ -86,8 +86,8 @@ class MultimoveData:
                             track_max_deltas.append(0)
                             trim_blank_indexes.append(clip_index)
                         else:
-                            blank_clip_start_frame = track.clip_start(clip_index + 1)
-                            moved_clip_start_frame = track.clip_start(clip_index + 2)
+                            blank_clip_start_frame = track.clips_index.clip_start(clip_index + 1)
+                            moved_clip_start_frame = track.clips_index.clip_start(clip_index + 2)
                             track_max_deltas.append(moved_clip_start_frame - blank_clip_start_frame)
                             trim_blank_indexes.append(clip_index - 1) 
                     continue
@@ -108,8 +108,8 @@ class MultimoveData:
                             track_max_deltas.append(0)
                             trim_blank_indexes.append(clip_index + 1)
                         else:
-                            blank_clip_start_frame = track.clip_start(clip_index + 1)
-                            moved_clip_start_frame = track.clip_start(clip_index + 2)
+                            blank_clip_start_frame = track.clips_index.clip_start(clip_index + 1)
+                            moved_clip_start_frame = track.clips_index.clip_start(clip_index + 2)
                             track_max_deltas.append(moved_clip_start_frame - blank_clip_start_frame)
                             trim_blank_indexes.append(clip_index + 1) 
                 # Case: frame on blank
@@ -213,7 +213,7 @@ def mouse_press(event, frame):
     else:
         move_all = True
 
-    first_moved_frame = track.clip_start(clip_index)
+    first_moved_frame = track.clips_index.clip_start(clip_index)
     multi_data = MultimoveData(track, first_moved_frame, move_all)
     
     edit_data = {"track_id":track.id,
@@ -199,6 +199,13 @@ class AbstractBinClip: # not extends projectdata.MediaFile? too late, too late.
     def create_icon(self):
         print "patter producer create_icon() not implemented"
 
+    def get_icon(self):
+        try:
+            return self.icon
+        except AttributeError: # icons are not saved with project
+            self.create_icon()
+            return self.icon
+
 class BinColorClip(AbstractBinClip):
     """
     Color Clip that can added to and edited in Sequence.
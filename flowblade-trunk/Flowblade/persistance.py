@@ -27,10 +27,13 @@ and then create MLT objects from pickled objects when project is loaded.
 """
 
 import copy
+import cPickle
 import glob
 import fnmatch
 import os
 import pickle
+import struct
+import threading
 import time
 
 from gi.repository import Gtk
@@ -50,13 +53,22 @@ import utils
 # Unpickleable attributes for all objects
 # These are removed at save and recreated at load.
 PROJECT_REMOVE = ['profile','c_seq']
-SEQUENCE_REMOVE = ['profile','field','multitrack','tractor','monitor_clip','vectorscope','audiowave','rgbparade','outputfilter','watermark_filter']
-PLAY_LIST_REMOVE = ['this','sequence','get_name','gain_filter','pan_filter']
+SEQUENCE_REMOVE = ['profile','field','multitrack','tractor','monitor_clip','vectorscope','audiowave','rgbparade','outputfilter','watermark_filter','compositors_index','lazy_load_file_path']
+PLAY_LIST_REMOVE = ['this','sequence','get_name','gain_filter','pan_filter','clips_index']
 CLIP_REMOVE = ['this','clip_length']
 TRANSITION_REMOVE = ['this']
 FILTER_REMOVE = ['mlt_filter','mlt_filters']
 MEDIA_FILE_REMOVE = ['icon']
 
+# Project file container format.
+# File starts with header and section table followed by pickled sections.
+# First section is project object with sequences removed, rest are sequences in project order.
+# Project files saved with earlier versions are single protocol 0 pickles.
+PROJECT_FILE_MAGIC = "FLBPROJ\0"
+PROJECT_FILE_VERSION = 1
+_PROJECT_FILE_HEADER = struct.Struct("<8sHHI") # magic, container version, pickle protocol, sections count
+_PROJECT_FILE_SECTION = struct.Struct("<QQ") # section offset, section length
+
 # Used to flag a not found relative path
 NOT_FOUND = "/not_found_not_found/not_found"
 
@@ -111,10 +123,22 @@ def _show_msg(msg, delay=0.0):
 # -------------------------------------------------- SAVE
 def save_project(project, file_path, changed_profile_desc=None):
     """
-    Creates pickleable project object
+    Creates pickleable project object and writes it to file
     """
     print "Save project " + os.path.basename(file_path)
     
+    s_proj = get_p_project(project, changed_profile_desc)
+
+    # Write out file.
+    _write_project_file(s_proj, file_path)
+
+def get_p_project(project, changed_profile_desc=None, pickled_sequences=None):
+    """
+    Creates pickleable project object.
+
+    pickled_sequences maps sequence -> pickled sequence section from earlier write,
+    these are used as is instead of creating pickleable sequence objects.
+    """
     # Get shallow copy
     s_proj = copy.copy(project)
     
@@ -165,15 +189,87 @@ def save_project(project, file_path, changed_profile_desc=None):
     sequences = []
     for i in range(0, len(project.sequences)):
         add_seq = project.sequences[i]
-        sequences.append(get_p_sequence(add_seq))
+        if pickled_sequences != None and add_seq in pickled_sequences:
+            sequences.append(pickled_sequences[add_seq])
+        else:
+            sequences.append(get_p_sequence(add_seq))
     s_proj.sequences = sequences
 
     # Remove unpickleable attributes
     remove_attrs(s_proj, PROJECT_REMOVE)
 
-    # Write out file.
+    return s_proj
+
+def _write_project_file(s_proj, file_path):
+    """
+    Writes project in container format with project and each sequence pickled in separate sections.
+    Returns list of written sections.
+    """
+    sections = get_project_sections(s_proj)
+    _write_project_sections(sections, file_path)
+    return sections
+
+def get_project_sections(s_proj):
+    """
+    Returns list of pickled project file sections, project first and then sequences.
+    Sequences that are already pickled sections are used as is.
+    """
+    s_sequences = s_proj.sequences
+    s_proj.sequences = []
+    try:
+        sections = [cPickle.dumps(s_proj, cPickle.HIGHEST_PROTOCOL)]
+    finally:
+        s_proj.sequences = s_sequences
+    for s_seq in s_sequences:
+        if isinstance(s_seq, str):
+            sections.append(s_seq)
+        else:
+            sections.append(cPickle.dumps(s_seq, cPickle.HIGHEST_PROTOCOL))
+    return sections
+
+def _write_project_sections(sections, file_path):
+    # Write to temp file and rename, so that an interrupted save does not destroy existing file.
+    temp_path = file_path + ".tmp"
+    write_file = file(temp_path, "wb")
+    write_file.write(_PROJECT_FILE_HEADER.pack(PROJECT_FILE_MAGIC, PROJECT_FILE_VERSION, cPickle.HIGHEST_PROTOCOL, len(sections)))
+    offset = _PROJECT_FILE_HEADER.size + len(sections) * _PROJECT_FILE_SECTION.size
+    for section in sections:
+        write_file.write(_PROJECT_FILE_SECTION.pack(offset, len(section)))
+        offset += len(section)
+    for section in sections:
+        write_file.write(section)
+    write_file.close()
+    os.rename(temp_path, file_path)
+
+class ProjectWriteThread(threading.Thread):
+    """
+    Writes project file sections created with get_project_sections() to file.
+    Used to do disk write without blocking GUI. Sections are pickled in GUI thread before
+    this is started, pickleable project objects share data that GUI thread edits.
+    """
+    def __init__(self, sections, file_path, completed_callback):
+        threading.Thread.__init__(self)
+        self.sections = sections
+        self.file_path = file_path
+        self.completed_callback = completed_callback # called from this thread with (thread, succeeded)
+        self.write_time = 0.0
+
+    def run(self):
+        start = time.time()
+        try:
+            _write_project_sections(self.sections, self.file_path)
+            succeeded = True
+        except Exception as e:
+            print "Project write failed:", self.file_path, e
+            succeeded = False
+        self.write_time = time.time() - start
+        self.completed_callback(self, succeeded)
+
+def _write_pickle_project_file(s_proj, file_path):
+    # Project file format used before container format, kept for benchmarking.
     write_file = file(file_path, "wb")
     pickle.dump(s_proj, write_file)
+    write_file.close()
 
 def get_p_sequence(sequence):
     """
@@ -188,6 +284,11 @@ def get_p_sequence(sequence):
         tracks.append(get_p_playlist(track))
     s_seq.tracks = tracks
 
+    # Preview cache clips on hidden track are only for playback and are saved as blanks.
+    for s_clip in tracks[-1].clips:
+        if getattr(s_clip, "is_preview_cache_clip", False) == True:
+            s_clip.is_blanck_clip = True
+
     # Replace compositors with pwckleable objects
     s_compositors = get_p_compositors(sequence.compositors)
     s_seq.compositors = s_compositors
@@ -318,8 +419,7 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
     _show_msg("Unpickling")
 
     # Load project object
-    f = open(file_path)
-    project = pickle.load(f)
+    project, is_container_file = _read_project_file(file_path)
 
     project.name = project.name.encode("utf-8")
 
@@ -349,23 +449,14 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
         raise ProjectProfileNotFoundError(project.profile_desc)
 
     # Add MLT objects to sequences.
-    global all_clips, sync_clips
-    for seq in project.sequences:
-        FIX_N_TO_3_SEQUENCE_COMPATIBILITY(seq)
-        _show_msg(_("Building sequence ") + seq.name)
-        all_clips = {}
-        sync_clips = []
-                
-        seq.profile = project.profile
-        fill_sequence_mlt(seq, project.SAVEFILE_VERSION)
-
-        handle_seq_watermark(seq)
-
-        if not hasattr(seq, "seq_len"):
-            seq.update_edit_tracks_length()
-
-    all_clips = {}
-    sync_clips = []
+    # Container files are always written with current SAVEFILE_VERSION, so only the current sequence
+    # needs to be built now and others are built when first displayed, see build_sequence_mlt_if_needed().
+    for i in range(0, len(project.sequences)):
+        seq = project.sequences[i]
+        if is_container_file and i != project.c_seq_index:
+            seq.lazy_load_file_path = file_path
+            continue
+        _build_sequence_mlt(project, seq)
 
     for k, media_file in project.media_files.iteritems():
         if project.SAVEFILE_VERSION < 4:
@@ -381,10 +472,7 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
         if (not(hasattr(media_file,  "is_proxy_file"))):
             FIX_N_TO_4_MEDIA_FILE_COMPATIBILITY(media_file)
 
-    if icons_and_thumnails == True:
-        _show_msg(_("Loading icons"))
-        for k, media_file in project.media_files.iteritems():
-            media_file.create_icon()
+    # Media file icons are created when media panel draws them.
     
     project.c_seq = project.sequences[project.c_seq_index]
     if icons_and_thumnails == True:
@@ -392,6 +480,77 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
 
     return project
 
+def _read_project_file(file_path):
+    """
+    Returns (project, is_container_file) tuple. Project sequences are unpickled but have no MLT objects.
+    """
+    f = open(file_path, "rb")
+    header = f.read(_PROJECT_FILE_HEADER.size)
+    if len(header) < _PROJECT_FILE_HEADER.size or header[0:len(PROJECT_FILE_MAGIC)] != PROJECT_FILE_MAGIC:
+        # Project file saved before container format
+        f.seek(0)
+        project = pickle.load(f)
+        f.close()
+        return (project, False)
+
+    magic, version, protocol, sections_count = _PROJECT_FILE_HEADER.unpack(header)
+    if version > PROJECT_FILE_VERSION:
+        f.close()
+        raise IOError("Project file container version " + str(version) + " not supported")
+
+    sections_table = f.read(sections_count * _PROJECT_FILE_SECTION.size)
+    sections = []
+    for i in range(0, sections_count):
+        offset, length = _PROJECT_FILE_SECTION.unpack_from(sections_table, i * _PROJECT_FILE_SECTION.size)
+        f.seek(offset)
+        sections.append(f.read(length))
+    f.close()
+
+    project = cPickle.loads(sections[0])
+    project.sequences = []
+    for section in sections[1:]:
+        project.sequences.append(cPickle.loads(section))
+
+    return (project, True)
+
+def build_sequence_mlt_if_needed(seq):
+    """
+    Creates MLT objects for sequence that was not built when project was loaded.
+    Needs to be called before sequence is made current sequence.
+    """
+    if not hasattr(seq, "lazy_load_file_path"):
+        return
+
+    global _load_file_path, show_messages
+    _load_file_path = seq.lazy_load_file_path
+    del seq.lazy_load_file_path
+
+    # Load dialog is not available after project load.
+    messages = show_messages
+    show_messages = False
+    try:
+        _build_sequence_mlt(editorstate.project, seq)
+    finally:
+        show_messages = messages
+
+def _build_sequence_mlt(project, seq):
+    global all_clips, sync_clips
+    FIX_N_TO_3_SEQUENCE_COMPATIBILITY(seq)
+    _show_msg(_("Building sequence ") + seq.name)
+    all_clips = {}
+    sync_clips = []
+
+    seq.profile = project.profile
+    fill_sequence_mlt(seq, project.SAVEFILE_VERSION)
+
+    handle_seq_watermark(seq)
+
+    if not hasattr(seq, "seq_len"):
+        seq.update_edit_tracks_length()
+
+    all_clips = {}
+    sync_clips = []
+
 def fill_sequence_mlt(seq, SAVEFILE_VERSION):
     """
     Replaces sequences py objects with mlt objects
@@ -651,6 +810,58 @@ def get_img_seq_relative_path(project_file_path, asset_path):
     return NOT_FOUND # no relative path found
         
     
+# ------------------------------------------------------- benchmark
+def project_file_benchmark(sequences_count=20, rounds=3):
+    """
+    Prints save and load times for project with sequences_count copies of current sequence
+    using pickle project file format and container project file format.
+
+    Run with 'flowblade -projectfilebenchmark' with a project that has clips on current sequence open.
+    """
+    global show_messages
+    messages = show_messages
+    show_messages = False
+
+    project = editorstate.project
+    container_path = utils.get_hidden_user_dir_path() + "benchmark_container.flb"
+    pickle_path = utils.get_hidden_user_dir_path() + "benchmark_pickle.flb"
+
+    # Create benchmark project files
+    s_proj = get_p_project(project)
+    s_seq = s_proj.sequences[s_proj.c_seq_index]
+    s_proj.sequences = []
+    for i in range(0, sequences_count):
+        s_seq_copy = copy.deepcopy(s_seq)
+        s_seq_copy.name = s_seq.name + "_" + str(i + 1)
+        s_proj.sequences.append(s_seq_copy)
+    s_proj.c_seq_index = 0
+    _write_project_file(s_proj, container_path)
+    _write_pickle_project_file(s_proj, pickle_path)
+
+    print "Project file benchmark,", sequences_count, "sequences,", rounds, "rounds, best times:"
+    for name, path, write_func in [("pickle", pickle_path, _write_pickle_project_file),
+                                   ("container", container_path, _write_project_file)]:
+        load_times = []
+        save_times = []
+        for i in range(0, rounds):
+            start = time.time()
+            loaded_project = load_project(path, False)
+            load_times.append(time.time() - start)
+
+            start = time.time()
+            write_func(get_p_project(loaded_project), path)
+            save_times.append(time.time() - start)
+        print "%s: load %.3f s, save %.3f s, file size %d bytes" % (name, min(load_times), min(save_times), os.path.getsize(path))
+
+    os.remove(container_path)
+    os.remove(pickle_path)
+
+    # load_project() sets loaded project as editorstate.project
+    editorstate.project = project
+    resync.sequence_changed(project.c_seq)
+    show_messages = messages
+
+
 # ------------------------------------------------------- backwards compability
 def FIX_N_TO_3_COMPOSITOR_COMPABILITY(compositor, SAVEFILE_VERSION):
     if SAVEFILE_VERSION == 1:
@@ -118,6 +118,44 @@ def _general_options_panel(folder_select_clicked_cb, render_folder_select_clicke
     load_order_combo.append_text("Absolute paths only")
     load_order_combo.set_active(prefs.media_load_order)
 
+    spin_adj = Gtk.Adjustment(prefs.audio_levels_render_workers, 1, editorpersistance.AUDIO_LEVELS_WORKERS_MAX, 1)
+    levels_workers_spin = Gtk.SpinButton()
+    levels_workers_spin.set_adjustment(spin_adj)
+    levels_workers_spin.set_numeric(True)
+
+    spin_adj = Gtk.Adjustment(prefs.audio_levels_cache_size, editorpersistance.AUDIO_LEVELS_CACHE_MIN, editorpersistance.AUDIO_LEVELS_CACHE_MAX, 8)
+    levels_cache_spin = Gtk.SpinButton()
+    levels_cache_spin.set_adjustment(spin_adj)
+    levels_cache_spin.set_numeric(True)
+
+    spin_adj = Gtk.Adjustment(prefs.media_import_workers, 1, editorpersistance.MEDIA_IMPORT_WORKERS_MAX, 1)
+    import_workers_spin = Gtk.SpinButton()
+    import_workers_spin.set_adjustment(spin_adj)
+    import_workers_spin.set_numeric(True)
+
+    spin_adj = Gtk.Adjustment(prefs.proxy_render_workers, 1, editorpersistance.PROXY_RENDER_WORKERS_MAX, 1)
+    proxy_workers_spin = Gtk.SpinButton()
+    proxy_workers_spin.set_adjustment(spin_adj)
+    proxy_workers_spin.set_numeric(True)
+
+    img_seq_proxy_format_combo = Gtk.ComboBoxText()
+    img_seq_proxy_format_combo.append_text("PNG")
+    img_seq_proxy_format_combo.append_text("JPEG")
+    img_seq_proxy_format_combo.set_active(prefs.img_seq_proxy_format)
+
+    spin_adj = Gtk.Adjustment(prefs.img_seq_proxy_compression, 0, editorpersistance.IMG_SEQ_PROXY_COMPRESSION_MAX, 1)
+    img_seq_proxy_compression_spin = Gtk.SpinButton()
+    img_seq_proxy_compression_spin.set_adjustment(spin_adj)
+    img_seq_proxy_compression_spin.set_numeric(True)
+
+    spin_adj = Gtk.Adjustment(prefs.timeline_render_processes, 1, editorpersistance.TIMELINE_RENDER_PROCESSES_MAX, 1)
+    render_processes_spin = Gtk.SpinButton()
+    render_processes_spin.set_adjustment(spin_adj)
+    render_processes_spin.set_numeric(True)
+
+    smart_render_check = Gtk.CheckButton()
+    smart_render_check.set_active(prefs.smart_render)
+
     # Layout
     row1 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Default Profile:")), default_profile_combo, PREFERENCES_LEFT))
     row2 = _row(guiutils.get_checkbox_row_box(open_in_last_opened_check, Gtk.Label(label=_("Remember last media directory"))))
@@ -127,6 +165,14 @@ def _general_options_panel(folder_select_clicked_cb, render_folder_select_clicke
     row6 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Autosave for crash recovery every:")), autosave_combo, PREFERENCES_LEFT))
     row8 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Rendered Clips folder:")), render_folder_select, PREFERENCES_LEFT))
     row9 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Media look-up order on load:")), load_order_combo, PREFERENCES_LEFT))
+    row10 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Audio levels render processes:")), levels_workers_spin, PREFERENCES_LEFT))
+    row11 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Audio levels memory cache size (MB):")), levels_cache_spin, PREFERENCES_LEFT))
+    row12 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Media import processes:")), import_workers_spin, PREFERENCES_LEFT))
+    row13 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Proxy render processes:")), proxy_workers_spin, PREFERENCES_LEFT))
+    row14 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Image Sequence proxy format:")), img_seq_proxy_format_combo, PREFERENCES_LEFT))
+    row15 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Image Sequence proxy compression:")), img_seq_proxy_compression_spin, PREFERENCES_LEFT))
+    row16 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Timeline render processes:")), render_processes_spin, PREFERENCES_LEFT))
+    row17 = _row(guiutils.get_checkbox_row_box(smart_render_check, Gtk.Label(label=_("Smart render, copy unchanged source video without re-encoding"))))
 
     vbox = Gtk.VBox(False, 2)
     vbox.pack_start(row1, False, False, 0)
@@ -137,11 +183,20 @@ def _general_options_panel(folder_select_clicked_cb, render_folder_select_clicke
     vbox.pack_start(row4, False, False, 0)
     vbox.pack_start(row8, False, False, 0)
     vbox.pack_start(row9, False, False, 0)
+    vbox.pack_start(row10, False, False, 0)
+    vbox.pack_start(row11, False, False, 0)
+    vbox.pack_start(row12, False, False, 0)
+    vbox.pack_start(row13, False, False, 0)
+    vbox.pack_start(row14, False, False, 0)
+    vbox.pack_start(row15, False, False, 0)
+    vbox.pack_start(row16, False, False, 0)
+    vbox.pack_start(row17, False, False, 0)
     vbox.pack_start(Gtk.Label(), True, True, 0)
 
     guiutils.set_margins(vbox, 12, 0, 12, 12)
 
-    return vbox, (default_profile_combo, open_in_last_opened_check, open_in_last_rendered_check, undo_max_spin, load_order_combo)
+    return vbox, (default_profile_combo, open_in_last_opened_check, open_in_last_rendered_check, undo_max_spin, load_order_combo, levels_workers_spin, levels_cache_spin, import_workers_spin, proxy_workers_spin, \
+                  img_seq_proxy_format_combo, img_seq_proxy_compression_spin, render_processes_spin, smart_render_check)
 
 def _edit_prefs_panel():
     prefs = editorpersistance.prefs
@@ -243,6 +298,9 @@ def _view_prefs_panel():
     else:
         audio_levels_combo.set_active(1)
 
+    layer_cache_check = Gtk.CheckButton()
+    layer_cache_check.set_active(prefs.tline_layer_cache)
+
     # Layout
     row0 =  _row(guiutils.get_checkbox_row_box(force_english_check, Gtk.Label(label=_("Use English texts on localized OS"))))
     row1 =  _row(guiutils.get_checkbox_row_box(display_splash_check, Gtk.Label(label=_("Display splash screen"))))
@@ -250,6 +308,7 @@ def _view_prefs_panel():
     row3 =  _row(guiutils.get_two_column_box(Gtk.Label(label=_("Icons and color optimized for:")), dark_combo, PREFERENCES_LEFT))
     row4 =  _row(guiutils.get_two_column_box(Gtk.Label(label=_("Theme detection fail fallback colors:")), theme_combo, PREFERENCES_LEFT))
     row5 =  _row(guiutils.get_two_column_box(Gtk.Label(label=_("Default audio levels display:")), audio_levels_combo, PREFERENCES_LEFT))
+    row6 =  _row(guiutils.get_checkbox_row_box(layer_cache_check, Gtk.Label(label=_("Cache timeline track images"))))
     
     vbox = Gtk.VBox(False, 2)
     vbox.pack_start(row0, False, False, 0)
@@ -258,11 +317,12 @@ def _view_prefs_panel():
     vbox.pack_start(row3, False, False, 0)
     vbox.pack_start(row4, False, False, 0)
     vbox.pack_start(row5, False, False, 0)
+    vbox.pack_start(row6, False, False, 0)
     vbox.pack_start(Gtk.Label(), True, True, 0)
     
     guiutils.set_margins(vbox, 12, 0, 12, 12)
 
-    return vbox, (force_english_check, display_splash_check, buttons_combo, dark_combo, theme_combo, audio_levels_combo)
+    return vbox, (force_english_check, display_splash_check, buttons_combo, dark_combo, theme_combo, audio_levels_combo, layer_cache_check)
     
 def _row(row_cont):
     row_cont.set_size_request(10, 26)
@@ -0,0 +1,369 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module renders timeline ranges that cannot be played in real time into preview cache files.
+
+Cached ranges are marked by user or detected from count of filters and compositors.
+Ranges are rendered in background to an intermediate codec by segment render processes,
+and cached files are displayed on hidden track on top of the ranges, so that player
+plays them instead of computing the frames from the tracks below.
+
+Cache files are named by a hash of the clips, filter properties and compositors covering
+the range. Edits that change a range change its hash, so the cached file is no longer
+displayed and the range is rendered again after edits have stopped for a moment.
+"""
+
+from gi.repository import GLib
+
+import md5
+import mlt
+import os
+import shutil
+import threading
+
+import dialogutils
+import editorstate
+import gui
+import segmentrender
+import undo
+import utils
+
+CACHE_DIR = "preview_cache/"
+CACHE_MAX_FILES = 32 # least recently used files over this are deleted
+
+RENDER_START_DELAY = 2000 # ms after last edit before stale ranges are rendered
+
+AUTO_DETECT_MIN_EFFECTS = 4 # filters and compositors active at the same time
+AUTO_DETECT_MIN_LENGTH = 25 # frames
+
+# Intra frame codec that decodes fast, pcm audio so that cached audio is not re-encoded.
+PREVIEW_RENDER_ARGS = [("f", "mov"), ("vcodec", "mjpeg"), ("qscale", "3"), ("acodec", "pcm_s16le"), ("ac", "2")]
+PREVIEW_FILE_EXTENSION = ".mov"
+
+_cache_clips = {} # range hash -> clip displaying cache file
+_wanted_hashes = set() # hashes of current ranges without cache file
+_displayed_hashes = [] # hashes of cache clips now on hidden track, in range order
+_render_thread = None
+_render_timeout_id = -1
+
+
+# --------------------------------------------------- ranges
+def get_ranges(seq):
+    # Ranges are saved with sequence as (in, out) tuples, older sequences do not have them.
+    return getattr(seq, "preview_cache_ranges", [])
+
+def add_marked_range():
+    seq = editorstate.current_sequence()
+    mark_in = seq.tractor.mark_in
+    mark_out = seq.tractor.mark_out
+    if mark_in < 0 or mark_out < mark_in:
+        primary_txt = _("Timeline Mark In and Mark Out not set")
+        secondary_txt = _("Set Mark In and Mark Out on timeline to select range for preview cache.")
+        dialogutils.info_message(primary_txt, secondary_txt, gui.editor_window.window)
+        return
+
+    _add_ranges(seq, [(mark_in, mark_out)])
+
+def add_auto_detected_ranges():
+    seq = editorstate.current_sequence()
+    ranges = get_heavy_ranges(seq, AUTO_DETECT_MIN_EFFECTS)
+    if len(ranges) == 0:
+        primary_txt = _("No heavy ranges found")
+        secondary_txt = _("No range has ") + str(AUTO_DETECT_MIN_EFFECTS) + _(" or more filters and compositors active at the same time.")
+        dialogutils.info_message(primary_txt, secondary_txt, gui.editor_window.window)
+        return
+
+    _add_ranges(seq, ranges)
+
+def clear_ranges():
+    seq = editorstate.current_sequence()
+    seq.preview_cache_ranges = []
+    undo.project_changed()
+    refresh_display()
+
+def get_heavy_ranges(seq, min_effects):
+    """
+    Returns list of (in, out) ranges where min_effects or more filters and compositors are active.
+    """
+    items = [] # (timeline in, timeline out, effects count)
+    boundaries = set()
+    for track in seq.tracks[1:len(seq.tracks) - 1]:
+        position = 0
+        for clip in track.clips:
+            length = clip.clip_out - clip.clip_in + 1
+            if clip.is_blanck_clip == False and len(clip.filters) > 0:
+                items.append((position, position + length - 1, len(clip.filters)))
+                boundaries.add(position)
+                boundaries.add(position + length)
+            position += length
+
+    for compositor in seq.compositors:
+        items.append((compositor.clip_in, compositor.clip_out, 1))
+        boundaries.add(compositor.clip_in)
+        boundaries.add(compositor.clip_out + 1)
+
+    ranges = []
+    boundaries = sorted(boundaries)
+    for i in range(0, len(boundaries) - 1):
+        span_in = boundaries[i]
+        span_out = boundaries[i + 1] - 1
+        effects_count = sum([item[2] for item in items if item[0] <= span_in and item[1] >= span_in])
+        if effects_count < min_effects:
+            continue
+        if len(ranges) > 0 and ranges[-1][1] == span_in - 1:
+            ranges[-1] = (ranges[-1][0], span_out)
+        else:
+            ranges.append((span_in, span_out))
+
+    return [r for r in ranges if r[1] - r[0] + 1 >= AUTO_DETECT_MIN_LENGTH]
+
+def _add_ranges(seq, new_ranges):
+    # Overlapping and adjacent ranges are merged.
+    merged = []
+    for range_in, range_out in sorted(get_ranges(seq) + new_ranges):
+        if len(merged) > 0 and range_in <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_out))
+        else:
+            merged.append((range_in, range_out))
+    seq.preview_cache_ranges = merged
+    undo.project_changed() # Ranges are saved with sequence
+    refresh_display()
+
+
+# --------------------------------------------------- hashing
+def get_range_hash(seq, range_in, range_out):
+    """
+    Returns hash of everything that affects rendered frames of range.
+    Positions are relative to range start, so that moving whole content keeps hash.
+    """
+    range_hash = md5.new()
+    range_hash.update(repr((seq.profile.description(), range_out - range_in, seq.master_audio_gain, seq.master_audio_pan)))
+    for track in seq.tracks[1:len(seq.tracks) - 1]:
+        range_hash.update(repr(("track", track.id, track.mute_state, track.audio_gain, track.audio_pan)))
+        position = 0
+        for clip in track.clips:
+            length = clip.clip_out - clip.clip_in + 1
+            if clip.is_blanck_clip == False and position <= range_out and position + length > range_in:
+                range_hash.update(_get_clip_data(clip, position - range_in))
+            position += length
+
+    for compositor in seq.get_compositors_in_range(range_in, range_out):
+        transition = compositor.transition
+        range_hash.update(repr(("compositor", transition.info.mlt_service_id, compositor.clip_in - range_in,
+                                compositor.clip_out - range_in, transition.a_track, transition.b_track,
+                                transition.properties)))
+
+    return range_hash.hexdigest()
+
+def _get_clip_data(clip, position):
+    data = [position, clip.clip_in, clip.clip_out, clip.media_type, getattr(clip, "path", None),
+            getattr(clip, "speed", None), clip.mute_filter != None]
+    if hasattr(clip, "create_data"): # pattern producers
+        data.append(sorted(clip.create_data.__dict__.items()))
+    for clip_filter in clip.filters:
+        data.append((clip_filter.info.mlt_service_id, clip_filter.active,
+                     getattr(clip_filter, "properties", None), getattr(clip_filter, "non_mlt_properties", None)))
+    return repr(data)
+
+
+# --------------------------------------------------- display
+def get_cache_clips(seq):
+    """
+    Returns list of (frame, clip) cache clips to display on hidden track for ranges that have
+    a valid cache file, and schedules render for ranges that do not.
+    Called when hidden track is filled, which happens after every edit.
+    """
+    global _wanted_hashes, _displayed_hashes
+    cache_clips = []
+    wanted_hashes = set()
+    for range_in, range_out in get_ranges(seq):
+        range_hash = get_range_hash(seq, range_in, range_out)
+        clip = _get_cache_clip(seq, range_hash)
+        if clip != None:
+            cache_clips.append((range_in, clip))
+        else:
+            wanted_hashes.add(range_hash)
+
+    _displayed_hashes = [cache_clip.range_hash for frame, cache_clip in cache_clips]
+    _wanted_hashes = wanted_hashes
+    if len(_wanted_hashes) > 0:
+        _schedule_render()
+
+    return cache_clips
+
+def refresh_display():
+    """
+    Refills hidden track if cache clips to display have changed. Called before playback because
+    filter property edits are not edit actions and do not refill hidden track.
+    """
+    if editorstate.timeline_visible() == False or editorstate.current_is_move_mode() == False:
+        return # hidden track displays monitor clip or trim edit
+
+    seq = editorstate.current_sequence()
+    displayed_hashes = []
+    wanted_hashes = set()
+    for range_in, range_out in get_ranges(seq):
+        range_hash = get_range_hash(seq, range_in, range_out)
+        if _get_cache_file(range_hash) != None:
+            displayed_hashes.append(range_hash)
+        else:
+            wanted_hashes.add(range_hash)
+    if displayed_hashes == _displayed_hashes and wanted_hashes == _wanted_hashes:
+        return
+
+    seq.update_trim_hack_blank_length() # refills hidden track
+    player = editorstate.PLAYER()
+    if player.is_playing() == False:
+        player.seek_frame(player.current_frame(), False)
+
+def _get_cache_clip(seq, range_hash):
+    cache_file = _get_cache_file(range_hash)
+    if cache_file == None:
+        return None
+    if not(range_hash in _cache_clips):
+        clip = seq.create_file_producer_clip(cache_file)
+        if clip == None:
+            return None
+        clip.is_preview_cache_clip = True # saved as blank, see persistance.get_p_sequence()
+        clip.range_hash = range_hash
+        _cache_clips[range_hash] = clip
+    os.utime(cache_file, None) # for least recently used deletion
+    return _cache_clips[range_hash]
+
+def _get_cache_file(range_hash):
+    cache_file = get_cache_dir() + range_hash + PREVIEW_FILE_EXTENSION
+    if os.path.isfile(cache_file):
+        return cache_file
+    return None
+
+def get_cache_dir():
+    return utils.get_hidden_user_dir_path() + CACHE_DIR
+
+
+# --------------------------------------------------- rendering
+def _schedule_render():
+    # Render starts after edits have stopped for a moment, so that every edit does not start a render.
+    global _render_timeout_id
+    if _render_timeout_id != -1:
+        GLib.source_remove(_render_timeout_id)
+    _render_timeout_id = GLib.timeout_add(RENDER_START_DELAY, _start_render)
+
+def _start_render():
+    global _render_timeout_id, _render_thread
+    _render_timeout_id = -1
+    if _render_thread != None:
+        return False # _render_thread_done() starts next render
+
+    seq = editorstate.current_sequence()
+    work_dir = get_cache_dir() + "render_" + str(os.getpid()) + "/"
+    jobs = [] # (range hash, job)
+    for range_in, range_out in get_ranges(seq):
+        range_hash = get_range_hash(seq, range_in, range_out)
+        if range_hash in _wanted_hashes:
+            segment_path = work_dir + range_hash + PREVIEW_FILE_EXTENSION
+            jobs.append((range_hash, segmentrender.SegmentRenderJob(len(jobs), (range_in, range_out), segment_path, None)))
+    if len(jobs) == 0:
+        return False
+
+    # Sequence XML is written in GUI thread, so that edits do not change sequence while it is written.
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    xml_path, args_path = segmentrender.write_render_files(seq, PREVIEW_RENDER_ARGS, work_dir)
+
+    _render_thread = PreviewRenderThread(jobs, seq.profile, xml_path, args_path, work_dir)
+    _render_thread.start()
+    return False
+
+def _cache_file_ready():
+    refresh_display()
+
+def _render_thread_done():
+    global _render_thread
+    _render_thread = None
+    _remove_least_recently_used()
+    if len(_wanted_hashes) > 0:
+        _schedule_render()
+
+def shutdown():
+    global _render_timeout_id
+    if _render_timeout_id != -1:
+        GLib.source_remove(_render_timeout_id)
+        _render_timeout_id = -1
+    if _render_thread != None:
+        _render_thread.abort()
+
+def _remove_least_recently_used():
+    cache_dir = get_cache_dir()
+    cache_files = [cache_dir + f for f in os.listdir(cache_dir) if f.endswith(PREVIEW_FILE_EXTENSION)]
+    cache_files.sort(key=lambda f: os.path.getmtime(f), reverse=True)
+    for cache_file in cache_files[CACHE_MAX_FILES:]:
+        range_hash = os.path.basename(cache_file)[0:-len(PREVIEW_FILE_EXTENSION)]
+        if range_hash in _displayed_hashes:
+            continue
+        os.remove(cache_file)
+        _cache_clips.pop(range_hash, None)
+
+
+class PreviewRenderThread(threading.Thread):
+    """
+    Renders ranges one at a time with segment render process, so that editing stays responsive.
+    """
+    def __init__(self, jobs, profile, xml_path, args_path, work_dir):
+        threading.Thread.__init__(self)
+        self.jobs = jobs
+        self.profile = profile
+        self.xml_path = xml_path
+        self.args_path = args_path
+        self.work_dir = work_dir
+        self.aborted = False
+        self.current_job = None
+
+    def run(self):
+        log_file = open(utils.get_hidden_user_dir_path() + "log_preview_render", "w")
+        for range_hash, job in self.jobs:
+            # Ranges edited after render started are skipped.
+            if self.aborted == True or not(range_hash in _wanted_hashes):
+                continue
+
+            self.current_job = job
+            segmentrender.launch_render_process(job, self.xml_path, self.profile, self.args_path, log_file)
+            segmentrender.read_render_process_output(job)
+            job.process.wait()
+            self.current_job = None
+
+            if job.render_done == True and self.aborted == False:
+                producer = mlt.Producer(self.profile, str(job.segment_path))
+                if producer.is_valid() and producer.get_length() == job.get_length():
+                    os.rename(job.segment_path, get_cache_dir() + range_hash + PREVIEW_FILE_EXTENSION)
+                    GLib.idle_add(_cache_file_ready)
+                else:
+                    print "preview cache render length mismatch for range", job.frame_range
+
+        log_file.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        if self.aborted == False:
+            GLib.idle_add(_render_thread_done)
+
+    def abort(self):
+        self.aborted = True
+        job = self.current_job
+        if job != None and job.process != None and job.process.poll() == None:
+            job.process.terminate()
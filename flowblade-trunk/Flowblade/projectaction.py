@@ -30,7 +30,6 @@ import os
 from os import listdir
 from os.path import isfile, join
 import re
-import shutil
 import time
 import threading
 
@@ -56,6 +55,7 @@ from editorstate import PROJECT
 from editorstate import MONITOR_MEDIA_FILE
 import editorpersistance
 import medialinker
+import mediaimport
 import movemodes
 import mltprofiles
 import persistance
@@ -66,6 +66,8 @@ import proxyediting
 import render
 import rendergui
 import sequence
+import snapshotcopy
+import undo
 import updater
 import utils
 
@@ -73,6 +75,9 @@ import utils
 save_time = None
 save_icon_remove_event_id = None
 
+IMPORT_BATCH_SIZE = 16 # imported media files added to bin per media panel update
+IMPORT_BATCH_INTERVAL = 0.5 # seconds, smaller batches are added if this much time has passed since last update
+
 
 #--------------------------------------- worker threads
 class LoadThread(threading.Thread):
@@ -177,10 +182,19 @@ class LoadThread(threading.Thread):
             dialog.destroy()
     
 class AddMediaFilesThread(threading.Thread):
-    
+    """
+    Files are probed and thumbnailed concurrently in media import process and
+    added to bin in the order they were given, a batch at a time.
+    """
     def __init__(self, filenames):
         threading.Thread.__init__(self)
         self.filenames = filenames
+        self.import_files = []
+        self.probed = {} # file path -> (length, icon_path), values are None for not valid media
+        self.next_add_index = 0 # index of first file in self.import_files not yet added to bin
+        self.last_add_time = 0.0
+        self.failed_files = []
+        self.succes_new_file = None
 
     def run(self): 
         Gdk.threads_enter()
@@ -189,33 +203,35 @@ class AddMediaFilesThread(threading.Thread):
         Gdk.threads_leave()
 
         duplicates = []
-        succes_new_file = None
         filenames = self.filenames
         for new_file in filenames:
             (folder, file_name) = os.path.split(new_file)
-            if PROJECT().media_file_exists(new_file):
+            if PROJECT().media_file_exists(new_file) or new_file in self.import_files:
                 duplicates.append(file_name)
             else:
+                self.import_files.append(new_file)
+
+        if len(self.import_files) > 0:
+            self.last_add_time = time.time()
+            mediaimport.probe_files(self.import_files, PROJECT().profile_desc, self._file_probed)
+
+        # Files that import process did not report are probed here
+        for new_file in self.import_files[self.next_add_index:]:
+            if not(new_file in self.probed):
                 try:
-                    PROJECT().add_media_file(new_file)
-                    succes_new_file = new_file
+                    (icon_path, length) = projectdata.thumbnailer.probe_file(new_file)
+                    self.probed[new_file] = (length, icon_path)
                 except projectdata.ProducerNotValidError as err:
                     print err.__str__()
-                    dialogs.not_valid_producer_dialog(err.value, gui.editor_window.window)
-            
-            Gdk.threads_enter()
-            gui.media_list_view.fill_data_model()
-            max_val = gui.editor_window.media_scroll_window.get_vadjustment().get_upper()
-            gui.editor_window.media_scroll_window.get_vadjustment().set_value(max_val)
-            Gdk.threads_leave()
+                    self.probed[new_file] = (None, None)
+        self._add_probed_files(True)
 
-        if succes_new_file != None:
-            editorpersistance.prefs.last_opened_media_dir = os.path.dirname(succes_new_file)
+        if self.succes_new_file != None:
+            editorpersistance.prefs.last_opened_media_dir = os.path.dirname(self.succes_new_file)
             editorpersistance.save()
 
         # Update editor gui
         Gdk.threads_enter()
-        gui.media_list_view.fill_data_model()
         update_current_bin_files_count()
         _enable_save()
 
@@ -223,11 +239,55 @@ class AddMediaFilesThread(threading.Thread):
         gui.editor_window.window.get_window().set_cursor(normal_cursor)
         Gdk.threads_leave()
 
+        if len(self.failed_files) > 0:
+            GObject.timeout_add(10, _not_valid_producers_info, self.failed_files)
+
         if len(duplicates) > 0:
             GObject.timeout_add(10, _duplicates_info, duplicates)
         
         audiowaveformrenderer.launch_audio_levels_rendering(filenames)
 
+    def _file_probed(self, file_path, length, icon_path):
+        self.probed[file_path] = (length, icon_path)
+        self._add_probed_files(False)
+
+    def _add_probed_files(self, add_all):
+        # Adds probed files that have no unprobed files before them in import order,
+        # if there is a full batch of them, or enough time has passed or add_all is True.
+        last_index = self.next_add_index
+        while last_index < len(self.import_files) and self.import_files[last_index] in self.probed:
+            last_index += 1
+
+        ready_count = last_index - self.next_add_index
+        if ready_count == 0:
+            return
+        if add_all == False and ready_count < IMPORT_BATCH_SIZE and time.time() - self.last_add_time < IMPORT_BATCH_INTERVAL:
+            return
+
+        Gdk.threads_enter()
+        media_files = []
+        for file_path in self.import_files[self.next_add_index:last_index]:
+            length, icon_path = self.probed.pop(file_path)
+            if length == None:
+                self.failed_files.append(file_path)
+                continue
+            media_files.append(PROJECT().add_probed_media_file(file_path, length, icon_path))
+            self.succes_new_file = file_path
+
+        gui.media_list_view.append_media_files(media_files)
+        max_val = gui.editor_window.media_scroll_window.get_vadjustment().get_upper()
+        gui.editor_window.media_scroll_window.get_vadjustment().set_value(max_val)
+        update_current_bin_files_count()
+        Gdk.threads_leave()
+
+        self.next_add_index = last_index
+        self.last_add_time = time.time()
+
+def _not_valid_producers_info(failed_files):
+    for file_path in failed_files:
+        dialogs.not_valid_producer_dialog(file_path, gui.editor_window.window)
+    return False
+
 def _duplicates_info(duplicates):
     primary_txt = _("Media files already present in project were opened!")
     MAX_DISPLAYED_ITEMS = 3
@@ -257,6 +317,7 @@ def _load_pulse_bar():
 
 def _enable_save():
     gui.editor_window.uimanager.get_widget("/MenuBar/FileMenu/Save").set_sensitive(True)
+    undo.project_changed() # for autosave
 
 
 # ---------------------------------- project: new, load, save
@@ -391,7 +452,8 @@ def _save_backup_snapshot_dialog_callback(dialog, response_id, project_folder, n
     if response_id == Gtk.ResponseType.ACCEPT:
 
         root_path = project_folder.get_filenames()[0]
-        if not (os.listdir(root_path) == []):
+        # Interrupted snapshot save into folder is resumed, already copied files are not copied again.
+        if not (os.listdir(root_path) == []) and not snapshotcopy.is_incomplete_snapshot_folder(root_path):
             dialog.destroy()
             primary_txt = _("Selected folder contains files")
             secondary_txt = _("When saving a back-up snapshot of the project, the selected folder\nhas to be empty.")
@@ -445,24 +507,24 @@ class SnaphotSaveThread(threading.Thread):
         
         media_folder = self.root_folder_path +  "media/"
 
+        # Folder may exist if we are resuming an interrupted snapshot save
         d = os.path.dirname(media_folder)
-        os.mkdir(d)
+        if not os.path.isdir(d):
+            os.mkdir(d)
+        snapshotcopy.set_snapshot_incomplete(self.root_folder_path, True)
 
         asset_paths = {}
+        copy_jobs = []
+        copy_targets = set()
 
-        # Copy media files
+        # Get media files copy jobs
         for idkey, media_file in PROJECT().media_files.items():
             if media_file.type == appconsts.PATTERN_PRODUCER:
                 continue
 
             # Copy asset file and fix path
             directory, file_name = os.path.split(media_file.path)
-            
-            # Message
-            Gdk.threads_enter()
-            dialog.media_copy_info.set_text(copy_txt + "... " +  file_name)
-            Gdk.threads_leave()
-            
+
             # Other media types than image sequences
             if media_file.type != appconsts.IMAGE_SEQUENCE:
                 media_file_copy = media_folder + file_name
@@ -471,20 +533,22 @@ class SnaphotSaveThread(threading.Thread):
                     file_name = get_snapshot_unique_name(media_file.path, file_name)
                     media_file_copy = media_folder + file_name
                     
-                shutil.copyfile(media_file.path, media_file_copy)
+                copy_jobs.append((media_file.path, media_file_copy))
+                copy_targets.add(media_file_copy)
                 asset_paths[media_file.path] = media_file_copy
             else: # Image Sequences
                 asset_folder, asset_file_name =  os.path.split(media_file.path)
                 lookup_filename = utils.get_img_seq_glob_lookup_name(asset_file_name)
                 lookup_path = asset_folder + "/" + lookup_filename
                 copyfolder = media_folder.rstrip("/") + asset_folder + "/"
-                os.makedirs(copyfolder)
+                if not os.path.isdir(copyfolder):
+                    os.makedirs(copyfolder)
                 listing = glob.glob(lookup_path)
                 for orig_path in listing:
                     orig_folder, orig_file_name = os.path.split(orig_path)
-                    shutil.copyfile(orig_path, copyfolder + orig_file_name)
+                    copy_jobs.append((orig_path, copyfolder + orig_file_name))
 
-        # Copy clip producers paths. This is needed just for rendered files as clips
+        # Get clip producers copy jobs. This is needed just for rendered files as clips
         # from media file objects should be covered as media files can't be destroyed 
         # if a clip made from them exists...I think
         for seq in PROJECT().sequences:
@@ -500,21 +564,38 @@ class SnaphotSaveThread(threading.Thread):
                     if (clip.is_blanck_clip == False and (clip.media_type != appconsts.PATTERN_PRODUCER)):
                         directory, file_name = os.path.split(clip.path)
                         clip_file_copy = media_folder + file_name
-                        if not os.path.isfile(clip_file_copy):
-                            directory, file_name = os.path.split(clip.path)
-                            Gdk.threads_enter()
-                            dialog.media_copy_info.set_text(copy_txt + "... " +  file_name)
-                            Gdk.threads_leave()
-                            shutil.copyfile(clip.path, clip_file_copy) # only rendered files are copied here
+                        if not(clip_file_copy in copy_targets):
+                            copy_jobs.append((clip.path, clip_file_copy)) # only rendered files are copied here
+                            copy_targets.add(clip_file_copy)
                             asset_paths[clip.path] = clip_file_copy # This stuff is already md5 hashed, so no duplicate problems here
             for compositor in seq.compositors:
                 if compositor.type_id == "##wipe": # Wipe may have user luma and needs to be looked up relatively
-                    copy_comp_resourse_file(compositor, "resource", media_folder)
+                    add_comp_resourse_file_copy_job(compositor, "resource", media_folder, copy_jobs, copy_targets)
                 if compositor.type_id == "##region": # Wipe may have user luma and needs to be looked up relatively
-                    copy_comp_resourse_file(compositor, "composite.luma", media_folder)
+                    add_comp_resourse_file_copy_job(compositor, "composite.luma", media_folder, copy_jobs, copy_targets)
+
+        # Copy files
+        copier = snapshotcopy.SnapshotCopier(copy_jobs)
+        ticker = utils.Ticker(lambda : self._update_copy_progress(dialog, copier, copy_txt), 0.25)
+        ticker.start_ticker()
+        copy_error = None
+        try:
+            copier.run()
+        except Exception as e:
+            copy_error = e
+        finally:
+            ticker.stop_ticker()
+
+        if copy_error != None:
+            # Incomplete marker is left in place so that saving snapshot into same folder again resumes copying.
+            print "snapshot media copy failed:", copy_error
+            self._copy_failed(dialog, copy_txt, copy_error)
+            return
+        print "snapshot media copied:", copier.copied_count, "linked:", copier.linked_count, "already done:", copier.skipped_count
 
         Gdk.threads_enter()
         dialog.media_copy_info.set_text(copy_txt + "    " +  u"\u2713")
+        dialog.progress_bar.set_fraction(1.0)
         Gdk.threads_leave()
         
         save_path = self.root_folder_path + self.project_name
@@ -522,6 +603,7 @@ class SnaphotSaveThread(threading.Thread):
         persistance.snapshot_paths = asset_paths
         persistance.save_project(PROJECT(), save_path)
         persistance.snapshot_paths = None
+        snapshotcopy.set_snapshot_incomplete(self.root_folder_path, False)
 
         Gdk.threads_enter()
         dialog.saving_project_info.set_text(project_txt + "    " +  u"\u2713")
@@ -540,16 +622,45 @@ class SnaphotSaveThread(threading.Thread):
         projectinfogui.update_project_info()
         Gdk.threads_leave()
 
+    def _copy_failed(self, dialog, copy_txt, copy_error):
+        Gdk.threads_enter()
+        dialog.media_copy_info.set_text(copy_txt + "    " + _("FAILED"))
+        dialog.progress_bar.set_text(str(copy_error))
+        Gdk.threads_leave()
+
+        time.sleep(2)
+
+        primary_txt = _("Saving project snapshot failed")
+        secondary_txt = _("Copying media assets to snapshot folder failed with error:") + "\n\n" + str(copy_error) + "\n\n" + \
+                        _("Save snapshot into the same folder again to resume copying.")
+        Gdk.threads_enter()
+        dialog.destroy()
+        dialogutils.warning_message(primary_txt, secondary_txt, gui.editor_window.window, is_info=False)
+        Gdk.threads_leave()
+
+    def _update_copy_progress(self, dialog, copier, copy_txt):
+        done_mb = float(copier.done_bytes) / (1024 * 1024)
+        total_mb = float(copier.total_bytes) / (1024 * 1024)
+        progress_txt = "%.1f / %.1f MB" % (done_mb, total_mb)
+        current_file = copier.current_file
+        Gdk.threads_enter()
+        if current_file != None:
+            dialog.media_copy_info.set_text(copy_txt + "... " +  current_file)
+        dialog.progress_bar.set_fraction(copier.get_progress())
+        dialog.progress_bar.set_text(progress_txt)
+        Gdk.threads_leave()
+
 def get_snapshot_unique_name(file_path, file_name):
     (name, ext) = os.path.splitext(file_name)
     return md5.new(file_path).hexdigest() + ext
 
-def copy_comp_resourse_file(compositor, res_property, media_folder):
+def add_comp_resourse_file_copy_job(compositor, res_property, media_folder, copy_jobs, copy_targets):
     res_path = propertyparse.get_property_value(compositor.transition.properties, res_property)
     directory, file_name = os.path.split(res_path)
     res_file_copy = media_folder + file_name
-    if not os.path.isfile(res_file_copy):
-        shutil.copyfile(res_path, res_file_copy)
+    if not(res_file_copy in copy_targets):
+        copy_jobs.append((res_path, res_file_copy))
+        copy_targets.add(res_file_copy)
                         
 def remove_save_icon():
     GObject.source_remove(save_icon_remove_event_id)
@@ -21,7 +21,6 @@
 """
 Module contains objects used to capture project data.
 """
-import cairo
 import datetime
 import mlt
 import md5
@@ -42,6 +41,7 @@ import projectaction
 import miscdataobjects
 import respaths
 import sequence
+import thumbnailstore
 import utils
 
 
@@ -110,20 +110,18 @@ class Project:
         """
         Adds media file to project if exists and file is of right type.
         """
-        (directory, file_name) = os.path.split(file_path)
-        (name, ext) = os.path.splitext(file_name)
+        (icon_path, length) = thumbnailer.probe_file(file_path)
+        return self.add_probed_media_file(file_path, length, icon_path)
 
-        # Get media type
+    def add_probed_media_file(self, file_path, length, icon_path):
+        """
+        Adds media file to project with length and icon that have already been created,
+        e.g. in media import process.
+        """
+        (directory, file_name) = os.path.split(file_path)
         media_type = sequence.get_media_type(file_path)
 
-        # Get length and icon
-        if media_type == appconsts.AUDIO:
-            icon_path = respaths.IMAGE_PATH + "audio_file.png"
-            length = thumbnailer.get_file_length(file_path)
-        else: # For non-audio we need write a thumbbnail file and get file lengh while we're at it
-             (icon_path, length) = thumbnailer.write_image(file_path)
-
-          # Create media file object
+        # Create media file object
         media_object = MediaFile(self.next_media_file_id, file_path, 
                                file_name, media_type, length, icon_path)
 
@@ -273,8 +271,6 @@ class MediaFile:
         self.type = media_type
         self.length = length
         self.icon_path = icon_path
-        self.icon = None
-        self.create_icon()
 
         self.mark_in = -1
         self.mark_out = -1
@@ -293,23 +289,21 @@ class MediaFile:
             self.mark_out = out_fr
             self.length = l
  
-    def create_icon(self):
+    def get_icon(self):
+        """
+        Returns icon surface. Icons are decoded when media panel first draws them
+        and kept in a bounded memory cache, see thumbnailstore.py.
+        """
         try:
-            self.icon = self._create_image_surface(self.icon_path)
+            return thumbnailstore.get_surface(self.icon_path, appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT)
         except:
             print "failed to make icon from:", self.icon_path
             self.icon_path = respaths.IMAGE_PATH + FALLBACK_THUMB
-            self.icon = self._create_image_surface(self.icon_path)
-
-    def _create_image_surface(self, path):
-        icon = cairo.ImageSurface.create_from_png(self.icon_path)
-        scaled_icon = cairo.ImageSurface(cairo.FORMAT_ARGB32, appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT)
-        cr = cairo.Context(scaled_icon)
-        cr.scale( float(appconsts.THUMB_WIDTH) / float(icon.get_width()), float(appconsts.THUMB_HEIGHT) / float(icon.get_height()))
-        cr.set_source_surface(icon, 0, 0)
-        cr.paint()
-        
-        return scaled_icon
+            return thumbnailstore.get_surface(self.icon_path, appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT)
+
+    def create_icon(self):
+        # Icon file has changed, next get_icon() call decodes it again.
+        thumbnailstore.forget(self.icon_path)
 
     def create_proxy_path(self, proxy_width, proxy_height, file_extesion):
         if self.type == appconsts.IMAGE_SEQUENCE:
@@ -370,6 +364,13 @@ class BinColorClip:
         icon.fill(pixel)
         self.icon = icon
 
+    def get_icon(self):
+        try:
+            return self.icon
+        except AttributeError: # icons are not saved with project
+            self.create_icon()
+            return self.icon
+
 
 class Bin:
     """
@@ -396,33 +397,52 @@ class Thumbnailer:
     def set_context(self, profile):
         self.profile = profile
     
-    def write_image(self, file_path):
+    def probe_file(self, file_path):
+        """
+        Returns (icon_path, length) tuple for media file.
         """
-        Writes thumbnail image from file producer
+        if sequence.get_media_type(file_path) == appconsts.AUDIO:
+            icon_path = respaths.IMAGE_PATH + "audio_file.png"
+            length = self.get_file_length(file_path)
+            return (icon_path, length)
+        else: # For non-audio we need write a thumbbnail file and get file lengh while we're at it
+            return self.write_image(file_path)
+
+    def write_image(self, file_path, rewrite=False):
+        """
+        Writes thumbnail images from file producer, if not already in thumbnails folder
+        or rewrite is True. Returns path to default size thumbnail and file length.
         """
         # Get data
-        md_str = md5.new(file_path).hexdigest()
-        thumbnail_path = editorpersistance.prefs.thumbnail_folder + "/" + md_str +  ".png"
+        key = thumbnailstore.get_thumbnail_key(file_path, self.profile)
+        thumbnail_path = thumbnailstore.get_thumbnail_path(key)
+
+        # Create producer, we need length even if thumbnails exist
+        producer = mlt.Producer(self.profile, str(file_path))
+        if producer.is_valid() == False:
+            raise ProducerNotValidError(file_path)
+
+        length = producer.get_length()
+        if thumbnailstore.thumbnails_exist(key) and rewrite == False:
+            return (thumbnail_path, length)
 
         # Create consumer
+        frame_path = thumbnailstore.get_frame_path(key)
         consumer = mlt.Consumer(self.profile, "avformat", 
-                                     thumbnail_path)
+                                     frame_path)
         consumer.set("real_time", 0)
         consumer.set("vcodec", "png")
 
         # Create one frame producer
-        producer = mlt.Producer(self.profile, str(file_path))
-        if producer.is_valid() == False:
-            raise ProducerNotValidError(file_path)
-
-        length = producer.get_length()
         frame = length / 2
         producer = producer.cut(frame, frame)
 
         # Connect and write image
         consumer.connect(producer)
         consumer.run()
-        
+
+        thumbnailstore.write_thumbnails(key, frame_path)
+
         return (thumbnail_path, length)
 
     def get_file_length(self, file_path):
@@ -35,6 +35,7 @@ from editorstate import current_sequence
 import mlttransitions
 import mltfilters
 import propertyparse
+import undo
 import utils
 
 # keys                                                      meaning of values for this key
@@ -301,10 +302,10 @@ class AbstractProperty:
         return self.clip.clip_out - self.clip.clip_in + 1
         
     def get_clip_tline_pos(self):
-        return self.track.clip_start(self.clip_index)
+        return self.track.clips_index.clip_start(self.clip_index)
     
     def update_clip_index(self):
-        self.clip_index = self.track.clips.index(self.clip)
+        self.clip_index = self.track.clips_index.clip_index(self.clip)
         
     def get_pixel_aspect_ratio(self):
         return (float(current_sequence().profile.sample_aspect_num()) / 
@@ -350,6 +351,7 @@ class EditableProperty(AbstractProperty):
         self.write_mlt_property_str_value(str_value)
         self.value = str_value
         self.write_filter_object_property(str_value)
+        undo.project_changed() # Property edits are not undoable, but autosave needs to know about them
         
     def write_mlt_property_str_value(self, str_value):
         # mlt property value
@@ -392,6 +394,7 @@ class TransitionEditableProperty(AbstractProperty):
         self.write_mlt_property_str_value(str_value)
         self.value = str_value
         self.write_transition_object_property(str_value)
+        undo.project_changed()
 
     def write_mlt_property_str_value(self, str_value):
         self.transition.mlt_transition.set(str(self.name), str(str_value))
@@ -432,6 +435,7 @@ class NonMltEditableProperty(AbstractProperty):
         prop = (str(self.name), str(str_value), self.type)
         filter_object.non_mlt_properties[self.non_mlt_property_index] = prop
         self.value = str_value
+        undo.project_changed()
 
     def get_float_value(self):
         return float(self.value)
@@ -739,6 +743,7 @@ class MultipartKeyFrameProperty(AbstractProperty):
         self.value = val_str
         filter_object = self.clip.filters[self.filter_index]
         filter_object.update_value(val_str, self.clip, current_sequence().profile)
+        undo.project_changed()
 
 
 class AffineScaleProperty(EditableProperty):
@@ -18,28 +18,31 @@
     along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
 """
 
-import glob
-from PIL import Image
 import mlt
 import os
 import shutil
 import threading
-import time
 
 from gi.repository import Gtk, Gdk
 
 import app
 import appconsts
+import clipeffectseditor
 import dialogs
 import dialogutils
 import editorpersistance
 import editorstate
 import gui
 import guiutils
-import mltrefhold
+import mltfilters
+import movemodes
 import persistance
+import proxyrender
 import renderconsumer
-import sequence
+import resync
+import trimmodes
+import undo
+import updater
 import utils
 
 
@@ -47,9 +50,7 @@ manager_window = None
 progress_window = None
 proxy_render_issues_window = None
 
-render_thread = None
 runner_thread = None
-load_thread = None
 
 # These are made to correspond with size selector combobox indexes on manager window
 PROXY_SIZE_FULL = 0
@@ -65,150 +66,55 @@ class ProxyRenderRunnerThread(threading.Thread):
         self.set_as_proxy_immediately = set_as_proxy_immediately
         self.aborted = False
 
-    def run(self):        
-        items = 1
-        global progress_window
-        start = time.time()
-        elapsed = 0
         proxy_w, proxy_h =  _get_proxy_dimensions(self.proxy_profile, editorstate.PROJECT().proxy_data.size)
         proxy_encoding = _get_proxy_encoding()
-        self.current_render_file_path = None
-        
-        print "proxy render started, items: " + str(len(self.files_to_render)) + ", dim: " + str(proxy_w) + "x" + str(proxy_h)
-        
+        jobs = []
         for media_file in self.files_to_render:
-            if self.aborted == True:
-                break
-
             if media_file.type == appconsts.IMAGE_SEQUENCE:
-                self._create_img_seq_proxy(media_file, proxy_w, proxy_h, items, start)
-                continue
-
-            # Create render objects
-            proxy_file_path = media_file.create_proxy_path(proxy_w, proxy_h, proxy_encoding.extension)
-            self.current_render_file_path = proxy_file_path
-            consumer = renderconsumer.get_render_consumer_for_encoding(
-                                                        proxy_file_path,
-                                                        self.proxy_profile, 
-                                                        proxy_encoding)
-
-            # Bit rates for proxy files are counted using 2500kbs for 
-            # PAL size image as starting point.
-            pal_pix_count = 720.0 * 576.0
-            pal_proxy_rate = 2500.0
-            proxy_pix_count = float(proxy_w * proxy_h)
-            proxy_rate = pal_proxy_rate * (proxy_pix_count / pal_pix_count)
-            proxy_rate = int(proxy_rate / 100) * 100 # Make proxy rate even hundred
-            # There are no practical reasons to have bitrates lower than 500kbs.
-            if proxy_rate < 500:
-                proxy_rate = 500
-            consumer.set("vb", str(int(proxy_rate)) + "k")
-
-            consumer.set("rescale", "nearest")
-
-            file_producer = mlt.Producer(self.proxy_profile, str(media_file.path))
-            mltrefhold.hold_ref(file_producer) # this may or may not be needed to avoid crashes
-            stop_frame = file_producer.get_length() - 1
-
-            # Create and launch render thread
-            global render_thread 
-            render_thread = renderconsumer.FileRenderPlayer(None, file_producer, consumer, 0, stop_frame)
-            render_thread.start()
-
-            # Render view update loop
-            self.thread_running = True
-            self.aborted = False
-            while self.thread_running:
-                if self.aborted == True:
-                    break
-                render_fraction = render_thread.get_render_fraction()
-                now = time.time()
-                elapsed = now - start
-                Gdk.threads_enter()
-                progress_window.update_render_progress(render_fraction, media_file.name, items, len(self.files_to_render), elapsed)
-                Gdk.threads_leave()
-                render_thread.producer.get_length()
-                if render_thread.producer.frame() >= stop_frame:
-                    self.thread_running = False
-                    media_file.add_proxy_file(proxy_file_path)
-                    if self.set_as_proxy_immediately: # When proxy mode is USE_PROXY_MEDIA all proxy files are used all the time
-                        media_file.set_as_proxy_media_file()
-                    self.current_render_file_path = None
-                else:
-                    time.sleep(0.1)
-
-            if not self.aborted:
-                items = items + 1
-                Gdk.threads_enter()
-                progress_window.update_render_progress(0, media_file.name, items, len(self.files_to_render), elapsed)
-                Gdk.threads_leave()
+                proxy_file_path = media_file.create_proxy_path(proxy_w, proxy_h, None)
             else:
-                print "proxy render aborted"
-                render_thread.shutdown()
-                break
+                proxy_file_path = media_file.create_proxy_path(proxy_w, proxy_h, proxy_encoding.extension)
+            jobs.append(proxyrender.ProxyRenderJob(media_file, proxy_file_path,
+                                                   proxyrender.get_source_size(media_file),
+                                                   proxyrender.get_timeline_usage(media_file, editorstate.PROJECT())))
+
+        self.render_queue = proxyrender.ProxyRenderQueue(jobs, 
+                                                         _get_proxy_render_workers_count(),
+                                                         _get_proxy_profile_path(),
+                                                         editorstate.PROJECT().proxy_data.encoding,
+                                                         proxy_w, proxy_h,
+                                                         editorpersistance.prefs.img_seq_proxy_format,
+                                                         editorpersistance.prefs.img_seq_proxy_compression)
+
+    def run(self):
+        print "proxy render started, items: " + str(len(self.files_to_render)) + ", workers: " + str(self.render_queue.workers_count)
 
-            render_thread.shutdown()
+        self.render_queue.run(self._update_progress, self._job_done)
 
         Gdk.threads_enter()
         _proxy_render_stopped()
         Gdk.threads_leave()
 
-        # Remove unfinished proxy files
-        if self.current_render_file_path != None:
-            os.remove(self.current_render_file_path)
-        # If we're currently proxy editing, we need to update 
-        # all the clips on the timeline to use proxy media.
-        if editorstate.PROJECT().proxy_data.proxy_mode == appconsts.USE_PROXY_MEDIA:
-            _auto_renconvert_after_proxy_render_in_proxy_mode()
-        
         print "proxy render done"
 
-    def _create_img_seq_proxy(self, media_file, proxy_w, proxy_h, items, start):
-        now = time.time()
-        elapsed = now - start
+    def _update_progress(self):
         Gdk.threads_enter()
-        progress_window.update_render_progress(0.0, media_file.name, items, len(self.files_to_render), elapsed)
+        progress_window.update_render_progress(self.render_queue)
         Gdk.threads_leave()
 
-        asset_folder, asset_file_name = os.path.split(media_file.path)
-        lookup_filename = utils.get_img_seq_glob_lookup_name(asset_file_name)
-        lookup_path = asset_folder + "/" + lookup_filename
+    def _job_done(self, job):
+        Gdk.threads_enter()
+        job.media_file.add_proxy_file(job.proxy_file_path)
+        if self.set_as_proxy_immediately: # When proxy mode is USE_PROXY_MEDIA all proxy files are used all the time
+            _swap_proxy_rendered_media_file(job.media_file)
+        Gdk.threads_leave()
 
-        proxy_file_path = media_file.create_proxy_path(proxy_w, proxy_h, None)
-        copyfolder, copyfilename = os.path.split(proxy_file_path)
-        if not os.path.isdir(copyfolder):
-            os.makedirs(copyfolder)
-        
-        listing = glob.glob(lookup_path)
-        size = proxy_w, proxy_h
-        done = 0
-        for orig_path in listing:
-            orig_folder, orig_file_name = os.path.split(orig_path)
-
-            try:
-                im = Image.open(orig_path)
-                im.thumbnail(size, Image.ANTIALIAS)
-                im.save(copyfolder + "/" + orig_file_name, "PNG")
-            except IOError:
-                print "proxy img seq frame failed for '%s'" % orig_path
-
-            done = done + 1
-        
-            frac = float(done) / float(len(listing))
-            now = time.time()
-            elapsed = now - start
-        
-            if done % 5 == 0:
-                Gdk.threads_enter()
-                progress_window.update_render_progress(frac, media_file.name, items, len(self.files_to_render), elapsed)
-                Gdk.threads_leave()
-        
-        media_file.add_proxy_file(proxy_file_path)
+    def cancel_job(self, job):
+        self.render_queue.cancel_job(job)
 
     def abort(self):
-        render_thread.shutdown()
         self.aborted = True
-        self.thread_running = False
+        self.render_queue.cancel_all()
 
 
 class ProxyManagerDialog:
@@ -346,7 +252,7 @@ class ProxyManagerDialog:
 
 
 class ProxyRenderProgressDialog:
-    def __init__(self):
+    def __init__(self, render_queue):
         self.dialog = Gtk.Dialog(_("Creating Proxy Files"),
                                  gui.editor_window.window,
                                  Gtk.DialogFlags.MODAL | Gtk.DialogFlags.DESTROY_WITH_PARENT,
@@ -358,26 +264,54 @@ class ProxyRenderProgressDialog:
         prog_align.set_size_request(550, 30)
 
         self.elapsed_value = Gtk.Label()
+        self.eta_value = Gtk.Label()
         self.current_render_value = Gtk.Label()
         self.items_value = Gtk.Label()
         
         est_label = guiutils.get_right_justified_box([guiutils.bold_label(_("Elapsed:"))])
-        current_label = guiutils.get_right_justified_box([guiutils.bold_label(_("Current Media File:"))])
-        items_label = guiutils.get_right_justified_box([guiutils.bold_label(_("Rendering Item:"))])
+        eta_label = guiutils.get_right_justified_box([guiutils.bold_label(_("Estimated Time Left:"))])
+        current_label = guiutils.get_right_justified_box([guiutils.bold_label(_("Current Media Files:"))])
+        items_label = guiutils.get_right_justified_box([guiutils.bold_label(_("Items Done:"))])
         
         est_label.set_size_request(250, 20)
+        eta_label.set_size_request(250, 20)
         current_label.set_size_request(250, 20)
         items_label.set_size_request(250, 20)
 
         info_vbox = Gtk.VBox(False, 0)
         info_vbox.pack_start(guiutils.get_left_justified_box([est_label, self.elapsed_value]), False, False, 0)
+        info_vbox.pack_start(guiutils.get_left_justified_box([eta_label, self.eta_value]), False, False, 0)
         info_vbox.pack_start(guiutils.get_left_justified_box([current_label, self.current_render_value]), False, False, 0)
         info_vbox.pack_start(guiutils.get_left_justified_box([items_label, self.items_value]), False, False, 0)
 
+        # Job rows with state and cancel button for each media file
+        self.job_rows = []
+        jobs_vbox = Gtk.VBox(False, 0)
+        for job in render_queue.jobs:
+            name_label = Gtk.Label(label=job.media_file.name)
+            state_label = Gtk.Label()
+            state_label.set_size_request(100, 20)
+            cancel_button = Gtk.Button(_("Cancel"))
+            cancel_button.connect("clicked", lambda w, j: _cancel_proxy_render_job(j), job)
+            row = Gtk.HBox(False, 2)
+            row.pack_start(name_label, False, False, 0)
+            row.pack_start(Gtk.Label(), True, True, 0)
+            row.pack_start(state_label, False, False, 0)
+            row.pack_start(cancel_button, False, False, 0)
+            jobs_vbox.pack_start(row, False, False, 0)
+            self.job_rows.append((job, state_label, cancel_button))
+
+        jobs_scroll = Gtk.ScrolledWindow()
+        jobs_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        jobs_scroll.add_with_viewport(jobs_vbox)
+        jobs_scroll.set_size_request(550, 150)
+
         progress_vbox = Gtk.VBox(False, 2)
         progress_vbox.pack_start(info_vbox, False, False, 0)
         progress_vbox.pack_start(guiutils.get_pad_label(10, 8), False, False, 0)
         progress_vbox.pack_start(prog_align, False, False, 0)
+        progress_vbox.pack_start(guiutils.get_pad_label(10, 8), False, False, 0)
+        progress_vbox.pack_start(jobs_scroll, True, True, 0)
 
         alignment = guiutils.set_margins(progress_vbox, 12, 12, 12, 12)
         alignment.show_all()
@@ -387,14 +321,34 @@ class ProxyRenderProgressDialog:
         self.dialog.connect('response', self.stop_pressed)
         self.dialog.show()
 
-    def update_render_progress(self, fraction, media_file_name, current_item, items, elapsed):
-        elapsed_str= "  " + utils.get_time_str_for_sec_float(elapsed)
-        self.elapsed_value .set_text(elapsed_str)
-        self.current_render_value.set_text(" " + media_file_name)
-        self.items_value.set_text( " " + str(current_item) + "/" + str(items))
+    def update_render_progress(self, render_queue):
+        elapsed_str= "  " + utils.get_time_str_for_sec_float(render_queue.get_elapsed())
+        self.elapsed_value.set_text(elapsed_str)
+        eta = render_queue.get_eta()
+        if eta == None:
+            self.eta_value.set_text("  -")
+        else:
+            self.eta_value.set_text("  " + utils.get_time_str_for_sec_float(eta))
+        running_names = [job.media_file.name for job in render_queue.get_running_jobs()]
+        self.current_render_value.set_text(" " + ", ".join(running_names))
+        self.items_value.set_text( " " + str(render_queue.get_finished_count()) + "/" + str(len(render_queue.jobs)))
+        fraction = render_queue.get_progress()
         self.render_progress_bar.set_fraction(fraction)
         self.render_progress_bar.set_text(str(int(fraction * 100)) + " %")
 
+        for job, state_label, cancel_button in self.job_rows:
+            if job.state == proxyrender.QUEUED:
+                state_label.set_text(_("Queued"))
+            elif job.state == proxyrender.RUNNING:
+                state_label.set_text(str(int(job.fraction * 100)) + " %")
+            elif job.state == proxyrender.DONE:
+                state_label.set_text(_("Done"))
+            elif job.state == proxyrender.FAILED:
+                state_label.set_text(_("Failed"))
+            else:
+                state_label.set_text(_("Cancelled"))
+            cancel_button.set_sensitive(not job.is_finished())
+
     def stop_pressed(self, dialog, response_id):
         global runner_thread
         runner_thread.abort()
@@ -598,10 +552,14 @@ def _create_proxy_files(media_files_to_render):
         set_as_proxy_immediately = True
 
     global progress_window, runner_thread
-    progress_window = ProxyRenderProgressDialog()
     runner_thread = ProxyRenderRunnerThread(proxy_profile, media_files_to_render, set_as_proxy_immediately)
+    progress_window = ProxyRenderProgressDialog(runner_thread.render_queue)
     runner_thread.start()
 
+def _cancel_proxy_render_job(job):
+    if runner_thread != None:
+        runner_thread.cancel_job(job)
+
 # ------------------------------------------------------------------ module functions
 def _get_proxies_dir():
     return editorpersistance.prefs.render_folder + "/proxies"
@@ -640,7 +598,7 @@ def _get_proxy_profile(project):
     file_contents += "display_aspect_num=" + str(project_profile.display_aspect_num()) + "\n"
     file_contents += "display_aspect_den=" + str(project_profile.display_aspect_den()) + "\n"
 
-    proxy_profile_path = utils.get_hidden_user_dir_path() + "temp_proxy_profile"
+    proxy_profile_path = _get_proxy_profile_path()
     profile_file = open(proxy_profile_path, "w")
     profile_file.write(file_contents)
     profile_file.close()
@@ -648,6 +606,16 @@ def _get_proxy_profile(project):
     proxy_profile = mlt.Profile(proxy_profile_path)
     return proxy_profile
 
+def _get_proxy_profile_path():
+    # Proxy render processes load proxy profile from this file written by _get_proxy_profile().
+    return utils.get_hidden_user_dir_path() + "temp_proxy_profile"
+
+def _get_proxy_render_workers_count():
+    workers_count = editorpersistance.prefs.proxy_render_workers
+    if workers_count < 1:
+        workers_count = 1
+    return workers_count
+
 def _proxy_render_stopped():
     global progress_window, runner_thread
     progress_window.dialog.destroy()
@@ -672,112 +640,155 @@ def _create_proxy_render_folder_select_callback(dialog, response_id, file_select
             _do_create_proxy_files(media_files, True)
 
 # ----------------------------------------------------------- changing proxy modes
-def _convert_to_proxy_project():    
-    editorstate.PROJECT().proxy_data.proxy_mode = appconsts.CONVERTING_TO_USE_PROXY_MEDIA
-    conv_temp_project_path = utils.get_hidden_user_dir_path() + "proxy_conv.flb"
-    manager_window.convert_progress_bar.set_text(_("Converting Project to Use Proxy Media"))
-
-    persistance.save_project(editorstate.PROJECT(), conv_temp_project_path)
-    global load_thread
-    load_thread = ProxyProjectLoadThread(conv_temp_project_path, manager_window.convert_progress_bar)
-    load_thread.start()
+def _convert_to_proxy_project():
+    _switch_proxy_mode(appconsts.USE_PROXY_MEDIA)
 
 def _convert_to_original_media_project():
-    editorstate.PROJECT().proxy_data.proxy_mode = appconsts.CONVERTING_TO_USE_ORIGINAL_MEDIA
-    conv_temp_project_path = utils.get_hidden_user_dir_path() + "proxy_conv.flb"
-    manager_window.convert_progress_bar.set_text(_("Converting to Use Original Media"))
+    _switch_proxy_mode(appconsts.USE_ORIGINAL_MEDIA)
 
-    persistance.save_project(editorstate.PROJECT(), conv_temp_project_path)
-    global load_thread
-    load_thread = ProxyProjectLoadThread(conv_temp_project_path, manager_window.convert_progress_bar)
-    load_thread.start()
-
-def _auto_renconvert_after_proxy_render_in_proxy_mode():
-    # Save to temp to convert to using original media
+def _switch_proxy_mode(new_proxy_mode):
+    # Media files are switched in place, only clips of media files that have proxy files
+    # get new producers and everything else in sequences and undo stack stays as is.
     project = editorstate.PROJECT()
-    project.proxy_data.proxy_mode = appconsts.CONVERTING_TO_USE_ORIGINAL_MEDIA
-    conv_temp_project_path = utils.get_hidden_user_dir_path() + "proxy_conv.flb"
-    persistance.save_project(editorstate.PROJECT(), conv_temp_project_path)
-    project.proxy_data.proxy_mode = appconsts.USE_ORIGINAL_MEDIA
-
-    # Load saved temp original media project
-    persistance.show_messages = False
-    project = persistance.load_project(conv_temp_project_path)
-    
-    # Save to temp to convert back to using proxy media
-    project.proxy_data.proxy_mode = appconsts.CONVERTING_TO_USE_PROXY_MEDIA
-    persistance.save_project(project, conv_temp_project_path)
-    project.proxy_data.proxy_mode = appconsts.USE_PROXY_MEDIA
+    path_map = {}
+    for media_file in project.media_files.itervalues():
+        if new_proxy_mode == appconsts.USE_PROXY_MEDIA:
+            if media_file.has_proxy_file and media_file.is_proxy_file == False:
+                path_map[media_file.path] = media_file.second_file_path
+                media_file.set_as_proxy_media_file()
+        elif media_file.is_proxy_file:
+            path_map[media_file.path] = media_file.second_file_path
+            media_file.set_as_original_media_file()
+
+    project.proxy_data.proxy_mode = new_proxy_mode
+    _swap_clips_media(project, path_map)
+    _proxy_swap_changed_project()
+    _converting_proxy_mode_done()
+
+def _swap_proxy_rendered_media_file(media_file):
+    # Called when proxy file gets rendered while project is in proxy mode.
+    original_path = media_file.path
+    media_file.set_as_proxy_media_file()
+    _swap_clips_media(editorstate.PROJECT(), {original_path:media_file.path})
+    _proxy_swap_changed_project()
+    editorstate.update_current_proxy_paths()
 
-    # Load saved temp proxy project
-    project = persistance.load_project(conv_temp_project_path)
+def _proxy_swap_changed_project():
+    # Media swaps are not undoable edits, so autosave and Save menu item are updated here.
+    # All sequences may have swapped clips, autosave can't reuse earlier pickled sequences.
+    app.clear_autosave_sequence_sections()
+    undo.project_changed()
+    undo.save_item.set_sensitive(True)
+
+def _swap_clips_media(project, path_map):
+    """
+    Replaces producers of clips with paths in path_map keys with producers for mapped paths.
+    Replacing clips get ids, ranges, filters, mute and sync data of replaced clips.
+    """
+    if len(path_map) == 0:
+        return
 
-    # Open saved temp project
-    app.stop_autosave()
+    player = editorstate.PLAYER()
+    player.stop_playback()
+    player.consumer.stop()
+
+    swapped_clips = {} # id(replaced clip) -> (replaced clip, replacing clip)
+    for seq in project.sequences:
+        if hasattr(seq, "lazy_load_file_path"):
+            # MLT objects get created from these when sequence is first opened.
+            for track in seq.tracks:
+                for clip in track.clips:
+                    if getattr(clip, "path", None) in path_map:
+                        clip.path = path_map[clip.path]
+            continue
 
-    Gdk.threads_enter()
-    app.open_project(project)
-    Gdk.threads_leave()
+        for track in seq.tracks:
+            track_changed = False
+            for i in range(0, len(track.clips)):
+                clip = track.clips[i]
+                new_clip = _get_swapped_clip(seq, clip, path_map, swapped_clips)
+                if new_clip == None:
+                    continue
+                track.remove(i)
+                track.insert(new_clip, i, clip.clip_in, clip.clip_out)
+                track.clips[i] = new_clip
+                track_changed = True
+            if track_changed:
+                track.clips_index.invalidate()
+
+    # Clips removed from timeline by edits are still used by undos and redos.
+    seq = editorstate.current_sequence()
+    undo.replace_objects(lambda obj: _get_swapped_clip(seq, obj, path_map, swapped_clips))
+
+    # Sync parents are referenced by clip objects.
+    for replaced_clip, new_clip in swapped_clips.values():
+        _update_sync_master_clip(new_clip, swapped_clips)
+    for seq in project.sequences:
+        if not hasattr(seq, "lazy_load_file_path"):
+            for track in seq.tracks:
+                for clip in track.clips:
+                    _update_sync_master_clip(clip, swapped_clips)
+
+    resync.sequence_changed(editorstate.current_sequence())
+
+    # Editors and selections may hold replaced clips.
+    movemodes.clear_selected_clips()
+    trimmodes.set_no_edit_trim_mode()
+    if id(clipeffectseditor.clip) in swapped_clips:
+        clipeffectseditor.clear_clip()
+
+    player.consumer.start()
+    player.seek_frame(player.current_frame())
+    updater.repaint_tline()
+
+def _get_swapped_clip(seq, clip, path_map, swapped_clips):
+    # Returns replacing clip for clip if its media is being swapped, or None.
+    try:
+        replaced_clip, new_clip = swapped_clips[id(clip)]
+        return new_clip
+    except KeyError:
+        pass
 
-    app.start_autosave()
-    
-    editorstate.update_current_proxy_paths()
-    
-    persistance.show_messages = True
+    if not isinstance(clip, mlt.Producer):
+        return None
+    try:
+        new_path = path_map[clip.path]
+    except (AttributeError, KeyError): # blanks, pattern producers and clips of media without proxy
+        return None
 
-def _converting_proxy_mode_done():
-    global load_thread
-    load_thread = None
+    if getattr(clip, "speed", None) != None:
+        new_clip = seq.create_slowmotion_producer(new_path, clip.speed)
+    else:
+        new_clip = seq.create_file_producer_clip(new_path)
+    if new_clip == None:
+        print "proxy mode switch, file not found:", new_path
+        return None
+
+    # MLT object references are not copied, 'this' is the SWIG pointer to the replaced clip's producer.
+    for attr_name, value in clip.__dict__.items():
+        if attr_name not in persistance.CLIP_REMOVE:
+            new_clip.__dict__[attr_name] = value
+    new_clip.path = new_path
+
+    # Filters are moved, not cloned, so that filter objects referenced from edit actions stay valid.
+    mltfilters.detach_all_filters(clip)
+    mltfilters.attach_all_filters(new_clip)
+    if clip.mute_filter != None:
+        clip.detach(clip.mute_filter.mlt_filter)
+        new_clip.attach(clip.mute_filter.mlt_filter)
+
+    swapped_clips[id(clip)] = (clip, new_clip) # replaced clip is kept alive so that its id is not reused
+    return new_clip
+
+def _update_sync_master_clip(clip, swapped_clips):
+    sync_data = getattr(clip, "sync_data", None)
+    if sync_data != None and id(sync_data.master_clip) in swapped_clips:
+        replaced_clip, sync_data.master_clip = swapped_clips[id(sync_data.master_clip)]
 
+def _converting_proxy_mode_done():
     editorstate.update_current_proxy_paths()
     
     manager_window.update_proxy_mode_display()
     gui.media_list_view.widget.queue_draw()
     gui.tline_left_corner.update_gui()
     set_menu_to_proxy_state()
-
-class ProxyProjectLoadThread(threading.Thread):
-
-    def __init__(self, proxy_project_path, progressbar):
-        threading.Thread.__init__(self)
-        self.proxy_project_path = proxy_project_path
-        self.progressbar = progressbar
-
-    def run(self):
-        pulse_runner = guiutils.PulseThread(self.progressbar)
-        pulse_runner.start()
-        time.sleep(2.0)
-        persistance.show_messages = False
-        try:
-            Gdk.threads_enter()
-            project = persistance.load_project(self.proxy_project_path)
-            sequence.set_track_counts(project)
-            Gdk.threads_leave()
-        except persistance.FileProducerNotFoundError as e:
-            print "did not find file:", e
-
-        pulse_runner.running = False
-        time.sleep(0.3) # need to be sure pulse_runner has stopped
-        
-        app.stop_autosave()
-
-        Gdk.threads_enter()
-        app.open_project(project)
-        Gdk.threads_leave()
-
-        # Loaded project has been converted, set proxy mode to correct mode 
-        if project.proxy_data.proxy_mode == appconsts.CONVERTING_TO_USE_PROXY_MEDIA:
-            project.proxy_data.proxy_mode = appconsts.USE_PROXY_MEDIA
-        else:
-            project.proxy_data.proxy_mode = appconsts.USE_ORIGINAL_MEDIA
-
-        app.start_autosave()
-
-        global load_thread
-        load_thread = None
-        persistance.show_messages = True
-
-        Gdk.threads_enter()
-        _converting_proxy_mode_done()
-        Gdk.threads_leave()
-
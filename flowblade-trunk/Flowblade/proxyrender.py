@@ -0,0 +1,475 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module handles rendering proxy files in a queue of concurrently running render processes.
+
+Each proxy file is rendered by a separate process launched with launch/flowbladeproxyrender,
+so that several encodes can run at the same time on different cores and a single render can
+be cancelled by terminating its process. Render process writes progress lines to stdout.
+
+Jobs are started in order of timeline usage, most used media first, and file size,
+smallest first, so that proxies for media being edited become available as early as possible.
+"""
+
+import glob
+import itertools
+import locale
+import mlt
+import multiprocessing
+from PIL import Image
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import appconsts
+import mltenv
+import renderconsumer
+import respaths
+import utils
+
+PROGRESS_TAG = "#&#progress:" # render process writes this + render fraction to stdout
+DONE_TAG = "#&#done:" # render process writes this to stdout when proxy file is complete
+
+PROGRESS_REPORT_INTERVAL = 0.5 # seconds between progress lines written by render process
+QUEUE_UPDATE_INTERVAL = 0.25 # seconds between queue state checks and progress updates
+
+# Image sequence proxy frame formats, these correspond to preferences combobox indexes
+IMG_SEQ_PROXY_PNG = 0
+IMG_SEQ_PROXY_JPEG = 1
+
+IMG_SEQ_CHUNK_SIZE = 8 # frames downscaled by pool worker per task
+
+# Job states
+QUEUED = 0
+RUNNING = 1
+DONE = 2
+FAILED = 3
+CANCELLED = 4
+
+
+# ------------------------------------------------- render queue
+class ProxyRenderJob:
+    """
+    Proxy render for a single media file.
+    """
+    def __init__(self, media_file, proxy_file_path, source_size, timeline_usage):
+        self.media_file = media_file
+        self.proxy_file_path = proxy_file_path
+        self.source_size = source_size
+        self.timeline_usage = timeline_usage
+        self.state = QUEUED
+        self.fraction = 0.0
+        self.process = None
+        self.output_reader = None # thread reading process stdout
+        self.process_exited = False
+        self.render_done = False # set when render process reports complete proxy file
+
+    def is_finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    def get_done_bytes(self):
+        if self.state == DONE:
+            return self.source_size
+        return self.source_size * self.fraction
+
+
+class ProxyRenderQueue:
+    """
+    Runs proxy render jobs in at most workers_count concurrent render processes.
+    """
+    def __init__(self, jobs, workers_count, proxy_profile_path, encoding_index, proxy_w, proxy_h,
+                 img_seq_format, img_seq_compression):
+        self.jobs = sorted(jobs, key=lambda job: (-job.timeline_usage, job.source_size))
+        self.workers_count = max(1, workers_count)
+        self.proxy_profile_path = proxy_profile_path
+        self.encoding_index = encoding_index
+        self.proxy_w = proxy_w
+        self.proxy_h = proxy_h
+        self.img_seq_format = img_seq_format
+        self.img_seq_compression = img_seq_compression
+        self.lock = threading.Lock()
+        self.start_time = None
+
+    def run(self, update_callback, job_done_callback):
+        """
+        Blocks until all jobs are finished or cancelled.
+        update_callback() is called on every queue update and job_done_callback(job)
+        for each job that is rendered successfully.
+        """
+        self.start_time = time.time()
+        FLOG = open(utils.get_hidden_user_dir_path() + "log_proxy_render", 'w')
+        while True:
+            self.lock.acquire()
+            done_jobs = []
+            for job in self._get_live_process_jobs():
+                # Process output is read to end before exit is handled, or done tag could still be unread.
+                if job.process.poll() != None and job.output_reader.is_alive() == False:
+                    job.process_exited = True
+                    self._job_process_exited(job)
+                    if job.state == DONE:
+                        done_jobs.append(job)
+
+            queued_jobs = [job for job in self.jobs if job.state == QUEUED]
+            free_workers = self.workers_count - len(self._get_live_process_jobs())
+            for job in queued_jobs[0:max(0, free_workers)]:
+                self._launch_job(job, FLOG)
+
+            all_finished = (len([job for job in self.jobs if not job.is_finished()]) == 0
+                            and len(self._get_live_process_jobs()) == 0)
+            self.lock.release()
+
+            # Callbacks are called without lock held, they may need GDK lock and GUI thread may be cancelling jobs.
+            for job in done_jobs:
+                job_done_callback(job)
+            update_callback()
+            if all_finished:
+                break
+            time.sleep(QUEUE_UPDATE_INTERVAL)
+
+        FLOG.close()
+
+    def cancel_job(self, job):
+        self.lock.acquire()
+        if job.state == QUEUED:
+            job.state = CANCELLED
+        elif job.state == RUNNING:
+            job.state = CANCELLED
+            job.process.terminate() # partial proxy file is removed when process exits
+        self.lock.release()
+
+    def cancel_all(self):
+        for job in self.jobs:
+            self.cancel_job(job)
+
+    def get_running_jobs(self):
+        return [job for job in self.jobs if job.state == RUNNING]
+
+    def _get_live_process_jobs(self):
+        # Cancelled jobs have process running until it exits after terminate().
+        return [job for job in self.jobs if job.process != None and job.process_exited == False]
+
+    def get_finished_count(self):
+        return len([job for job in self.jobs if job.is_finished()])
+
+    def get_progress(self):
+        # Progress is weighted by source file sizes, cancelled jobs are left out.
+        jobs = [job for job in self.jobs if job.state != CANCELLED]
+        total_bytes = sum([job.source_size for job in jobs])
+        if total_bytes == 0:
+            return 1.0
+        done_bytes = sum([job.get_done_bytes() for job in jobs])
+        return float(done_bytes) / float(total_bytes)
+
+    def get_elapsed(self):
+        return time.time() - self.start_time
+
+    def get_eta(self):
+        """
+        Returns estimated seconds until all jobs are done, or None if there is not enough progress yet.
+        """
+        progress = self.get_progress()
+        if progress < 0.01:
+            return None
+        elapsed = self.get_elapsed()
+        return elapsed * (1.0 - progress) / progress
+
+    def _launch_job(self, job, FLOG):
+        media_file = job.media_file
+        job.process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeproxyrender",
+                                        respaths.ROOT_PATH,
+                                        str(media_file.path),
+                                        job.proxy_file_path,
+                                        self.proxy_profile_path,
+                                        str(self.encoding_index),
+                                        str(self.proxy_w),
+                                        str(self.proxy_h),
+                                        str(media_file.type),
+                                        str(self.img_seq_format),
+                                        str(self.img_seq_compression),
+                                        str(self._get_img_seq_workers_count())],
+                                        stdout=subprocess.PIPE, stderr=FLOG)
+        job.state = RUNNING
+        print "proxy render started for", media_file.name
+
+        job.output_reader = threading.Thread(target=_read_job_output, args=(job,))
+        job.output_reader.daemon = True
+        job.output_reader.start()
+
+    def _get_img_seq_workers_count(self):
+        # Image sequence render processes share cores with other concurrently running render processes.
+        try:
+            cpu_count = multiprocessing.cpu_count()
+        except NotImplementedError:
+            cpu_count = 1
+        return max(1, cpu_count / self.workers_count)
+
+    def _job_process_exited(self, job):
+        if job.state == CANCELLED:
+            print "proxy render cancelled for", job.media_file.name
+            _remove_proxy_output(job)
+        elif job.render_done == True and job.process.returncode == 0:
+            job.state = DONE
+            job.fraction = 1.0
+        else:
+            job.state = FAILED
+            print "proxy render failed for", job.media_file.name, "exit code", job.process.returncode
+            _remove_proxy_output(job)
+
+
+def _read_job_output(job):
+    # Run in reader thread for each running job.
+    for line in iter(job.process.stdout.readline, ""):
+        if line.startswith(PROGRESS_TAG):
+            job.fraction = float(line[len(PROGRESS_TAG):])
+        elif line.startswith(DONE_TAG):
+            job.render_done = True
+
+def _remove_proxy_output(job):
+    try:
+        if job.media_file.type == appconsts.IMAGE_SEQUENCE:
+            proxy_folder, proxy_file_name = os.path.split(job.proxy_file_path)
+            if os.path.isdir(proxy_folder):
+                shutil.rmtree(proxy_folder)
+        elif os.path.isfile(job.proxy_file_path):
+            os.remove(job.proxy_file_path)
+    except OSError as e:
+        print "removing unfinished proxy output failed:", e
+
+def get_source_size(media_file):
+    """
+    Returns size in bytes of media file or all frames of image sequence.
+    """
+    try:
+        if media_file.type == appconsts.IMAGE_SEQUENCE:
+            return sum([os.path.getsize(f) for f in glob.glob(_get_img_seq_lookup_path(media_file.path))])
+        return os.path.getsize(media_file.path)
+    except OSError:
+        return 0
+
+def get_timeline_usage(media_file, project):
+    """
+    Returns number of clips in project sequences created from media file.
+    """
+    usage = 0
+    for seq in project.sequences:
+        for track in seq.tracks:
+            for clip in track.clips:
+                if clip.is_blanck_clip == False and getattr(clip, "path", None) == media_file.path:
+                    usage += 1
+    return usage
+
+def _get_img_seq_lookup_path(img_seq_path):
+    asset_folder, asset_file_name = os.path.split(img_seq_path)
+    lookup_filename = utils.get_img_seq_glob_lookup_name(asset_file_name)
+    return asset_folder + "/" + lookup_filename
+
+
+# ------------------------------------------------- render process
+def main():
+    root_path, source_path, proxy_file_path, proxy_profile_path, encoding_index, \
+    proxy_w, proxy_h, media_type, img_seq_format, img_seq_compression, img_seq_workers = sys.argv[1:12]
+
+    respaths.set_paths(root_path)
+
+    if int(media_type) == appconsts.IMAGE_SEQUENCE:
+        _render_img_seq_proxy(source_path, proxy_file_path, int(proxy_w), int(proxy_h),
+                              int(img_seq_format), int(img_seq_compression), int(img_seq_workers),
+                              _report_progress)
+    else:
+        _render_video_proxy(source_path, proxy_file_path, proxy_profile_path, int(encoding_index),
+                            int(proxy_w), int(proxy_h))
+
+    sys.stdout.write(DONE_TAG + "\n")
+    sys.stdout.flush()
+
+def _report_progress(fraction):
+    sys.stdout.write(PROGRESS_TAG + str(fraction) + "\n")
+    sys.stdout.flush()
+
+def _render_video_proxy(source_path, proxy_file_path, proxy_profile_path, encoding_index, proxy_w, proxy_h):
+    repo = mlt.Factory().init()
+
+    # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs
+    locale.setlocale(locale.LC_NUMERIC, 'C')
+
+    mltenv.check_available_features(repo)
+    renderconsumer.load_render_profiles()
+
+    proxy_profile = mlt.Profile(proxy_profile_path)
+    proxy_encoding = renderconsumer.proxy_encodings[encoding_index]
+    consumer = renderconsumer.get_render_consumer_for_encoding(proxy_file_path,
+                                                               proxy_profile,
+                                                               proxy_encoding)
+
+    # Bit rates for proxy files are counted using 2500kbs for
+    # PAL size image as starting point.
+    pal_pix_count = 720.0 * 576.0
+    pal_proxy_rate = 2500.0
+    proxy_pix_count = float(proxy_w * proxy_h)
+    proxy_rate = pal_proxy_rate * (proxy_pix_count / pal_pix_count)
+    proxy_rate = int(proxy_rate / 100) * 100 # Make proxy rate even hundred
+    # There are no practical reasons to have bitrates lower than 500kbs.
+    if proxy_rate < 500:
+        proxy_rate = 500
+    consumer.set("vb", str(int(proxy_rate)) + "k")
+
+    consumer.set("rescale", "nearest")
+
+    file_producer = mlt.Producer(proxy_profile, str(source_path))
+    stop_frame = file_producer.get_length() - 1
+
+    render_thread = renderconsumer.FileRenderPlayer(None, file_producer, consumer, 0, stop_frame)
+    render_thread.start()
+
+    # FileRenderPlayer stops when consumer has written all frames.
+    while render_thread.stopped == False:
+        _report_progress(render_thread.get_render_fraction())
+        time.sleep(PROGRESS_REPORT_INTERVAL)
+
+    render_thread.shutdown()
+
+def _render_img_seq_proxy(source_path, proxy_file_path, proxy_w, proxy_h, img_seq_format, compression, workers_count,
+                          progress_callback):
+    copyfolder, copyfilename = os.path.split(proxy_file_path)
+    if not os.path.isdir(copyfolder):
+        os.makedirs(copyfolder)
+
+    listing = sorted(glob.glob(_get_img_seq_lookup_path(source_path)))
+    settings = (copyfolder, (proxy_w, proxy_h), img_seq_format, compression)
+    tasks = [(listing[i:i + IMG_SEQ_CHUNK_SIZE], settings) for i in range(0, len(listing), IMG_SEQ_CHUNK_SIZE)]
+
+    # Frames are downscaled in chunks by a pool of worker processes.
+    if workers_count < 2 or len(tasks) < 2:
+        pool = None
+        results = itertools.imap(_downscale_img_seq_frames, tasks)
+    else:
+        pool = multiprocessing.Pool(workers_count)
+        results = pool.imap_unordered(_downscale_img_seq_frames, tasks)
+
+    done = 0
+    for frames_count in results:
+        done = done + frames_count
+        progress_callback(float(done) / float(len(listing)))
+
+    if pool != None:
+        pool.close()
+        pool.join()
+
+def _downscale_img_seq_frames(task):
+    # Run in pool worker processes, returns number of frames handled.
+    frame_paths, settings = task
+    for orig_path in frame_paths:
+        try:
+            _downscale_img_seq_frame(orig_path, settings)
+        except Exception as e:
+            sys.stderr.write("proxy img seq frame failed for '%s' %s\n" % (orig_path, str(e)))
+    return len(frame_paths)
+
+def _downscale_img_seq_frame(orig_path, settings):
+    copyfolder, size, img_seq_format, compression = settings
+    orig_folder, orig_file_name = os.path.split(orig_path)
+    proxy_w, proxy_h = size
+
+    im = Image.open(orig_path)
+
+    # JPEG frames can be decoded directly at reduced scale.
+    im.draft(im.mode, size)
+
+    # Drop pixels with fast box reduce if frame is still much larger than proxy size,
+    # so that antialiased resize only needs to do last 2x - 4x scaling. Image.reduce() exists in Pillow 7.0+.
+    reduce_factor = min(im.size[0] / proxy_w, im.size[1] / proxy_h) / 2
+    if reduce_factor > 1 and hasattr(im, "reduce"):
+        im = im.reduce(reduce_factor)
+
+    im.thumbnail(size, Image.ANTIALIAS)
+
+    # Proxy frames keep original file names so that proxy path pattern matches original.
+    save_path = copyfolder + "/" + orig_file_name
+    if img_seq_format == IMG_SEQ_PROXY_JPEG:
+        if not(im.mode in ("RGB", "L")):
+            im = im.convert("RGB")
+        im.save(save_path, "JPEG", quality=_get_jpeg_quality(compression))
+    else:
+        im.save(save_path, "PNG", compress_level=compression)
+
+def _get_jpeg_quality(compression):
+    # Compression level 0 - 9 gives JPEG quality 95 - 50.
+    return 95 - compression * 5
+
+
+# ------------------------------------------------- benchmark
+def img_seq_proxy_benchmark(frames_count=48, width=1920, height=1080):
+    """
+    Development benchmark that prints frames per second for image sequence proxy downscaling
+    done frame by frame with PNG output as before parallel proxy path, and with different
+    pool sizes and output formats. Run by starting application with -imgseqproxybenchmark flag.
+    """
+    bench_folder = tempfile.mkdtemp(prefix="flowblade_imgseq_bench")
+    source_folder = bench_folder + "/source"
+    os.mkdir(source_folder)
+
+    # Noise frames do not compress well, so decoding and encoding costs are not underestimated.
+    print "creating", frames_count, "benchmark frames", width, "x", height
+    noise = Image.merge("RGB", [Image.effect_noise((width, height), 64) for band in range(0, 3)])
+    for i in range(0, frames_count):
+        noise.save(source_folder + "/frame_%04d.png" % i, "PNG")
+    source_path = source_folder + "/frame_%04d.png"
+    proxy_w, proxy_h = width / 4 - (width / 4) % 8, height / 4 - (height / 4) % 8
+
+    try:
+        cpu_count = multiprocessing.cpu_count()
+    except NotImplementedError:
+        cpu_count = 1
+
+    # Frame by frame PIL loop with default PNG settings
+    proxy_folder = _get_benchmark_proxy_folder(bench_folder, "serial")
+    start = time.time()
+    for orig_path in sorted(glob.glob(_get_img_seq_lookup_path(source_path))):
+        orig_folder, orig_file_name = os.path.split(orig_path)
+        im = Image.open(orig_path)
+        im.thumbnail((proxy_w, proxy_h), Image.ANTIALIAS)
+        im.save(proxy_folder + "/" + orig_file_name, "PNG")
+    _print_benchmark_result("frame by frame, PNG", frames_count, time.time() - start)
+
+    cases = [(1, IMG_SEQ_PROXY_PNG, 1), (cpu_count, IMG_SEQ_PROXY_PNG, 1), 
+             (cpu_count, IMG_SEQ_PROXY_PNG, 6), (cpu_count, IMG_SEQ_PROXY_JPEG, 3)]
+    for i in range(0, len(cases)):
+        workers_count, img_seq_format, compression = cases[i]
+        name = "pool " + str(workers_count) + ", " + ["PNG", "JPEG"][img_seq_format] + " level " + str(compression)
+        proxy_folder = _get_benchmark_proxy_folder(bench_folder, "case" + str(i))
+        start = time.time()
+        _render_img_seq_proxy(source_path, proxy_folder + "/frame_%04d.png", proxy_w, proxy_h,
+                              img_seq_format, compression, workers_count, lambda fraction: None)
+        _print_benchmark_result(name, frames_count, time.time() - start)
+
+    shutil.rmtree(bench_folder)
+
+def _get_benchmark_proxy_folder(bench_folder, name):
+    proxy_folder = bench_folder + "/" + name
+    os.mkdir(proxy_folder)
+    return proxy_folder
+
+def _print_benchmark_result(name, frames_count, elapsed):
+    print "img seq proxy %-30s %6.2f s %8.1f fps" % (name, elapsed, frames_count / elapsed)
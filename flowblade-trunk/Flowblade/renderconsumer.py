@@ -32,9 +32,8 @@ import xml.dom.minidom
 import os
 
 import mltenv
+import mltenvcache
 import respaths
-from editorstate import PLAYER
-from editorstate import PROJECT
 
 # File describing existing encoding and quality options
 RENDER_ENCODING_FILE = "/res/render/renderencoding.xml"
@@ -145,6 +144,9 @@ class EncodingOption:
             elif token_sides[0] == "f":
                 self.format = token_sides[1]
 
+        self.update_supported()
+
+    def update_supported(self):
         self.supported, self.err_msg = mltenv.render_profile_supported(self.format, 
                                                          self.vcodec,
                                                          self.acodec)
@@ -187,30 +189,24 @@ def load_render_profiles():
     object tree.
     """
     print "Loading render profiles..."
-    file_path = respaths.ROOT_PATH + RENDER_ENCODING_FILE
-    global render_encoding_doc
-    render_encoding_doc = xml.dom.minidom.parse(file_path)
-
-    # Create quality option groups
-    global quality_option_groups
-    qgroup_nodes = render_encoding_doc.getElementsByTagName(QUALITY_GROUP)
-    for qgnode in qgroup_nodes:
-        quality_qroup = []
-        group_key = _get_attribute(qgnode, ID)
-        group_default_index = _get_attribute(qgnode, DEFAULT_INDEX)
-        if group_default_index != None: 
-            quality_option_groups_default_index[group_key] = group_default_index
-        option_nodes = qgnode.getElementsByTagName(QUALITY)
-        for option_node in option_nodes:
-            q_option = QualityOption(option_node)
-            quality_qroup.append(q_option)
-        quality_option_groups[group_key] = quality_qroup
+    # Parsing render encodings document is slow, use objects created earlier if available.
+    # Objects are cached together so that encoding options keep sharing quality option lists.
+    # Availability of encodings is checked every time for current environment.
+    cached_profiles = mltenvcache.get("renderprofiles")
+    if cached_profiles != None:
+        q_groups, q_groups_default_index, all_encoding_options, all_proxy_encoding_options = cached_profiles
+        quality_option_groups.update(q_groups)
+        quality_option_groups_default_index.update(q_groups_default_index)
+        for encoding_option in all_encoding_options + all_proxy_encoding_options:
+            encoding_option.update_supported()
+    else:
+        all_encoding_options, all_proxy_encoding_options = _load_render_encoding_doc()
+        mltenvcache.set("renderprofiles", (quality_option_groups, quality_option_groups_default_index,
+                                          all_encoding_options, all_proxy_encoding_options))
 
     # Create encoding options
     global encoding_options, not_supported_encoding_options, non_user_encodings
-    encoding_option_nodes = render_encoding_doc.getElementsByTagName(ENCODING_OPTION)
-    for eo_node in encoding_option_nodes:
-        encoding_option = EncodingOption(eo_node)
+    for encoding_option in all_encoding_options:
         if encoding_option.supported:
             if encoding_option.nonuser == None:
                 encoding_options.append(encoding_option)
@@ -222,19 +218,49 @@ def load_render_profiles():
             print encoding_option.name + msg
     
     # Proxy encoding
-    proxy_encoding_nodes = render_encoding_doc.getElementsByTagName(PROXY_ENCODING_OPTION)
     found_proxy_encodings = []
-    for proxy_node in proxy_encoding_nodes:
-        proxy_encoding_option = EncodingOption(proxy_node)
+    for proxy_encoding_option in all_proxy_encoding_options:
         if proxy_encoding_option.supported:
             msg = " ...available"
             found_proxy_encodings.append(proxy_encoding_option)
         else:
-            msg = " ...NOT available, " + encoding_option.err_msg + " missing"
+            msg = " ...NOT available, " + proxy_encoding_option.err_msg + " missing"
         print "Proxy encoding " + proxy_encoding_option.name + msg
     global proxy_encodings
     proxy_encodings = found_proxy_encodings
 
+def _load_render_encoding_doc():
+    # Creates quality option groups and returns lists of all encoding options and proxy encoding options in document.
+    file_path = respaths.ROOT_PATH + RENDER_ENCODING_FILE
+    global render_encoding_doc
+    render_encoding_doc = xml.dom.minidom.parse(file_path)
+
+    # Create quality option groups
+    qgroup_nodes = render_encoding_doc.getElementsByTagName(QUALITY_GROUP)
+    for qgnode in qgroup_nodes:
+        quality_qroup = []
+        group_key = _get_attribute(qgnode, ID)
+        group_default_index = _get_attribute(qgnode, DEFAULT_INDEX)
+        if group_default_index != None: 
+            quality_option_groups_default_index[group_key] = group_default_index
+        option_nodes = qgnode.getElementsByTagName(QUALITY)
+        for option_node in option_nodes:
+            q_option = QualityOption(option_node)
+            quality_qroup.append(q_option)
+        quality_option_groups[group_key] = quality_qroup
+
+    all_encoding_options = []
+    encoding_option_nodes = render_encoding_doc.getElementsByTagName(ENCODING_OPTION)
+    for eo_node in encoding_option_nodes:
+        all_encoding_options.append(EncodingOption(eo_node))
+
+    all_proxy_encoding_options = []
+    proxy_encoding_nodes = render_encoding_doc.getElementsByTagName(PROXY_ENCODING_OPTION)
+    for proxy_node in proxy_encoding_nodes:
+        all_proxy_encoding_options.append(EncodingOption(proxy_node))
+
+    return (all_encoding_options, all_proxy_encoding_options)
+
 def get_render_consumer_for_encoding_and_quality(file_path, profile, enc_opt_index, quality_opt_index):
     args_vals_list = get_args_vals_tuples_list_for_encoding_and_quality(profile,
                                                                        enc_opt_index,
@@ -290,6 +316,15 @@ def get_mlt_render_consumer(file_path, profile, args_vals_list):
     print "render consumer created, path:" +  str(file_path) + ", args: " + args_msg
     return consumer
 
+def get_args_vals_list_value(args_vals_list, key, default=None):
+    """
+    Returns value of render arg as string, or default if arg is not set.
+    """
+    for k, v in args_vals_list:
+        if str(k) == key:
+            return str(v)
+    return default
+
 def get_args_vals_tuples_list_for_encoding_and_quality(profile, enc_opt_index, quality_opt_index):
     encoding_option = encoding_options[enc_opt_index]
     if quality_opt_index >= 0:
@@ -454,61 +489,6 @@ class FileRenderPlayer(threading.Thread):
         return render_fraction
 
 
-class XMLRenderPlayer(threading.Thread):
-    def __init__(self, file_name, callback, data):
-        self.file_name = file_name
-        self.render_done_callback = callback
-        self.data = data
-        self.current_playback_frame = 0
-
-        threading.Thread.__init__(self)
-
-    def run(self):
-        print "Starting XML render"
-        player = PLAYER()
-        
-        # Don't try anything if somehow this was started 
-        # while timeline rendering is running
-        if player.is_rendering:
-            print "Can't render XML when another render is already running!"
-            return
-
-        # Stop all playback before producer is disconnected
-        self.current_playback_frame = player.producer.frame()
-        player.ticker.stop_ticker()
-        player.consumer.stop()
-        player.producer.set_speed(0)
-        player.producer.seek(0)
-        
-        # Wait until producer is at start
-        while player.producer.frame() != 0:
-            time.sleep(0.1)
-        
-        # Get render producer
-        timeline_producer = PROJECT().c_seq.tractor
-
-        # Get render consumer
-        xml_consumer = mlt.Consumer(PROJECT().profile, "xml", str(self.file_name))
-
-        # Connect and start rendering
-        xml_consumer.connect(timeline_producer)
-        xml_consumer.start()
-        timeline_producer.set_speed(1)
-
-        # Wait until done
-        while xml_consumer.is_stopped() == False:
-            print "In XML render wait loop..."
-            time.sleep(0.1)
-    
-        print "XML render done"
-
-        # Get app player going again
-        player.connect_and_start()
-        player.seek_frame(0)
-
-        self.render_done_callback(self.data)
-
-
 class ProgressWindowThread(threading.Thread):
     def __init__(self, dialog, progress_bar, clip_renderer, callback):
         self.dialog = dialog
@@ -29,61 +29,132 @@ from editorstate import current_sequence
 # Setting sync means calculating and saving the position difference between where first frames of clips
 # would be on the timeline.
 #
-# After every edit sync states of all child clips is calculated, and it 
-# gets displayd to the user in the next timeline redraw using red, green and gray colors
+# After every edit sync states of child clips that were affected by the edit are calculated,
+# and they get displayd to the user in the next timeline redraw using red, green and gray colors
 
 # Maps clip -> track
 sync_children = {}
 
+# Maps parent clip -> set of child clips, and child clip -> parent clip
+_parent_children = {}
+_child_parents = {}
+
+# Child clips whose sync state needs to be calculated on next edit
+# because they were added to timeline or lost their parent clip.
+_pending_children = set()
+
 # ----------------------------------------- sync display updating
 def clip_added_to_timeline(clip, track):
     if clip.sync_data != None:
+        _remove_sync_child(clip)
         sync_children[clip] = track
+        parent_clip = clip.sync_data.master_clip
+        _child_parents[clip] = parent_clip
+        _parent_children.setdefault(parent_clip, set()).add(clip)
+        _pending_children.add(clip)
 
 def clip_removed_from_timeline(clip):
+    _remove_sync_child(clip)
+    # Child clips of removed parent clip need their sync state updated.
     try:
-        sync_children.pop(clip)
+        _pending_children.update(_parent_children[clip])
     except KeyError:
         pass
 
 def clip_sync_cleared(clip):
     # This and the method above are called for different purposes, so we'll 
     # keep them separate even though they do the same thing. (???)
+    _remove_sync_child(clip)
+
+def _remove_sync_child(clip):
     try:
         sync_children.pop(clip)
     except KeyError:
-        pass
+        return
+
+    _pending_children.discard(clip)
+    parent_clip = _child_parents.pop(clip)
+    children = _parent_children[parent_clip]
+    children.discard(clip)
+    if len(children) == 0:
+        _parent_children.pop(parent_clip)
 
 def sequence_changed(new_sequence):
-    global sync_children
+    global sync_children, _parent_children, _child_parents, _pending_children
     sync_children = {}
+    _parent_children = {}
+    _child_parents = {}
+    _pending_children = set()
     for track in new_sequence.tracks:
         for clip in track.clips:
             clip_added_to_timeline(clip, track)
     calculate_and_set_child_clip_sync_states()
 
-def calculate_and_set_child_clip_sync_states():
-    parent_track = current_sequence().first_video_track()
-    for child_clip, track in sync_children.iteritems():
-        child_index = track.clips.index(child_clip)
-        child_clip_start = track.clip_start(child_index) - child_clip.clip_in
-
-        #print child_clip.id
-        parent_clip = child_clip.sync_data.master_clip
-        try:
-            parent_index = parent_track.clips.index(parent_clip)
-        except:
-            child_clip.sync_data.sync_state = appconsts.SYNC_PARENT_GONE
-            continue
-        parent_clip_start = parent_track.clip_start(parent_index) - parent_clip.clip_in
+def calculate_and_set_child_clip_sync_states(changed_tracks=None):
+    """
+    Returns set of ids of tracks that have child clips with changed sync state or sync diff.
 
-        pos_offset = child_clip_start - parent_clip_start
-        if pos_offset == child_clip.sync_data.pos_offset:
-            child_clip.sync_data.sync_state = appconsts.SYNC_CORRECT
-        else:
-            child_clip.sync_data.sync_state = appconsts.SYNC_OFF
-        
-        child_clip.sync_diff = pos_offset - child_clip.sync_data.pos_offset
+    changed_tracks is dict track id -> index of first changed clip on track. If given, sync states
+    are only calculated for child clips on or after that index on their track, child clips
+    with parent clip on or after that index on parent track and pending child clips.
+    """
+    parent_track = current_sequence().first_video_track()
+    if changed_tracks == None:
+        update_children = sync_children.keys()
+    else:
+        update_children = _get_changed_children(changed_tracks, parent_track)
+    _pending_children.clear()
+
+    changed_track_ids = set()
+    for child_clip in update_children:
+        track = sync_children[child_clip]
+        old_sync_display = (child_clip.sync_data.sync_state, getattr(child_clip, "sync_diff", None))
+        _set_child_clip_sync_state(child_clip, track, parent_track)
+        if old_sync_display != (child_clip.sync_data.sync_state, getattr(child_clip, "sync_diff", None)):
+            changed_track_ids.add(track.id)
+
+    return changed_track_ids
+
+def _get_changed_children(changed_tracks, parent_track):
+    # Positions of clips before first changed clip on a track stay the same,
+    # so only clips after it can be child clips or parent clips with changed sync state.
+    children = set()
+    for clip in _pending_children:
+        if clip in sync_children:
+            children.add(clip)
+
+    tracks = current_sequence().tracks
+    for track_id, first_index in changed_tracks.iteritems():
+        track = tracks[track_id]
+        for i in range(first_index, len(track.clips)):
+            clip = track.clips[i]
+            if clip in sync_children:
+                children.add(clip)
+            if track is parent_track and clip in _parent_children:
+                children.update(_parent_children[clip])
+
+    return children
+
+def _set_child_clip_sync_state(child_clip, track, parent_track):
+    child_index = track.clips_index.clip_index(child_clip)
+    child_clip_start = track.clips_index.clip_start(child_index) - child_clip.clip_in
+
+    #print child_clip.id
+    parent_clip = child_clip.sync_data.master_clip
+    try:
+        parent_index = parent_track.clips_index.clip_index(parent_clip)
+    except:
+        child_clip.sync_data.sync_state = appconsts.SYNC_PARENT_GONE
+        return
+    parent_clip_start = parent_track.clips_index.clip_start(parent_index) - parent_clip.clip_in
+
+    pos_offset = child_clip_start - parent_clip_start
+    if pos_offset == child_clip.sync_data.pos_offset:
+        child_clip.sync_data.sync_state = appconsts.SYNC_CORRECT
+    else:
+        child_clip.sync_data.sync_state = appconsts.SYNC_OFF
+    
+    child_clip.sync_diff = pos_offset - child_clip.sync_data.pos_offset
 
 def get_resync_data_list():
     # Returns list of tuples with data needed to do resync
@@ -91,16 +162,16 @@ def get_resync_data_list():
     resync_data = []
     parent_track = current_sequence().first_video_track()
     for child_clip, track in sync_children.iteritems():
-        child_index = track.clips.index(child_clip)
-        child_clip_start = track.clip_start(child_index) - child_clip.clip_in
+        child_index = track.clips_index.clip_index(child_clip)
+        child_clip_start = track.clips_index.clip_start(child_index) - child_clip.clip_in
 
         parent_clip = child_clip.sync_data.master_clip
         try:
-            parent_index = parent_track.clips.index(parent_clip)
+            parent_index = parent_track.clips_index.clip_index(parent_clip)
         except:
             # Parent clip no longer awailable
             continue
-        parent_clip_start = parent_track.clip_start(parent_index) - parent_clip.clip_in
+        parent_clip_start = parent_track.clips_index.clip_start(parent_index) - parent_clip.clip_in
 
         pos_offset = child_clip_start - parent_clip_start
 
@@ -116,16 +187,16 @@ def get_resync_data_list_for_clip_list(clips_list):
     parent_track = current_sequence().first_video_track()
     for clip_track_tuple in clips_list:
         child_clip, track = clip_track_tuple
-        child_index = track.clips.index(child_clip)
-        child_clip_start = track.clip_start(child_index) - child_clip.clip_in
+        child_index = track.clips_index.clip_index(child_clip)
+        child_clip_start = track.clips_index.clip_start(child_index) - child_clip.clip_in
 
         parent_clip = child_clip.sync_data.master_clip
         try:
-            parent_index = parent_track.clips.index(parent_clip)
+            parent_index = parent_track.clips_index.clip_index(parent_clip)
         except:
             # Parent clip no longer awailable
             continue
-        parent_clip_start = parent_track.clip_start(parent_index) - parent_clip.clip_in
+        parent_clip_start = parent_track.clips_index.clip_start(parent_index) - parent_clip.clip_in
 
         pos_offset = child_clip_start - parent_clip_start
 
@@ -0,0 +1,552 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module renders sequences in segments with concurrent render processes.
+
+Render range is split into segments at clip cut points near even split positions.
+Each segment is rendered from sequence MLT XML by a separate process launched with
+launch/flowbladesegmentrender, with its own MLT pipeline and the same encoding args.
+Segment files are joined without re-encoding with ffmpeg concat demuxer, and frame counts
+and audio durations at segment seams are checked after join.
+
+With smart render segments of unchanged source video found by smartrender module are copied
+from source files with ffmpeg, and only the rest of timeline is rendered with MLT.
+"""
+
+import distutils.spawn
+import locale
+import mlt
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import editorpersistance
+import mltprofiles
+import mltxmlwriter
+import renderconsumer
+import respaths
+import smartrender
+import utils
+
+PROGRESS_TAG = "#&#progress:" # render process writes this + rendered frames count to stdout
+DONE_TAG = "#&#done:" # render process writes this to stdout when segment file is complete
+
+PROGRESS_REPORT_INTERVAL = 0.5 # seconds between progress lines written by render process
+MIN_SEGMENT_LENGTH = 250 # frames, shorter segments are not worth process start and join
+CUT_POINT_SNAP_DISTANCE = 0.2 # max distance of used cut point from even split, fraction of segment length
+
+SEGMENTS_DIR = "segmentrender/"
+
+
+# ------------------------------------------------- segments
+def get_segment_ranges(seq, start_frame, end_frame, segments_count):
+    """
+    Returns list of (in, out) inclusive frame ranges covering start_frame - end_frame.
+    """
+    length = end_frame - start_frame + 1
+    segments_count = max(1, min(segments_count, length / MIN_SEGMENT_LENGTH))
+    segment_length = float(length) / float(segments_count)
+    snap_distance = segment_length * CUT_POINT_SNAP_DISTANCE
+    cut_points = get_cut_points(seq)
+
+    boundaries = [start_frame]
+    for i in range(1, segments_count):
+        even_split = start_frame + int(round(i * segment_length))
+        candidates = [cut for cut in cut_points if abs(cut - even_split) <= snap_distance and cut > boundaries[-1]]
+        if len(candidates) > 0:
+            boundaries.append(min(candidates, key=lambda cut: abs(cut - even_split)))
+        else:
+            boundaries.append(even_split)
+    boundaries.append(end_frame + 1)
+
+    return [(boundaries[i], boundaries[i + 1] - 1) for i in range(0, len(boundaries) - 1)]
+
+def get_cut_points(seq):
+    """
+    Returns sorted list of frames where a clip starts or ends on some track.
+    """
+    cut_points = set()
+    for track in seq.tracks[1:len(seq.tracks) - 1]: # black background and hidden track have no cuts
+        position = 0
+        for clip in track.clips:
+            length = clip.clip_out - clip.clip_in + 1
+            if clip.is_blanck_clip == False:
+                cut_points.add(position)
+                cut_points.add(position + length)
+            position += length
+    return sorted(cut_points)
+
+def can_render_segmented(render_path):
+    # Image sequences are already written as separate files, container files need ffmpeg for join.
+    if "%" in os.path.basename(render_path):
+        return False
+    return get_ffmpeg_path() != None
+
+def get_ffmpeg_path():
+    return distutils.spawn.find_executable("ffmpeg")
+
+def get_ffprobe_path():
+    return distutils.spawn.find_executable("ffprobe")
+
+def get_render_player(seq, profile, render_path, args_vals_list, start_frame, end_frame, wait_for_stop_render):
+    """
+    Returns render thread object for sequence with FileRenderPlayer interface, rendering in segments
+    if more than one timeline render process is set in preferences and range is long enough,
+    or if smart render is set in preferences.
+    """
+    segments_count = editorpersistance.prefs.timeline_render_processes
+    smart_render = editorpersistance.prefs.smart_render
+    if can_render_segmented(render_path) and (smart_render == True \
+       or (segments_count > 1 and end_frame - start_frame + 1 >= 2 * MIN_SEGMENT_LENGTH)):
+        return SegmentedRenderPlayer(seq, profile, render_path, args_vals_list, start_frame, end_frame, segments_count, smart_render)
+
+    consumer = renderconsumer.get_mlt_render_consumer(render_path, profile, args_vals_list)
+    render_thread = renderconsumer.FileRenderPlayer(None, seq.tractor, consumer, start_frame, end_frame)
+    render_thread.wait_for_producer_end_stop = wait_for_stop_render
+    return render_thread
+
+
+# ------------------------------------------------- render
+class SegmentRenderJob:
+
+    def __init__(self, index, frame_range, segment_path, source_copy):
+        self.index = index
+        self.frame_range = frame_range
+        self.segment_path = segment_path
+        self.source_copy = source_copy # smartrender.SourceCopy or None if segment is rendered with MLT
+        self.process = None
+        self.frames_done = 0
+        self.render_done = False
+
+    def get_length(self):
+        return self.frame_range[1] - self.frame_range[0] + 1
+
+    def set_as_rendered(self):
+        # Segment is rendered with MLT instead of copying it from source file.
+        self.source_copy = None
+        self.process = None
+        self.frames_done = 0
+        self.render_done = False
+
+
+class SegmentedRenderPlayer(threading.Thread):
+    """
+    Renders sequence range in segments with concurrent render processes and joins them to render_path.
+    With smart render segments of unchanged source video are copied from source files instead of rendering.
+    Has the same running state attributes and methods as renderconsumer.FileRenderPlayer,
+    so that render windows can follow it the same way.
+    """
+    def __init__(self, seq, profile, render_path, args_vals_list, start_frame, end_frame, segments_count, smart_render=False):
+        threading.Thread.__init__(self)
+        self.seq = seq
+        self.profile = profile
+        self.render_path = render_path
+        self.args_vals_list = args_vals_list
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.segments_count = segments_count
+        self.smart_render = smart_render
+
+        self.work_dir = utils.get_hidden_user_dir_path() + SEGMENTS_DIR + str(os.getpid()) + "_" + str(id(self)) + "/"
+        self.jobs = [] # created in run(), smart render needs to probe source files
+        self.next_job = 0
+
+        self.running = False
+        self.has_started_running = False
+        self.stopped = False
+        self.aborted = False
+        self.error = None
+        self.seam_issues = []
+        self.lock = threading.Lock()
+
+    def run(self):
+        self.running = True
+        self.has_started_running = True
+
+        if not os.path.exists(self.work_dir):
+            os.makedirs(self.work_dir)
+
+        self._create_jobs()
+        xml_path, args_path = write_render_files(self.seq, self.args_vals_list, self.work_dir)
+
+        print "segmented render, segments:", [(job.frame_range, job.source_copy != None) for job in self.jobs]
+
+        log_file = open(utils.get_hidden_user_dir_path() + "log_segment_render", "w")
+        self._render_jobs(xml_path, args_path, log_file)
+
+        # Copied segments with codec parameters that differ from other segments would decode
+        # with wrong parameter sets after join, these are rendered instead.
+        if self.aborted == False and len(self.jobs) > 1 and all([job.render_done for job in self.jobs]):
+            mismatched_jobs = get_mismatched_copy_jobs(self.jobs)
+            if len(mismatched_jobs) > 0:
+                print "segmented render, rendering copied segments with mismatched codec parameters:", \
+                      [job.frame_range for job in mismatched_jobs]
+                for job in mismatched_jobs:
+                    job.set_as_rendered()
+                self.next_job = 0
+                self._render_jobs(xml_path, args_path, log_file)
+        log_file.close()
+
+        failed_jobs = [job for job in self.jobs if job.render_done == False]
+        if self.aborted == False and len(failed_jobs) > 0:
+            self.error = "segment render failed for range " + str(failed_jobs[0].frame_range)
+        elif self.aborted == False:
+            if len(self.jobs) > 1:
+                self.error = join_segments([job.segment_path for job in self.jobs], self.render_path, self.work_dir)
+            if self.error == None:
+                self.seam_issues = verify_segments(self.profile, self.jobs, self.render_path)
+
+        if self.error != None:
+            print "segmented render error:", self.error
+        for issue in self.seam_issues:
+            print "segmented render seam check:", issue
+
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+        self.running = False
+        self.stopped = True
+
+    def shutdown(self):
+        self.lock.acquire()
+        self.aborted = True
+        for job in self.jobs:
+            if job.process != None and job.process.poll() == None:
+                job.process.terminate()
+        self.lock.release()
+
+    def get_render_fraction(self):
+        frames_done = sum([min(job.frames_done, job.get_length()) for job in self.jobs])
+        return float(frames_done) / float(self.end_frame - self.start_frame + 1)
+
+    def _create_jobs(self):
+        if self.smart_render == True:
+            spans = smartrender.get_render_spans(self.seq, self.profile, self.args_vals_list, self.start_frame, self.end_frame)
+        else:
+            spans = [((self.start_frame, self.end_frame), None)]
+
+        # Rendered spans are further split for render processes, copied spans are copied as is.
+        segments = []
+        for frame_range, source_copy in spans:
+            if source_copy == None:
+                for segment_range in get_segment_ranges(self.seq, frame_range[0], frame_range[1], self.segments_count):
+                    segments.append((segment_range, None))
+            else:
+                segments.append((frame_range, source_copy))
+
+        name, extension = os.path.splitext(self.render_path)
+        jobs = []
+        for i in range(0, len(segments)):
+            frame_range, source_copy = segments[i]
+            if len(segments) == 1:
+                segment_path = self.render_path # nothing to join
+            else:
+                segment_path = self.work_dir + "segment_" + str(i).zfill(4) + extension
+            jobs.append(SegmentRenderJob(i, frame_range, segment_path, source_copy))
+
+        self.lock.acquire()
+        self.jobs = jobs
+        self.lock.release()
+
+    def _render_jobs(self, xml_path, args_path, log_file):
+        # Without smart render there is one segment for each process and all are rendered at the same time.
+        workers = []
+        for i in range(0, max(1, min(self.segments_count, len(self.jobs)))):
+            worker = threading.Thread(target=self._worker_run, args=(xml_path, args_path, log_file))
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
+
+    def _worker_run(self, xml_path, args_path, log_file):
+        while True:
+            self.lock.acquire()
+            if self.aborted == True or self.next_job >= len(self.jobs):
+                self.lock.release()
+                return
+            job = self.jobs[self.next_job]
+            self.next_job += 1
+            if job.render_done == True: # done on earlier pass
+                self.lock.release()
+                continue
+            if job.source_copy == None:
+                launch_render_process(job, xml_path, self.profile, args_path, log_file)
+            else:
+                job.process = subprocess.Popen(_get_copy_command(job, self.profile, self.args_vals_list),
+                                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=log_file)
+            self.lock.release()
+
+            if job.source_copy == None:
+                read_render_process_output(job)
+                job.process.wait()
+            else:
+                job.process.communicate()
+                if job.process.returncode == 0:
+                    job.frames_done = job.get_length()
+                    job.render_done = True
+
+
+def get_render_error(render_player):
+    """
+    Returns error message if segmented render failed or its output did not pass seam checks, or None.
+    FileRenderPlayer objects have no error information and always give None.
+    """
+    error = getattr(render_player, "error", None)
+    if error != None:
+        return error
+    seam_issues = getattr(render_player, "seam_issues", [])
+    if len(seam_issues) > 0:
+        return "segment seams check failed: " + "; ".join(seam_issues)
+    return None
+
+def get_mismatched_copy_jobs(jobs):
+    """
+    Returns list of copied segment jobs that can't be joined as is with rest of the segments.
+
+    Codec parameters of copied segments are compared with those of segments rendered with MLT,
+    or if all segments are copied, with the first segment. If those can't be compared,
+    all copied segments are returned.
+    """
+    rendered_jobs = [job for job in jobs if job.source_copy == None]
+    copy_jobs = [job for job in jobs if job.source_copy != None]
+    if len(copy_jobs) == 0:
+        return []
+
+    if len(rendered_jobs) > 0:
+        reference_parameters = smartrender.get_stream_parameters(rendered_jobs[0].segment_path)
+    else:
+        reference_parameters = smartrender.get_stream_parameters(copy_jobs[0].segment_path)
+    if reference_parameters == None:
+        return copy_jobs
+
+    mismatched_jobs = []
+    for job in copy_jobs:
+        if smartrender.get_stream_parameters(job.segment_path) != reference_parameters:
+            mismatched_jobs.append(job)
+
+    # When all segments were copied, rendered segments would not match remaining copies either.
+    if len(rendered_jobs) == 0 and len(mismatched_jobs) > 0:
+        return copy_jobs
+    return mismatched_jobs
+
+def write_render_files(seq, args_vals_list, work_dir):
+    """
+    Writes sequence MLT XML and pickled render args for render processes and returns their paths.
+    Sequence is written once and every render process builds its own pipeline from it.
+    """
+    xml_path = work_dir + "sequence.mlt"
+    xml_file = open(xml_path, "w")
+    xml_file.write(mltxmlwriter.get_sequence_xml(seq))
+    xml_file.close()
+
+    args_path = work_dir + "render_args"
+    args_file = open(args_path, "w")
+    pickle.dump(args_vals_list, args_file)
+    args_file.close()
+
+    return (xml_path, args_path)
+
+def launch_render_process(job, xml_path, profile, args_path, log_file):
+    job.process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladesegmentrender",
+                                    respaths.ROOT_PATH,
+                                    xml_path,
+                                    profile.description(),
+                                    args_path,
+                                    job.segment_path,
+                                    str(job.frame_range[0]),
+                                    str(job.frame_range[1])],
+                                    stdout=subprocess.PIPE, stderr=log_file)
+
+def read_render_process_output(job):
+    """
+    Updates job progress from render process output until process closes its output.
+    """
+    for line in iter(job.process.stdout.readline, ""):
+        if line.startswith(PROGRESS_TAG):
+            job.frames_done = int(line[len(PROGRESS_TAG):])
+        elif line.startswith(DONE_TAG):
+            job.frames_done = job.get_length()
+            job.render_done = True
+
+def _get_copy_command(job, profile, args_vals_list):
+    # Copy starts at a keyframe and has exactly the segment video frames, audio is cut to the same duration.
+    source_copy = job.source_copy
+    duration = float(job.get_length()) * float(profile.frame_rate_den()) / float(profile.frame_rate_num())
+    command = [get_ffmpeg_path(), "-v", "error", "-y",
+               "-ss", "%.6f" % source_copy.start_time, "-i", source_copy.path,
+               "-frames:v", str(source_copy.frames_count), "-t", "%.6f" % duration,
+               "-map", "0:v:0", "-map", "0:a:0", "-c", "copy", "-avoid_negative_ts", "make_zero"]
+    container = renderconsumer.get_args_vals_list_value(args_vals_list, "f")
+    if container != None:
+        command += ["-f", container]
+    return command + [job.segment_path]
+
+# ------------------------------------------------- join and verify
+def join_segments(segment_paths, render_path, work_dir):
+    """
+    Joins segment files without re-encoding. Returns error message or None.
+    """
+    list_path = work_dir + "segments.txt"
+    list_file = open(list_path, "w")
+    for segment_path in segment_paths:
+        list_file.write("file '" + segment_path.replace("'", "'\\''") + "'\n")
+    list_file.close()
+
+    process = subprocess.Popen([get_ffmpeg_path(), "-v", "error", "-y", "-f", "concat", "-safe", "0",
+                                "-i", list_path, "-map", "0", "-c", "copy", render_path],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = process.communicate()[0]
+    if process.returncode != 0:
+        return "segments join failed: " + output
+    return None
+
+def verify_segments(profile, jobs, render_path):
+    """
+    Returns list of issues found in frame counts of segments and joined file, and in
+    audio and video durations of segments that would show as gaps or overlaps at seams.
+    """
+    issues = []
+    frame_duration = 1.0 / profile.fps()
+    total_length = 0
+    for job in jobs:
+        total_length += job.get_length()
+        if len(jobs) > 1:
+            issues += _get_frame_count_issues(profile, job.segment_path, job.get_length(), "segment " + str(job.index))
+            issues += _get_audio_seam_issues(job.segment_path, frame_duration, "segment " + str(job.index))
+
+    issues += _get_frame_count_issues(profile, render_path, total_length, "joined file")
+    return issues
+
+def _get_frame_count_issues(profile, file_path, expected_length, name):
+    producer = mlt.Producer(profile, str(file_path))
+    if producer.is_valid() == False:
+        return [name + " can not be opened"]
+    length = producer.get_length()
+    if length != expected_length:
+        return [name + " has " + str(length) + " frames, expected " + str(expected_length)]
+    return []
+
+def _get_audio_seam_issues(file_path, frame_duration, name):
+    durations = _get_stream_durations(file_path)
+    if not("video" in durations and "audio" in durations):
+        return [] # no audio, or durations not available
+    difference = durations["audio"] - durations["video"]
+    if abs(difference) > frame_duration:
+        return [name + " audio is " + str(int(difference * 1000)) + " ms " + \
+                ["shorter", "longer"][difference > 0] + " than video, audio will not be continuous at seam"]
+    return []
+
+def _get_stream_durations(file_path):
+    # Returns dict of stream type -> duration in seconds for first stream of each type that has duration.
+    if get_ffprobe_path() == None:
+        return {}
+    process = subprocess.Popen([get_ffprobe_path(), "-v", "error", "-show_entries", "stream=codec_type,duration",
+                                "-of", "csv=p=0", file_path],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output = process.communicate()[0]
+    durations = {}
+    for line in output.splitlines():
+        try:
+            stream_type, duration = line.strip().split(",")[0:2]
+            durations.setdefault(stream_type, float(duration))
+        except ValueError:
+            pass # "N/A" durations
+    return durations
+
+
+# ------------------------------------------------- render process
+def main():
+    root_path, xml_path, profile_name, args_path, segment_path, range_in, range_out = sys.argv[1:8]
+
+    respaths.set_paths(root_path)
+
+    mlt.Factory().init()
+
+    # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs
+    locale.setlocale(locale.LC_NUMERIC, 'C')
+
+    mltprofiles.load_profile_list()
+    profile = mltprofiles.get_profile(profile_name)
+
+    args_file = open(args_path)
+    args_vals_list = pickle.load(args_file)
+    args_file.close()
+
+    # Cut producer ends at segment out frame, so consumer writes exactly the segment frames.
+    sequence_producer = mlt.Producer(profile, "xml:" + xml_path)
+    producer = sequence_producer.cut(int(range_in), int(range_out))
+    consumer = renderconsumer.get_mlt_render_consumer(segment_path, profile, args_vals_list)
+
+    render_thread = renderconsumer.FileRenderPlayer(None, producer, consumer, 0, producer.get_length() - 1)
+    render_thread.start()
+
+    while render_thread.stopped == False:
+        sys.stdout.write(PROGRESS_TAG + str(max(0, producer.frame())) + "\n")
+        sys.stdout.flush()
+        time.sleep(PROGRESS_REPORT_INTERVAL)
+
+    render_thread.shutdown()
+
+    sys.stdout.write(DONE_TAG + "\n")
+    sys.stdout.flush()
+
+
+# ------------------------------------------------- benchmark
+def segmented_render_benchmark():
+    """
+    Development benchmark that renders current sequence with first encoding option in a single
+    render process, in segments with a process for each CPU, and with smart render, and prints
+    render times and seam check results. Run by starting application with -segmentrenderbenchmark flag.
+    """
+    import editorstate
+    import multiprocessing
+
+    seq = editorstate.current_sequence()
+    profile = editorstate.PROJECT().profile
+    encoding_option = renderconsumer.encoding_options[0]
+    args_vals_list = renderconsumer.get_args_vals_tuples_list_for_encoding_and_quality(profile, 0, -1)
+    end_frame = seq.get_length() - 1
+
+    try:
+        cpu_count = multiprocessing.cpu_count()
+    except NotImplementedError:
+        cpu_count = 1
+
+    bench_dir = utils.get_hidden_user_dir_path() + SEGMENTS_DIR + "benchmark/"
+    if not os.path.exists(bench_dir):
+        os.makedirs(bench_dir)
+
+    print "segmented render benchmark, frames:", end_frame + 1, "encoding:", encoding_option.name
+    runs = [(segments_count, False) for segments_count in sorted(set([1, 2, cpu_count]))] + [(cpu_count, True)]
+    for segments_count, smart_render in runs:
+        render_path = bench_dir + "render_" + str(segments_count) + "_" + str(smart_render) + "." + encoding_option.extension
+        render_player = SegmentedRenderPlayer(seq, profile, render_path, args_vals_list, 0, end_frame, segments_count, smart_render)
+        start = time.time()
+        render_player.run() # in this thread, benchmark blocks GUI
+        elapsed = time.time() - start
+        copied = len([job for job in render_player.jobs if job.source_copy != None])
+        print "processes %2d, smart render %5s, segments %3d, copied %3d: %7.2f s %7.1f fps, error: %s, seam issues: %d" % \
+              (segments_count, smart_render, len(render_player.jobs), copied, elapsed, (end_frame + 1) / elapsed, render_player.error, len(render_player.seam_issues))
+
+    shutil.rmtree(bench_dir, ignore_errors=True)
@@ -23,6 +23,7 @@ Module contains class Sequence that is the multitrack media object being edited
 by the application. A project has 1-n of these.
 """
 
+import bisect
 import mlt
 import os
 
@@ -84,6 +85,10 @@ RGB_PARADE_MODE = 2
 # black clip
 black_track_clip = None
 
+# Returns (frame, clip) preview cache clips to display on hidden track, set at app start-up
+# to avoid circular imports. Render processes that do not display timeline leave this None.
+get_preview_cache_clips = None
+
 # Track that all audio is mixed down to combine for output.
 AUDIO_MIX_DOWN_TRACK = 0
 
@@ -147,6 +152,9 @@ class Sequence:
         self.rgbparade.set("overlay sides", "0.0")
         self.outputfilter = None
 
+        # Index for finding compositors in frame range, rebuilt when compositors change.
+        self.compositors_index = CompositorsIndex()
+
     # ---------------------------------------- tracks
     def create_default_tracks(self):
         """
@@ -254,6 +262,9 @@ class Sequence:
 
         # This is kept in sync with mlt.Playlist inner data
         track.clips = []
+
+        # Clip start frames and indexes for track.clips, see TrackClipsIndex
+        track.clips_index = TrackClipsIndex(track)
         
         # Display height
         track.height = TRACK_HEIGHT_NORMAL
@@ -573,8 +584,23 @@ class Sequence:
     def get_compositors(self):
         return self.compositors
 
+    def get_compositors_in_range(self, first_frame, last_frame):
+        """
+        Returns compositors overlapping frame range, both ends inclusive, in compositors list order.
+        """
+        if self.compositors_index.compositors is not self.compositors:
+            self.compositors_index.dirty = True
+        return self.compositors_index.get_in_range(self.compositors, first_frame, last_frame)
+
+    def compositors_changed(self):
+        """
+        Called after compositors have been added, removed or moved.
+        """
+        self.compositors_index.dirty = True
+
     def add_compositor(self, compositor):
         self.compositors.append(compositor)
+        self.compositors_changed()
 
     def remove_compositor(self, old_compositor):
         #edit.old_compositors.append(old_compositor)# HACK. Garbage collecting compositors causes crashes.
@@ -592,6 +618,7 @@ class Sequence:
                 raise ValueError('compositor not found using destroy_id')
             
         self.field.disconnect_service(old_compositor.transition.mlt_transition)
+        self.compositors_changed()
 
     def get_compositor_for_destroy_id(self, destroy_id):
         for comp in self.compositors:
@@ -604,6 +631,7 @@ class Sequence:
         Compositor order must be from top to bottom or will not work.
         """
         self.compositors.sort(_sort_compositors_comparator)
+        self.compositors_changed()
 
     # -------------------------- monitor clip, trimming display, output mode and hidden track
     def display_monitor_clip(self, path, pattern_producer_data=None):
@@ -690,7 +718,7 @@ class Sequence:
         self.tracks[-1].clips = []
         self.tracks[-1].clear()
 
-        edit._insert_blank(self.tracks[-1], 0, seq_len) # TRIM INIT CRASH HACK. This being empty crashes a lot, so far unexplained.
+        self._fill_hidden_track(seq_len) # TRIM INIT CRASH HACK. This being empty crashes a lot, so far unexplained.
         
         self._unmute_editable()
 
@@ -711,7 +739,25 @@ class Sequence:
         if seq_len < 1:
             seq_len = 1
             
-        edit._insert_blank(self.tracks[-1], 0, seq_len)
+        self._fill_hidden_track(seq_len)
+
+    def _fill_hidden_track(self, seq_len):
+        # Hidden track has a blank covering the sequence, with preview cache clips on top of
+        # the ranges they have been rendered from.
+        track = self.tracks[-1]
+        position = 0
+        if get_preview_cache_clips != None:
+            for frame, clip in get_preview_cache_clips(self):
+                length = clip.get_length()
+                if frame < position or frame + length > seq_len:
+                    continue # range has been left partly outside sequence by edits
+                if frame > position:
+                    edit._insert_blank(track, len(track.clips), frame - position)
+                edit._insert_clip(track, clip, len(track.clips), 0, length - 1)
+                position = frame + length
+
+        if seq_len > position:
+            edit._insert_blank(track, len(track.clips), seq_len - position)
 
     def get_seq_range_frame(self, frame):
         # NEEDED FOR TRIM CRASH HACK, REMOVE IF FIXED
@@ -778,6 +824,7 @@ class Sequence:
         black_track_clip.clip_in = c_in
         black_track_clip.clip_out = c_out
         black_track_clip.set_in_and_out(c_in, c_out)
+        self.tracks[0].clips_index.invalidate()
 
     def get_length(self):
         return self.multitrack.get_length()
@@ -812,14 +859,14 @@ class Sequence:
                 continue
             
             # Get index and clip
-            index = track.get_clip_index_at(tline_frame)
+            index = track.clips_index.get_clip_index_at(tline_frame)
             try:
                 clip = track.clips[index]            
             except Exception:
                 continue # Frame after last clip in track
             
             # Get next cut frame
-            clip_start_in_tline = track.clip_start(index)
+            clip_start_in_tline = track.clips_index.clip_start(index)
             length = clip.clip_out - clip.clip_in 
             next_cut_frame = clip_start_in_tline + length + 1 # +1 clip out inclusive
  
@@ -842,8 +889,8 @@ class Sequence:
                 continue
             
             # Get index and clip start
-            index = track.get_clip_index_at(tline_frame)
-            clip_start_frame = track.clip_start(index)
+            index = track.clips_index.get_clip_index_at(tline_frame)
+            clip_start_frame = track.clips_index.clip_start(index)
             
             # If we are on cut, we want previous cut
             if clip_start_frame == tline_frame:
@@ -856,7 +903,7 @@ class Sequence:
                 continue # index not good clip
             
             # Get prev cut frame
-            next_cut_frame = track.clip_start(index)
+            next_cut_frame = track.clips_index.clip_start(index)
             
             # Set cut frame
             if cut_frame == -1:
@@ -868,13 +915,13 @@ class Sequence:
     
     def get_closest_cut_frame(self, track_id, frame):
         track = self.tracks[track_id]
-        index = track.get_clip_index_at(frame)
+        index = track.clips_index.get_clip_index_at(frame)
         try:
             clip = track.clips[index]            
         except Exception:
             return -1
             
-        start_frame = track.clip_start(index)
+        start_frame = track.clips_index.clip_start(index)
         start_dist = frame - start_frame
         end_frame = start_frame + (clip.clip_out - clip.clip_in + 1) # frames are inclusive
         end_dist = end_frame - frame
@@ -910,7 +957,7 @@ class Sequence:
         """
         Returns index or -1 if frame not on a clip
         """
-        index = track.get_clip_index_at(frame)
+        index = track.clips_index.get_clip_index_at(frame)
         try:
             clip = track.clips[index]
         except Exception:
@@ -1007,6 +1054,129 @@ def _sort_compositors_comparator(a_comp, b_comp):
     else:
         return 0
 
+
+class CompositorsIndex:
+    """
+    Compositors sorted by in frame for finding compositors overlapping a frame range
+    using bisect instead of going through all compositors.
+
+    Index is rebuilt on first use after it has been flagged dirty.
+    """
+    def __init__(self):
+        self.compositors = None # list the index was built from
+        self.starts = [] # sorted compositor in frames
+        self.items = [] # (compositor list index, compositor) tuples in same order as starts
+        self.max_length = 0
+        self.dirty = True
+
+    def _build(self, compositors):
+        sorted_items = []
+        self.max_length = 0
+        for i in range(0, len(compositors)):
+            comp = compositors[i]
+            sorted_items.append((comp.clip_in, i, comp))
+            self.max_length = max(self.max_length, comp.clip_out - comp.clip_in + 1)
+        sorted_items.sort(key=lambda item: (item[0], item[1]))
+
+        self.starts = [item[0] for item in sorted_items]
+        self.items = [(item[1], item[2]) for item in sorted_items]
+        self.compositors = compositors
+        self.dirty = False
+
+    def get_in_range(self, compositors, first_frame, last_frame):
+        if self.dirty:
+            self._build(compositors)
+
+        # Compositors overlapping range start at or after first_frame - max_length.
+        start = bisect.bisect_left(self.starts, first_frame - self.max_length + 1)
+        end = bisect.bisect_right(self.starts, last_frame)
+        hits = []
+        for i in range(start, end):
+            list_index, comp = self.items[i]
+            if comp.clip_out >= first_frame:
+                hits.append((list_index, comp))
+        hits.sort()
+
+        return [hit[1] for hit in hits]
+
+
+class TrackClipsIndex:
+    """
+    Clip start frames and clip to index map for track.clips.
+
+    Replaces mlt.Playlist.clip_start() and get_clip_index_at() and list.index()
+    that all go through clips linearly. Index is rebuilt on first use after
+    track.clips has been edited, edit.py atomic edit ops invalidate it.
+    """
+    def __init__(self, track):
+        self.track = track
+        self.clips = None # clips list the index was built from
+        self.clips_count = -1
+        self.starts = [] # len(clips) + 1 start frames, last item is track length
+        self.clip_indexes = {} # id(clip) -> index
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def _update(self):
+        clips = self.track.clips
+        if self.dirty == False and clips is self.clips and len(clips) == self.clips_count:
+            return
+
+        starts = [0]
+        clip_indexes = {}
+        frame = 0
+        for i in range(0, len(clips)):
+            clip = clips[i]
+            if not(id(clip) in clip_indexes): # list.index() returns first
+                clip_indexes[id(clip)] = i
+            frame += clip.clip_out - clip.clip_in + 1 # +1 out inclusive
+            starts.append(frame)
+
+        self.starts = starts
+        self.clip_indexes = clip_indexes
+        self.clips = clips
+        self.clips_count = len(clips)
+        self.dirty = False
+
+    def clip_start(self, index):
+        """
+        Same as mlt.Playlist.clip_start(), returns track length for index after last clip.
+        """
+        self._update()
+        if index < 0:
+            return 0
+        if index >= self.clips_count:
+            return self.starts[-1]
+        return self.starts[index]
+
+    def clip_index(self, clip):
+        """
+        Same as track.clips.index(clip), raises ValueError if clip not on track.
+        """
+        self._update()
+        try:
+            index = self.clip_indexes[id(clip)]
+            if self.clips[index] is clip:
+                return index
+        except KeyError:
+            pass
+        raise ValueError("clip not in track")
+
+    def get_clip_index_at(self, frame):
+        """
+        Same as mlt.Playlist.get_clip_index_at(), returns clips count for frames after last clip.
+        """
+        self._update()
+        index = bisect.bisect_right(self.starts, frame) - 1
+        if index < 0:
+            return 0
+        if index > self.clips_count:
+            return self.clips_count
+        return index
+
+
 # ----------------------------- sequence cloning for tracks count change
 def create_sequence_clone_with_different_track_count(old_seq, v_tracks, a_tracks):
     # Create new sequence with different number of tracks
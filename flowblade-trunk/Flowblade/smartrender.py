@@ -0,0 +1,331 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module finds timeline spans that can be copied from source media files to render without re-encoding.
+
+A span can be copied when a single clip is the only content on timeline, the clip plays
+its source file as is with no filters, speed change, compositors, watermark or audio changes, and the source
+streams already have the codecs and formats that render encoding args would produce.
+Copied spans are snapped to source keyframes so that they consist of whole GOPs,
+frames before first and after last keyframe of a span are rendered by MLT with the rest of timeline.
+
+Copied and rendered spans are rendered and joined by segmentrender.SegmentedRenderPlayer.
+Joined file keeps codec extradata (e.g. avcC for H.264 in mp4) of only one segment, so copied
+segments are only joined as is if their codec parameters are the same as those of the other segments,
+and are rendered by MLT otherwise.
+"""
+
+import distutils.spawn
+import fractions
+import json
+import subprocess
+
+import appconsts
+import renderconsumer
+
+MIN_COPY_LENGTH = 50 # frames, shorter copies do not pay for extra render process and join seam
+
+# Source stream codec names produced by ffmpeg encoders that have a different name than the codec
+ENCODER_CODEC_NAMES = { "libx264":"h264",
+                        "libx265":"hevc",
+                        "libvpx":"vp8",
+                        "libvpx-vp9":"vp9",
+                        "libtheora":"theora",
+                        "libxvid":"mpeg4",
+                        "libmp3lame":"mp3",
+                        "libvorbis":"vorbis",
+                        "libopus":"opus",
+                        "libfdk_aac":"aac"}
+
+MLT_DEFAULT_AUDIO_FREQUENCY = 48000
+MLT_DEFAULT_AUDIO_CHANNELS = 2
+
+_source_infos = {} # source path -> SourceInfo or None, sources are probed once per render
+
+
+class SourceCopy:
+    """
+    Range of source file packets that is copied to render as is.
+    """
+    def __init__(self, path, start_time, frames_count):
+        self.path = path
+        self.start_time = start_time # seconds from file start, keyframe time
+        self.frames_count = frames_count
+
+
+class SourceInfo:
+
+    def __init__(self, probe_data):
+        self.video = None
+        self.audio = None
+        for stream in probe_data.get("streams", []):
+            if stream.get("codec_type") == "video" and self.video == None:
+                self.video = stream
+            elif stream.get("codec_type") == "audio" and self.audio == None:
+                self.audio = stream
+        self.start_time = _get_float(probe_data.get("format", {}), "start_time")
+
+
+class OutputFormat:
+    """
+    Stream formats render encoding args produce, sources are compared against these.
+    """
+    def __init__(self, profile, args_vals_list):
+        vcodec = renderconsumer.get_args_vals_list_value(args_vals_list, "vcodec")
+        acodec = renderconsumer.get_args_vals_list_value(args_vals_list, "acodec")
+        self.video_codec = ENCODER_CODEC_NAMES.get(vcodec, vcodec)
+        self.audio_codec = ENCODER_CODEC_NAMES.get(acodec, acodec)
+        self.container = renderconsumer.get_args_vals_list_value(args_vals_list, "f")
+        self.pix_fmt = renderconsumer.get_args_vals_list_value(args_vals_list, "pix_fmt")
+        self.size = renderconsumer.get_args_vals_list_value(args_vals_list, "s", str(profile.width()) + "x" + str(profile.height()))
+        self.fps = fractions.Fraction(profile.frame_rate_num(), profile.frame_rate_den())
+        self.progressive = profile.progressive()
+        self.audio_frequency = int(renderconsumer.get_args_vals_list_value(args_vals_list, "ar", MLT_DEFAULT_AUDIO_FREQUENCY))
+        self.audio_channels = int(renderconsumer.get_args_vals_list_value(args_vals_list, "ac", MLT_DEFAULT_AUDIO_CHANNELS))
+
+        # Encodings with a fixed encoder profile are left out because copies of sources with other profiles
+        # would be rendered anyway after segment codec parameters check, and intra only encodings
+        # because copying does not save much compared to their fast encode.
+        self.copyable = (vcodec != None and acodec != None
+                         and renderconsumer.get_args_vals_list_value(args_vals_list, "vprofile") == None
+                         and renderconsumer.get_args_vals_list_value(args_vals_list, "intra") == None
+                         and renderconsumer.get_args_vals_list_value(args_vals_list, "video_off") == None)
+
+    def matches(self, source_info):
+        video = source_info.video
+        audio = source_info.audio
+        if video == None or audio == None:
+            return False
+
+        if video.get("codec_name") != self.video_codec:
+            return False
+        if str(video.get("width")) + "x" + str(video.get("height")) != self.size:
+            return False
+        if self.pix_fmt != None and video.get("pix_fmt") != self.pix_fmt:
+            return False
+        try:
+            if fractions.Fraction(video.get("r_frame_rate", "0/1")) != self.fps:
+                return False
+        except (ValueError, ZeroDivisionError):
+            return False
+        if self.progressive and video.get("field_order", "progressive") not in ("progressive", "unknown"):
+            return False
+
+        if audio.get("codec_name") != self.audio_codec:
+            return False
+        if int(audio.get("sample_rate", 0)) != self.audio_frequency:
+            return False
+        if int(audio.get("channels", 0)) != self.audio_channels:
+            return False
+
+        return True
+
+
+# ------------------------------------------------- spans
+def get_render_spans(seq, profile, args_vals_list, start_frame, end_frame):
+    """
+    Returns list of ((in, out), copy) spans covering start_frame - end_frame in timeline order.
+    copy is SourceCopy for spans copied from source files and None for spans rendered with MLT.
+    """
+    global _source_infos
+    _source_infos = {}
+
+    # Watermark is composited on whole sequence output, copied spans would not have it.
+    output_format = OutputFormat(profile, args_vals_list)
+    if output_format.copyable == False or get_ffprobe_path() == None or seq.watermark_filter != None:
+        return [((start_frame, end_frame), None)]
+
+    spans = []
+    render_start = start_frame # first frame not yet in spans
+    for span_in, span_out, clip, source_in in _get_single_clip_spans(seq, start_frame, end_frame):
+        if _is_copyable_clip(clip) == False:
+            continue
+        source_info = _get_source_info(clip.path)
+        if source_info == None or output_format.matches(source_info) == False:
+            continue
+        copy_range = _get_keyframe_snapped_range(clip, source_info, output_format.fps, source_in, source_in + span_out - span_in)
+        if copy_range == None:
+            continue
+
+        copy_in, copy_out, copy_start_time = copy_range
+        tline_in = span_in + copy_in - source_in
+        tline_out = span_in + copy_out - source_in
+        if tline_in > render_start:
+            spans.append(((render_start, tline_in - 1), None))
+        spans.append(((tline_in, tline_out), SourceCopy(clip.path, copy_start_time, copy_out - copy_in + 1)))
+        render_start = tline_out + 1
+
+    if render_start <= end_frame:
+        spans.append(((render_start, end_frame), None))
+
+    return spans
+
+def _get_single_clip_spans(seq, start_frame, end_frame):
+    # Returns (in, out, clip, clip source in frame) spans where a single clip is the only timeline
+    # content and no compositors are active.
+    items = [] # (timeline in, timeline out, clip)
+    boundaries = set([start_frame, end_frame + 1])
+    for track in seq.tracks[1:len(seq.tracks) - 1]: # black background and hidden track are not content
+        position = 0
+        for clip in track.clips:
+            length = clip.clip_out - clip.clip_in + 1
+            if clip.is_blanck_clip == False and position <= end_frame and position + length > start_frame:
+                items.append((position, position + length - 1, clip, track))
+                boundaries.add(position)
+                boundaries.add(position + length)
+            position += length
+
+    for compositor in seq.get_compositors_in_range(start_frame, end_frame):
+        boundaries.add(compositor.clip_in)
+        boundaries.add(compositor.clip_out + 1)
+
+    boundaries = sorted([b for b in boundaries if b >= start_frame and b <= end_frame + 1])
+    items.sort(key=lambda item: item[0])
+
+    spans = []
+    active = []
+    next_item = 0
+    for i in range(0, len(boundaries) - 1):
+        span_in = boundaries[i]
+        span_out = boundaries[i + 1] - 1
+        active = [item for item in active if item[1] >= span_in]
+        while next_item < len(items) and items[next_item][0] <= span_in:
+            if items[next_item][1] >= span_in:
+                active.append(items[next_item])
+            next_item += 1
+
+        if len(active) != 1 or len(seq.get_compositors_in_range(span_in, span_out)) > 0:
+            continue
+        item_in, item_out, clip, track = active[0]
+        if _is_copyable_track(seq, track) == False:
+            continue
+        source_in = clip.clip_in + span_in - item_in
+        # Spans split only by boundaries of other content are joined back together.
+        if len(spans) > 0 and spans[-1][2] is clip and spans[-1][1] == span_in - 1:
+            spans[-1] = (spans[-1][0], span_out, clip, spans[-1][3])
+        else:
+            spans.append((span_in, span_out, clip, source_in))
+
+    return spans
+
+def _is_copyable_clip(clip):
+    return (clip.media_type == appconsts.VIDEO
+            and len(clip.filters) == 0
+            and clip.mute_filter == None
+            and clip.stream_indexes == None
+            and getattr(clip, "speed", None) == None)
+
+def _is_copyable_track(seq, track):
+    return (track.type == appconsts.VIDEO
+            and track.mute_state == 0 # video and audio on
+            and track.audio_gain == 1.0
+            and track.audio_pan == appconsts.NO_PAN
+            and seq.master_audio_gain == 1.0
+            and seq.master_audio_pan == appconsts.NO_PAN)
+
+def _get_keyframe_snapped_range(clip, source_info, fps, source_in, source_out):
+    # Returns (first copied frame, last copied frame, first frame time) of source frames that start
+    # at a keyframe and end before a keyframe or at file end, or None if range has no such frames.
+    keyframes = _get_keyframes(clip.path, source_info, fps, source_in, source_out)
+    keyframes[clip.get_length()] = None # end of file ends a GOP
+
+    starts = [frame for frame in keyframes if frame >= source_in and frame <= source_out and keyframes[frame] != None]
+    ends = [frame for frame in keyframes if frame <= source_out + 1]
+    if len(starts) == 0:
+        return None
+    copy_in = min(starts)
+    copy_out = max(ends) - 1
+    if copy_out - copy_in + 1 < MIN_COPY_LENGTH:
+        return None
+
+    # Seek time is given a fraction of frame after keyframe time, so that rounding does not
+    # make ffmpeg seek to previous keyframe.
+    start_time = keyframes[copy_in] - source_info.start_time + 0.1 / float(fps)
+    return (copy_in, copy_out, start_time)
+
+def _get_keyframes(path, source_info, fps, source_in, source_out):
+    # Returns dict of keyframe source frame -> keyframe time for frames around source range.
+    video_start = _get_float(source_info.video, "start_time", source_info.start_time)
+    margin = 1.0
+    read_start = max(0.0, video_start + source_in / float(fps) - margin)
+    read_end = video_start + (source_out + 1) / float(fps) + margin
+    output = _run_ffprobe(["-select_streams", "v:0", "-read_intervals", "%f%%%f" % (read_start, read_end),
+                           "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path])
+    keyframes = {}
+    for line in output.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 2 or not fields[1].startswith("K"):
+            continue
+        try:
+            pts_time = float(fields[0])
+        except ValueError:
+            continue # "N/A" times
+        keyframes[int(round((pts_time - video_start) * float(fps)))] = pts_time
+    return keyframes
+
+
+# ------------------------------------------------- ffprobe
+def get_ffprobe_path():
+    return distutils.spawn.find_executable("ffprobe")
+
+def _get_source_info(path):
+    if not(path in _source_infos):
+        output = _run_ffprobe(["-show_entries", "format=start_time:stream=codec_type,codec_name,width,height,pix_fmt," \
+                               + "r_frame_rate,field_order,start_time,sample_rate,channels", "-of", "json", path])
+        try:
+            _source_infos[path] = SourceInfo(json.loads(output))
+        except ValueError:
+            _source_infos[path] = None
+    return _source_infos[path]
+
+def get_stream_parameters(path):
+    """
+    Returns codec parameters of first video and audio streams in file that must be the same in all
+    joined segments, or None if they could not be read.
+    """
+    output = _run_ffprobe(["-show_data_hash", "md5", "-show_entries", "stream=codec_type,codec_name,profile,level," \
+                           + "width,height,pix_fmt,sample_rate,channels,extradata_hash", "-of", "json", path])
+    try:
+        source_info = SourceInfo(json.loads(output))
+    except ValueError:
+        return None
+    # Parameter sets are not known to match if ffprobe does not report extradata.
+    if source_info.video == None or not("extradata_hash" in source_info.video):
+        return None
+
+    parameters = []
+    for stream in (source_info.video, source_info.audio):
+        if stream == None:
+            parameters.append(None)
+        else:
+            parameters.append(tuple(sorted(stream.items())))
+    return tuple(parameters)
+
+def _run_ffprobe(args):
+    process = subprocess.Popen([get_ffprobe_path(), "-v", "error"] + args,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return process.communicate()[0]
+
+def _get_float(data, key, default=0.0):
+    try:
+        return float(data.get(key, default))
+    except (TypeError, ValueError):
+        return default
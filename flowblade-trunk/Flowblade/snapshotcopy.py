@@ -0,0 +1,248 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module copies media files into backup snapshot folders.
+
+Files are transferred concurrently by a pool of threads. A transfer is done as a reflink
+(copy-on-write clone) if file system supports it, then as a hard link if source and target are on
+the same file system, and as a block by block copy otherwise. Sources with identical content are
+transferred once and other targets are linked to the first copy.
+
+Copies are written to temp files and renamed when complete, and they keep source modification times,
+so an interrupted snapshot can be resumed by skipping targets that already match their sources.
+"""
+
+import fcntl
+import md5
+import multiprocessing.pool
+import os
+import shutil
+import threading
+
+COPY_WORKERS = 4 # copying is I/O bound, more threads mostly just seek more
+COPY_BLOCK_SIZE = 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+FICLONE = 0x40049409 # Linux ioctl for cloning file extents, _IOW(0x94, 9, int)
+
+# Written in snapshot folder when copying starts and removed when snapshot is complete.
+INCOMPLETE_MARKER = ".flowblade_snapshot_incomplete"
+
+TEMP_SUFFIX = ".snapshotpart"
+
+
+# ----------------------------------------------------- resume
+def is_incomplete_snapshot_folder(folder_path):
+    return os.path.isfile(os.path.join(folder_path, INCOMPLETE_MARKER))
+
+def set_snapshot_incomplete(folder_path, incomplete):
+    marker_path = os.path.join(folder_path, INCOMPLETE_MARKER)
+    if incomplete == True:
+        open(marker_path, "w").close()
+    elif os.path.isfile(marker_path):
+        os.remove(marker_path)
+
+
+# ----------------------------------------------------- copying
+class SnapshotCopier:
+    """
+    Transfers list of (source path, target path) copy jobs.
+    get_progress() and current_file can be read from other threads while run() is executing.
+    """
+    def __init__(self, copy_jobs):
+        self.copy_jobs = []
+        targets = set()
+        for source, target in copy_jobs:
+            if not(target in targets):
+                self.copy_jobs.append((source, target))
+                targets.add(target)
+
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.current_file = None
+        self.linked_count = 0
+        self.copied_count = 0
+        self.skipped_count = 0
+        self.lock = threading.Lock()
+
+    def run(self):
+        sizes = {}
+        for source, target in self.copy_jobs:
+            sizes[source] = os.path.getsize(source)
+            self.total_bytes += sizes[source]
+
+        pool = multiprocessing.pool.ThreadPool(COPY_WORKERS)
+        primary_jobs, duplicate_jobs = self._get_deduplicated_jobs(pool, sizes)
+
+        # Duplicates are linked to primary targets, so those need to be done first.
+        for result in pool.imap_unordered(self._transfer_primary, primary_jobs):
+            pass
+        for result in pool.imap_unordered(self._transfer_duplicate, duplicate_jobs):
+            pass
+        pool.close()
+        pool.join()
+
+        self.current_file = None
+
+    def get_progress(self):
+        if self.total_bytes == 0:
+            return 1.0
+        return float(self.done_bytes) / float(self.total_bytes)
+
+    def _get_deduplicated_jobs(self, pool, sizes):
+        # Returns primary jobs and duplicate jobs (source, target, primary target).
+        # Sources are hashed only if some other source has the same size.
+        size_groups = {}
+        for source, target in self.copy_jobs:
+            size_groups.setdefault(sizes[source], []).append((source, target))
+
+        hash_sources = []
+        for jobs in size_groups.values():
+            real_sources = set([os.path.realpath(source) for source, target in jobs])
+            if len(real_sources) > 1:
+                hash_sources = hash_sources + [source for source, target in jobs]
+
+        content_keys = {}
+        for source, content_hash in pool.imap_unordered(_get_content_hash, hash_sources):
+            content_keys[source] = (sizes[source], content_hash)
+
+        primary_jobs = []
+        duplicate_jobs = []
+        primary_targets = {}
+        for source, target in self.copy_jobs:
+            content_key = content_keys.get(source, os.path.realpath(source))
+            if content_key in primary_targets:
+                duplicate_jobs.append((source, target, primary_targets[content_key]))
+            else:
+                primary_targets[content_key] = target
+                primary_jobs.append((source, target))
+
+        return (primary_jobs, duplicate_jobs)
+
+    def _transfer_primary(self, job):
+        source, target = job
+        self.current_file = os.path.basename(source)
+        if _target_matches(source, target):
+            self._file_done(source, "skipped")
+            return
+
+        if _reflink(source, target) or _hard_link(source, target):
+            self._file_done(source, "linked")
+            return
+
+        temp_path = target + TEMP_SUFFIX
+        source_file = open(source, "rb")
+        target_file = open(temp_path, "wb")
+        while True:
+            block = source_file.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            target_file.write(block)
+            self._add_done_bytes(len(block))
+        source_file.close()
+        target_file.close()
+        shutil.copystat(source, temp_path)
+        os.rename(temp_path, target)
+        self._file_done(None, "copied")
+
+    def _transfer_duplicate(self, job):
+        source, target, primary_target = job
+        self.current_file = os.path.basename(source)
+        if _target_matches(primary_target, target):
+            self._file_done(source, "skipped")
+        elif _hard_link(primary_target, target):
+            self._file_done(source, "linked")
+        else:
+            temp_path = target + TEMP_SUFFIX
+            shutil.copy2(primary_target, temp_path)
+            os.rename(temp_path, target)
+            self._file_done(source, "copied")
+
+    def _add_done_bytes(self, bytes_count):
+        self.lock.acquire()
+        self.done_bytes += bytes_count
+        self.lock.release()
+
+    def _file_done(self, source, transfer_type):
+        # source is None when bytes were already counted during copy.
+        self.lock.acquire()
+        if source != None:
+            self.done_bytes += os.path.getsize(source)
+        if transfer_type == "skipped":
+            self.skipped_count += 1
+        elif transfer_type == "linked":
+            self.linked_count += 1
+        else:
+            self.copied_count += 1
+        self.lock.release()
+
+
+# ----------------------------------------------------- module funcs
+def _get_content_hash(source):
+    # Run in pool threads.
+    content_hash = md5.new()
+    f = open(source, "rb")
+    while True:
+        block = f.read(HASH_BLOCK_SIZE)
+        if not block:
+            break
+        content_hash.update(block)
+    f.close()
+    return (source, content_hash.hexdigest())
+
+def _target_matches(source, target):
+    # Target that has same size and modification time as source is from an earlier interrupted snapshot.
+    try:
+        source_stat = os.stat(source)
+        target_stat = os.stat(target)
+    except OSError:
+        return False
+    return (source_stat.st_size == target_stat.st_size
+            and int(source_stat.st_mtime) == int(target_stat.st_mtime))
+
+def _reflink(source, target):
+    temp_path = target + TEMP_SUFFIX
+    try:
+        source_file = open(source, "rb")
+        target_file = open(temp_path, "wb")
+        try:
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+        finally:
+            source_file.close()
+            target_file.close()
+        shutil.copystat(source, temp_path)
+        os.rename(temp_path, target)
+        return True
+    except (IOError, OSError):
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        return False
+
+def _hard_link(source, target):
+    try:
+        if os.stat(source).st_dev != os.stat(os.path.dirname(target)).st_dev:
+            return False
+        if os.path.lexists(target):
+            os.remove(target) # non-matching file from interrupted snapshot
+        os.link(source, target)
+        return True
+    except OSError:
+        return False
@@ -50,8 +50,8 @@ def split_audio_synched(popup_data):
 
     # This is quarenteed because GUI option to do this is only available on this track
     parent_track = current_sequence().tracks[current_sequence().first_video_index]
-    child_index = child_clip_track.clips.index(child_clip)
-    parent_clip_index = parent_track.clips.index(parent_clip)
+    child_index = child_clip_track.clips_index.clip_index(child_clip)
+    parent_clip_index = parent_track.clips_index.clip_index(parent_clip)
     
     data = {"child_index":child_index,
             "child_track":child_clip_track,
@@ -67,8 +67,8 @@ def split_audio_from_clips_list(clips, track):
     item_id = "not actually used"
     for clip in clips:
         # We're using the existing function to do thid need x for clip frame to use it
-        index = track.clips.index(clip)
-        frame = track.clip_start(index)
+        index = track.clips_index.clip_index(clip)
+        frame = track.clips_index.clip_start(index)
         x = tlinewidgets._get_frame_x(frame)
 
         popup_data = (clip, track, item_id, x)
@@ -81,7 +81,7 @@ def _do_split_audio_edit(popup_data):
     clip, track, item_id, x = popup_data
     press_frame = tlinewidgets.get_frame(x)
     index = current_sequence().get_clip_index(track, press_frame)
-    frame = track.clip_start(index)
+    frame = track.clips_index.clip_start(index)
 
     audio_clip = current_sequence().create_file_producer_clip(clip.path)
     audio_clip.media_type = appconsts.AUDIO
@@ -214,14 +214,14 @@ def resync_selected():
             if master_id == -1:
                 master_id = clip.sync_data.master_clip.id
                 current_master_clip = clip.sync_data.master_clip
-                current_master_index = master_track.clips.index(current_master_clip)
+                current_master_index = master_track.clips_index.clip_index(current_master_clip)
             else:
                 if clip.sync_data.master_clip.id != master_id:
-                    next_master_index = master_track.clips.index(clip.sync_data.master_clip)
+                    next_master_index = master_track.clips_index.clip_index(clip.sync_data.master_clip)
                     if current_master_index + 1 == next_master_index:
                         # Masters are consecutive, save data to test next
                         master_id = clip.sync_data.master_clip.id
-                        current_master_index = master_track.clips.index(current_master_clip)
+                        current_master_index = master_track.clips_index.clip_index(current_master_clip)
                     else:
                         all_same_or_consecutive = False
         except:
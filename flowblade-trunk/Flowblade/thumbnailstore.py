@@ -0,0 +1,166 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module handles thumbnail image files in thumbnails folder and decoded thumbnail surfaces in memory.
+
+Thumbnail files are keyed by media file size, modification time and a sample of file content,
+so that a file replaced at the same path gets a new thumbnail and a moved file keeps its thumbnail.
+Each media frame is written as pre-scaled images for all sizes in THUMB_SIZES.
+"""
+
+import cairo
+import collections
+import md5
+import os
+
+import appconsts
+import editorpersistance
+
+THUMB_SIZES = ((appconsts.THUMB_WIDTH / 2, appconsts.THUMB_HEIGHT / 2),
+               (appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT),
+               (appconsts.THUMB_WIDTH * 2, appconsts.THUMB_HEIGHT * 2))
+
+CONTENT_SAMPLE_SIZE = 65536 # bytes from start of file used in thumbnail key
+SURFACES_CACHE_MAX_ITEMS = 400 # default size surfaces are ~40kB each
+
+
+# ------------------------------------------------- thumbnail files
+def get_thumbnail_key(file_path, profile):
+    """
+    Returns key for thumbnails of media file rendered with profile.
+    """
+    try:
+        file_stat = os.stat(file_path)
+        f = open(file_path, "rb")
+        content_sample = f.read(CONTENT_SAMPLE_SIZE)
+        f.close()
+        key_str = str(file_stat.st_size) + str(file_stat.st_mtime) + content_sample
+    except (IOError, OSError):
+        # Image sequences and other MLT resource strings are not files, key them by path.
+        key_str = file_path
+    return md5.new(key_str + profile.description()).hexdigest()
+
+def get_thumbnail_path(key, size=(appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT)):
+    width, height = size
+    return editorpersistance.prefs.thumbnail_folder + "/" + key + _get_size_suffix(width, height)
+
+def get_frame_path(key):
+    # Frame image at profile size, pid makes concurrent import processes write different files.
+    return editorpersistance.prefs.thumbnail_folder + "/" + key + "_frame" + str(os.getpid()) + ".png"
+
+def thumbnails_exist(key):
+    for size in THUMB_SIZES:
+        if not os.path.isfile(get_thumbnail_path(key, size)):
+            return False
+    return True
+
+def write_thumbnails(key, frame_path):
+    """
+    Writes thumbnails for all sizes from frame image and removes frame image.
+    """
+    frame = cairo.ImageSurface.create_from_png(frame_path)
+    for size in THUMB_SIZES:
+        width, height = size
+        thumbnail_path = get_thumbnail_path(key, size)
+        temp_path = thumbnail_path + ".tmp" + str(os.getpid())
+        _get_scaled_surface(frame, width, height).write_to_png(temp_path)
+        os.rename(temp_path, thumbnail_path)
+    os.remove(frame_path)
+    forget(get_thumbnail_path(key))
+
+def _get_size_suffix(width, height):
+    return "_" + str(width) + "x" + str(height) + ".png"
+
+def _get_sized_path(icon_path, width, height):
+    # Icon paths of media files point to default size thumbnails,
+    # other sizes have the same path with different size suffix.
+    default_suffix = _get_size_suffix(appconsts.THUMB_WIDTH, appconsts.THUMB_HEIGHT)
+    if icon_path.endswith(default_suffix):
+        return icon_path[:-len(default_suffix)] + _get_size_suffix(width, height)
+    return icon_path
+
+
+# ------------------------------------------------- decoded surfaces
+class SurfacesCache:
+    """
+    Memory cache for decoded thumbnail surfaces with least recently used eviction.
+    """
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self.items = collections.OrderedDict() # oldest first
+
+    def get(self, key):
+        try:
+            surface = self.items.pop(key)
+        except KeyError:
+            return None
+        self.items[key] = surface # re-inserted as most recently used
+        return surface
+
+    def put(self, key, surface):
+        self.items.pop(key, None)
+        self.items[key] = surface
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+    def remove_path(self, icon_path):
+        for key in self.items.keys():
+            if key[0] == icon_path:
+                del self.items[key]
+
+
+_surfaces_cache = SurfacesCache(SURFACES_CACHE_MAX_ITEMS)
+
+
+def get_surface(icon_path, width, height):
+    """
+    Returns cairo surface of icon at given size, decoding it only if not found in memory cache.
+    Pre-scaled thumbnail file for size is used if one exists.
+    """
+    cache_key = (icon_path, width, height)
+    surface = _surfaces_cache.get(cache_key)
+    if surface != None:
+        return surface
+
+    sized_path = _get_sized_path(icon_path, width, height)
+    if os.path.isfile(sized_path):
+        surface = cairo.ImageSurface.create_from_png(sized_path)
+    else:
+        surface = cairo.ImageSurface.create_from_png(icon_path)
+    if surface.get_width() != width or surface.get_height() != height:
+        surface = _get_scaled_surface(surface, width, height)
+
+    _surfaces_cache.put(cache_key, surface)
+    return surface
+
+def forget(icon_path):
+    """
+    Removes decoded surfaces of icon from memory cache, called when icon file changes.
+    """
+    _surfaces_cache.remove_path(icon_path)
+
+def _get_scaled_surface(surface, width, height):
+    scaled = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    cr = cairo.Context(scaled)
+    cr.scale(float(width) / float(surface.get_width()), float(height) / float(surface.get_height()))
+    cr.set_source_surface(surface, 0, 0)
+    cr.paint()
+    return scaled
@@ -116,7 +116,7 @@ def cut_pressed():
            continue 
 
         # Get index and clip
-        index = track.get_clip_index_at(int(tline_frame))
+        index = track.clips_index.get_clip_index_at(int(tline_frame))
         try:
             clip = track.clips[index]            
             # don't cut blanck clip
@@ -126,7 +126,7 @@ def cut_pressed():
             continue # Frame after last clip in track
 
         # Get cut frame in clip frames
-        clip_start_in_tline = track.clip_start(index)
+        clip_start_in_tline = track.clips_index.clip_start(index)
         clip_frame = tline_frame - clip_start_in_tline + clip.clip_in
 
         # Dont edit if frame on cut.
@@ -331,9 +331,9 @@ def three_point_overwrite_pressed():
     if editevent.track_lock_check_and_user_info(track, three_point_overwrite_pressed, "3 point overwrite"):
         return
     
-    range_start_frame = track.clip_start(movemodes.selected_range_in)
+    range_start_frame = track.clips_index.clip_start(movemodes.selected_range_in)
     out_clip = track.clips[movemodes.selected_range_out]
-    out_start = track.clip_start(movemodes.selected_range_out)
+    out_start = track.clips_index.clip_start(movemodes.selected_range_out)
     range_end_frame = out_start + out_clip.clip_out - out_clip.clip_in
     range_length = range_end_frame - range_start_frame + 1 # calculated end is incl.
 
@@ -411,7 +411,7 @@ def range_overwrite_pressed():
     action = edit.range_overwrite_action(data)
     action.do_edit()
 
-    updater.display_tline_cut_frame(track, track.get_clip_index_at(mark_in_frame))
+    updater.display_tline_cut_frame(track, track.clips_index.get_clip_index_at(mark_in_frame))
 
 def resync_button_pressed():
     syncsplitevent.resync_selected()
@@ -449,7 +449,7 @@ def sync_all_compositors():
     for origin_clip_id in comp_clip_pairings:
         try:
             clip, track, clip_index, compositor = comp_clip_pairings[origin_clip_id]
-            clip_start = track.clip_start(clip_index)
+            clip_start = track.clips_index.clip_start(clip_index)
             clip_end = clip_start + clip.clip_out - clip.clip_in
             data = {"compositor":compositor,"clip_in":clip_start,"clip_out":clip_end}
             action = edit.move_compositor_action(data)
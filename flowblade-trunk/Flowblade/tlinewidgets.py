@@ -267,7 +267,51 @@ fake_current_frame = None
 # Used to draw indicators that tell if more frames are available while trimming
 trim_status = appconsts.ON_BETWEEN_FRAME
 
+# Track layers are cached images of tracks that are redrawn only when the track is damaged
+# or view changes. Damaging all layers increments layers generation, edits damage only changed tracks.
+_layers_generation = 0
+_track_layer_generations = {} # track id -> generation
+_edit_damage_pending = False # True after edit has reported damaged tracks and before next draw
+
+# Clip gradients, (stop, stop_l, y, height) -> cairo.LinearGradient
+_clip_gradients = {}
+MAX_CACHED_GRADIENTS = 256
+
 # ------------------------------------------------------------------- module functions
+def damage_all_track_layers():
+    global _layers_generation
+    _layers_generation += 1
+
+def damage_track_layers(track_ids):
+    for track_id in track_ids:
+        _track_layer_generations[track_id] = _track_layer_generations.get(track_id, 0) + 1
+
+def edit_damage_reported(track_ids):
+    """
+    Damages tracks changed by edit and stops repaint requests from damaging all tracks until next draw.
+    """
+    global _edit_damage_pending
+    damage_track_layers(track_ids)
+    _edit_damage_pending = True
+
+def edit_damage_pending():
+    return _edit_damage_pending
+
+def _get_clip_gradient(stop, stop_l, y, height):
+    key = (stop, stop_l, y, height)
+    try:
+        return _clip_gradients[key]
+    except KeyError:
+        pass
+
+    if len(_clip_gradients) > MAX_CACHED_GRADIENTS:
+        _clip_gradients.clear()
+    grad = cairo.LinearGradient (0, y, 0, y + height)
+    grad.add_color_stop_rgba(*stop)
+    grad.add_color_stop_rgba(*stop_l)
+    _clip_gradients[key] = grad
+    return grad
+
 def load_icons():
     global FULL_LOCK_ICON, FILTER_CLIP_ICON, VIEW_SIDE_ICON,\
     COMPOSITOR_CLIP_ICON, INSERT_ARROW_ICON, AUDIO_MUTE_ICON, MARKER_ICON, \
@@ -405,7 +449,7 @@ def _get_frame_x(frame):
     disp_frame = frame - pos
     return disp_frame * pix_per_frame
 
-def compositor_hit(frame, y, sorted_compositors):
+def compositor_hit(frame, y):
     """
     Returns compositor hit with mouse press x,y or None if nothing hit.
     """
@@ -417,25 +461,25 @@ def compositor_hit(frame, y, sorted_compositors):
         
     # Test if compositor hit on track top, so compositor hit on dest track side
     if y >= track_top and y < track_top + (COMPOSITOR_HEIGHT - COMPOSITOR_HEIGHT_OFF):
-       return _comp_hit_on_below_track(frame, track, sorted_compositors)
+       return _comp_hit_on_below_track(frame, track, current_sequence().get_compositors_in_range(frame, frame))
        
     # Test if compositor hit on track bottom, so compositor hit on source track side      
     elif y >= (track_top + track.height - COMPOSITOR_HEIGHT_OFF) and y <=(track_top + track.height):
-       return _comp_hit_on_source_track(frame, track, sorted_compositors)
+       return _comp_hit_on_source_track(frame, track, current_sequence().get_compositors_in_range(frame, frame))
 
     # Hit y is on he stripe where no compositors can be hit
     else:
         return None
 
-def _comp_hit_on_below_track(frame, track, sorted_compositors):
-    for comp in sorted_compositors:
+def _comp_hit_on_below_track(frame, track, frame_compositors):
+    for comp in frame_compositors:
         if comp.transition.b_track - 1 == track.id:
             if comp.clip_in <= frame and comp.clip_out >= frame:
                 return comp
     return None
 
-def _comp_hit_on_source_track(frame, track, sorted_compositors):
-    for comp in sorted_compositors:
+def _comp_hit_on_source_track(frame, track, frame_compositors):
+    for comp in frame_compositors:
         if comp.transition.b_track == track.id:
             if comp.clip_in <= frame and comp.clip_out >= frame:
                 return comp
@@ -954,6 +998,9 @@ class TimeLineCanvas:
         # Drag state
         self.drag_on = False
                 
+        # Cached track images, track id -> (layer key, surface, parent positions, sync children)
+        self.track_layers = {}
+
         # for edit mode setting
         global canvas_widget
         canvas_widget = self
@@ -995,7 +1042,7 @@ class TimeLineCanvas:
 
     def set_pointer_context(self, x, y):
         frame = get_frame(x)
-        hit_compositor = compositor_hit(frame, y, current_sequence().compositors)
+        hit_compositor = compositor_hit(frame, y)
         if hit_compositor != None:
             return
 
@@ -1007,11 +1054,11 @@ class TimeLineCanvas:
         if clip_index == -1:
             return
 
-        clip_start_frame = track.clip_start(clip_index) - pos
+        clip_start_frame = track.clips_index.clip_start(clip_index) - pos
         if abs(x - _get_frame_x(clip_start_frame)) < 5:
             return
 
-        clip_end_frame = track.clip_start(clip_index + 1) - pos
+        clip_end_frame = track.clips_index.clip_start(clip_index + 1) - pos
         if abs(x - _get_frame_x(clip_end_frame)) < 5:
             return
 
@@ -1034,12 +1081,18 @@ class TimeLineCanvas:
 
         # Draw tracks
         for i in range(1, len(current_sequence().tracks) - 1): # black and hidden tracks are ignored
-            self.draw_track(cr
-                            ,current_sequence().tracks[i]
-                            ,_get_track_y(i)
-                            ,w)
+            if editorpersistance.prefs.tline_layer_cache == True:
+                self.draw_track_layer(cr
+                                      ,current_sequence().tracks[i]
+                                      ,_get_track_y(i)
+                                      ,w)
+            else:
+                self.draw_track(cr
+                                ,current_sequence().tracks[i]
+                                ,_get_track_y(i)
+                                ,w)
 
-        self.draw_compositors(cr)
+        self.draw_compositors(cr, w)
         self.draw_sync_relations(cr)
 
         # Exit displaying from fake_current_pointer for SLIDE_TRIM mode if last displayed 
@@ -1074,6 +1127,47 @@ class TimeLineCanvas:
         
         audiowaveformrenderer.render_queued()
 
+        global _edit_damage_pending
+        _edit_damage_pending = False
+
+    def draw_track_layer(self, cr, track, y, width):
+        """
+        Draws track from cached image, track image is redrawn if track is damaged or view has changed.
+        """
+        layer_key = (id(current_sequence()), _layers_generation, _track_layer_generations.get(track.id, 0), 
+                     pos, pix_per_frame, track.height, y, width, 
+                     id(clipeffectseditor.clip), editorstate.display_all_audio_levels)
+        try:
+            key, surface, parent_positions, sync_children = self.track_layers[track.id]
+        except KeyError:
+            key = None
+
+        if key != layer_key:
+            # Draw track in image with sync data collected for this track only.
+            all_parent_positions = self.parent_positions
+            all_sync_children = self.sync_children
+            self.parent_positions = {}
+            self.sync_children = []
+
+            # +1 for clip frame stroke drawn on the bottom edge
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(width), int(track.height) + 1)
+            layer_cr = cairo.Context(surface)
+            layer_cr.translate(0, -y)
+            self.draw_track(layer_cr, track, y, width)
+
+            parent_positions = self.parent_positions
+            sync_children = self.sync_children
+            self.parent_positions = all_parent_positions
+            self.sync_children = all_sync_children
+            self.track_layers[track.id] = (layer_key, surface, parent_positions, sync_children)
+
+        cr.set_source_surface(surface, 0, y)
+        cr.rectangle(0, y, width, track.height + 1)
+        cr.fill()
+
+        self.parent_positions.update(parent_positions)
+        self.sync_children.extend(sync_children)
+
     def draw_track(self, cr, track, y, width):
         """
         Draws visible clips in track.
@@ -1086,8 +1180,8 @@ class TimeLineCanvas:
             text_y = TEXT_Y_SMALL
 
         # Get clip indexes for clips overlapping first and last displayed frame.
-        start = track.get_clip_index_at(int(pos))
-        end = track.get_clip_index_at(int(pos + width / pix_per_frame))
+        start = track.clips_index.get_clip_index_at(int(pos))
+        end = track.clips_index.get_clip_index_at(int(pos + width / pix_per_frame))
 
         width_frames = float(width) / pix_per_frame
 
@@ -1098,7 +1192,7 @@ class TimeLineCanvas:
             end = end + 1
             
         # Get frame of clip.clip_in_in on timeline.
-        clip_start_in_tline = track.clip_start(start)
+        clip_start_in_tline = track.clips_index.clip_start(start)
 
         # Pos is the first drawn frame.
         # clip_start_frame starts always less or equal to zero as this is
@@ -1137,21 +1231,15 @@ class TimeLineCanvas:
                     clip_bg_col = clip.color
                 elif clip.is_blanck_clip:
                     if clip.selected:
-                        grad = cairo.LinearGradient (0, y, 0, y + track_height)
-                        grad.add_color_stop_rgba(*BLANK_CLIP_COLOR_SELECTED_GRAD)
-                        grad.add_color_stop_rgba(*BLANK_CLIP_COLOR_SELECTED_GRAD_L)
+                        grad = _get_clip_gradient(BLANK_CLIP_COLOR_SELECTED_GRAD, BLANK_CLIP_COLOR_SELECTED_GRAD_L, y, track_height)
                         cr.set_source(grad)
                     else:
-                        grad = cairo.LinearGradient (0, y, 0, y + track_height)
-                        grad.add_color_stop_rgba(*BLANK_CLIP_COLOR_GRAD)
-                        grad.add_color_stop_rgba(*BLANK_CLIP_COLOR_GRAD_L)
+                        grad = _get_clip_gradient(BLANK_CLIP_COLOR_GRAD, BLANK_CLIP_COLOR_GRAD_L, y, track_height)
                         cr.set_source(grad)
                 elif track.type == sequence.VIDEO:
                     if clip.media_type == sequence.VIDEO:
                         if not clip.selected:
-                            grad = cairo.LinearGradient (0, y, 0, y + track_height)
-                            grad.add_color_stop_rgba(*CLIP_COLOR_GRAD)
-                            grad.add_color_stop_rgba(*CLIP_COLOR_GRAD_L)
+                            grad = _get_clip_gradient(CLIP_COLOR_GRAD, CLIP_COLOR_GRAD_L, y, track_height)
                             clip_bg_col = CLIP_COLOR_GRAD[1:4]
                             cr.set_source(grad)
                         else:
@@ -1159,9 +1247,7 @@ class TimeLineCanvas:
                             clip_bg_col = CLIP_SELECTED_COLOR
                     else: # IMAGE type
                         if not clip.selected:
-                            grad = cairo.LinearGradient (0, y, 0, y + track_height)
-                            grad.add_color_stop_rgba(*IMAGE_CLIP_COLOR_GRAD)
-                            grad.add_color_stop_rgba(*IMAGE_CLIP_COLOR_GRAD_L)
+                            grad = _get_clip_gradient(IMAGE_CLIP_COLOR_GRAD, IMAGE_CLIP_COLOR_GRAD_L, y, track_height)
                             clip_bg_col = IMAGE_CLIP_COLOR_GRAD[1:4]
                             cr.set_source(grad)
                         else:
@@ -1169,9 +1255,7 @@ class TimeLineCanvas:
                             clip_bg_col = IMAGE_CLIP_SELECTED_COLOR
                 else:
                     if not clip.selected:
-                        grad = cairo.LinearGradient (0, y, 0, y + track_height)
-                        grad.add_color_stop_rgba(*AUDIO_CLIP_COLOR_GRAD)
-                        grad.add_color_stop_rgba(*AUDIO_CLIP_COLOR_GRAD_L)
+                        grad = _get_clip_gradient(AUDIO_CLIP_COLOR_GRAD, AUDIO_CLIP_COLOR_GRAD_L, y, track_height)
                         clip_bg_col = AUDIO_CLIP_COLOR_GRAD[1:4]
                         cr.set_source(grad)
                     else:
@@ -1325,6 +1409,9 @@ class TimeLineCanvas:
                 self.sync_children.append((clip, track, scale_in))
 
             # Draw audio level data, except for IMAGE_SEQUENCE clips
+            # Levels data evicted from memory cache is released and needs to be got again
+            if clip.waveform_data != None and clip.waveform_data.released:
+                clip.waveform_data = None
             if clip.waveform_data == None and editorstate.display_all_audio_levels == True and clip.media_type != appconsts.IMAGE_SEQUENCE and clip.media_type != appconsts.PATTERN_PRODUCER:
                  clip.waveform_data = audiowaveformrenderer.get_waveform_data(clip)
                  
@@ -1340,16 +1427,14 @@ class TimeLineCanvas:
                     y_pad = WAVEFORM_PAD_SMALL
                     bar_height = WAVEFORM_HEIGHT_SMALL
                 
-                # Draw all frames only if pixels per frame > 2, otherwise
-                # draw only every other or fewer frames
-                draw_pix_per_frame = pix_per_frame
-                if draw_pix_per_frame < 2:
-                    draw_pix_per_frame = 2
-                    step = int(2 / pix_per_frame)
-                    if step < 1:
-                        step = 1
-                else:
-                    step = 1
+                # Draw peaks from pyramid level that has about one bucket per pixel,
+                # so that drawing cost depends on screen width and not on clip length
+                peaks = clip.waveform_data.get_peaks_level(1.0 / pix_per_frame)
+                bucket_size = peaks.bucket_size
+                bucket_width = bucket_size * pix_per_frame
+                draw_width = bucket_width
+                if draw_width < 1:
+                    draw_width = 1
 
                 # Draw only frames in display
                 draw_first = clip_in
@@ -1358,17 +1443,19 @@ class TimeLineCanvas:
                     draw_first = int(draw_first - clip_start_frame)
                 if draw_first + width_frames < draw_last:
                     draw_last = int(draw_first + width_frames) + 1
+                first_bucket = draw_first / bucket_size
+                last_bucket = min((draw_last - 1) / bucket_size + 1, len(peaks))
 
                 # Get media frame 0 position in screen pixels
                 media_start_pos_pix = scale_in - clip_in * pix_per_frame
                 
-                # Draw level bar for each frame in draw range
-                for f in range(draw_first, draw_last, step):
-                    x = media_start_pos_pix + f * pix_per_frame
-                    h = bar_height * clip.waveform_data[f]
+                # Draw level bar for each bucket in draw range
+                for b in range(first_bucket, last_bucket):
+                    x = media_start_pos_pix + b * bucket_width
+                    h = bar_height * peaks.get_max(b)
                     if h < 1:
                         h = 1
-                    cr.rectangle(x, y + y_pad + (bar_height - h), draw_pix_per_frame, h)
+                    cr.rectangle(x, y + y_pad + (bar_height - h), draw_width, h)
 
                 cr.fill()
 
@@ -1460,8 +1547,10 @@ class TimeLineCanvas:
             cr.set_source_rgb(*BG_COLOR)  
             cr.fill()
 
-    def draw_compositors(self, cr):
-        compositors = current_sequence().get_compositors()
+    def draw_compositors(self, cr, width):
+        # Only compositors overlapping displayed frames are drawn
+        last_frame = int(pos + width / pix_per_frame) + 1
+        compositors = current_sequence().get_compositors_in_range(int(pos), last_frame)
         for comp in compositors:
             # compositor clip and edge
             track = current_sequence().tracks[comp.transition.b_track]
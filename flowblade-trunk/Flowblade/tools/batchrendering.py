@@ -52,6 +52,7 @@ import mltfilters
 import persistance
 import respaths
 import renderconsumer
+import segmentrender
 import translations
 import utils
 
@@ -75,6 +76,7 @@ RENDERING = 1
 RENDERED = 2
 UNQUEUED = 3
 ABORTED = 4
+FAILED = 5
 
 render_queue = []
 batch_window = None
@@ -115,19 +117,16 @@ class QueueRunnerThread(threading.Thread):
 
             project = persistance.load_project(project_file_path, False)
 
-            producer = project.c_seq.tractor
             profile = mltprofiles.get_profile(render_item.render_data.profile_name)
-            consumer = renderconsumer.get_mlt_render_consumer(render_item.render_path, 
-                                                              profile,
-                                                              render_item.args_vals_list)
 
             # Get render range
             start_frame, end_frame, wait_for_stop_render = get_render_range(render_item)
             
-            # Create and launch render thread
+            # Create and launch render thread, renders in segments if set in preferences
             global render_thread 
-            render_thread = renderconsumer.FileRenderPlayer(None, producer, consumer, start_frame, end_frame) # None == file name not needed this time when using FileRenderPlayer because callsite keeps track of things
-            render_thread.wait_for_producer_end_stop = wait_for_stop_render
+            render_thread = segmentrender.get_render_player(project.c_seq, profile, render_item.render_path,
+                                                            render_item.args_vals_list, start_frame, end_frame,
+                                                            wait_for_stop_render)
             render_thread.start()
 
             # Set render start time and item state
@@ -163,8 +162,12 @@ class QueueRunnerThread(threading.Thread):
                     Gdk.threads_enter()
                     batch_window.render_progress_bar.set_fraction(1.0)
                     Gdk.threads_leave()
-                                    
-                    render_item.render_completed()
+
+                    render_error = segmentrender.get_render_error(render_thread)
+                    if render_error == None:
+                        render_item.render_completed()
+                    else:
+                        render_item.render_failed(render_error)
                 else:
                     time.sleep(0.33)
                     
@@ -543,6 +546,13 @@ class BatchRenderItemData:
         self.render_time = time.time() - self.start_time
         self.save()
     
+    def render_failed(self, render_error):
+        self.status = FAILED
+        self.render_this_item = False
+        self.render_time = -1
+        self.render_error = render_error
+        self.save()
+
     def render_aborted(self):
         self.status = ABORTED
         self.render_this_item = False
@@ -562,6 +572,8 @@ class BatchRenderItemData:
             return _("Finished")
         elif self.status == UNQUEUED:
             return _("Unqueued")
+        elif self.status == FAILED:
+            return _("Failed")
         else:
             return _("Aborted")
 
@@ -1012,6 +1024,11 @@ def show_render_properties_panel(render_item):
     vbox.pack_start(row6, False, False, 0)
     vbox.pack_start(row7, False, False, 0)
     vbox.pack_start(row8, False, False, 0)
+    if render_item.status == FAILED:
+        error_label = Gtk.Label(label=render_item.render_error)
+        error_label.set_line_wrap(True)
+        row9 = guiutils.get_two_column_box(guiutils.bold_label(_("Render Error:")), error_label, LEFT_WIDTH)
+        vbox.pack_start(row9, False, False, 0)
     vbox.pack_start(Gtk.Label(), True, True, 0)
 
     title = _("Render Properties")
@@ -1165,18 +1182,15 @@ class SingleRenderThread(threading.Thread):
 
         project = persistance.load_project(project_file_path, False)
 
-        producer = project.c_seq.tractor
         profile = mltprofiles.get_profile(render_item.render_data.profile_name)
-        consumer = renderconsumer.get_mlt_render_consumer(render_item.render_path, 
-                                                          profile,
-                                                          render_item.args_vals_list)
 
         # Get render range
         start_frame, end_frame, wait_for_stop_render = get_render_range(render_item)
         
-        # Create and launch render thread
-        render_thread = renderconsumer.FileRenderPlayer(None, producer, consumer, start_frame, end_frame) # None == file name not needed this time when using FileRenderPlayer because callsite keeps track of things
-        render_thread.wait_for_producer_end_stop = wait_for_stop_render
+        # Create and launch render thread, renders in segments if set in preferences
+        render_thread = segmentrender.get_render_player(project.c_seq, profile, render_item.render_path,
+                                                        render_item.args_vals_list, start_frame, end_frame,
+                                                        wait_for_stop_render)
         render_thread.start()
 
         # Set render start time and item state
@@ -1217,7 +1231,11 @@ class SingleRenderThread(threading.Thread):
         global single_render_thread
         single_render_thread = None
         # Update view for render end
-        GLib.idle_add(_single_render_shutdown)
+        render_error = segmentrender.get_render_error(render_thread)
+        if render_error == None:
+            GLib.idle_add(_single_render_shutdown)
+        else:
+            GLib.idle_add(_show_single_render_error, render_error)
                     
     def abort(self):
         self.running = False
@@ -1299,6 +1317,12 @@ class SingleRenderWindow:
 def _start_single_render_shutdown():
     single_render_thread.abort()
 
+def _show_single_render_error(render_error):
+    primary_txt = _("Timeline render failed")
+    secondary_txt = _("Rendered file may be missing or damaged.") + "\n\n" + textwrap.fill(render_error, 80)
+    dialogutils.warning_message_with_callback(primary_txt, secondary_txt, single_render_window.window, False,
+                                              lambda dialog, response_id: _single_render_shutdown())
+
 def _single_render_shutdown():
     Gtk.main_quit()
     
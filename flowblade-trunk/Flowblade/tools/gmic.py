@@ -28,7 +28,6 @@ import locale
 import mlt
 import numpy as np
 import os
-import re
 import shutil
 import subprocess
 import sys
@@ -58,6 +57,7 @@ import translations
 import threading
 import utils
 
+import gmicbatch
 import gmicplayer
 import gmicscript
 
@@ -66,6 +66,8 @@ MONITOR_HEIGHT = 300 # initial value, this gets changed when material is loaded
 CLIP_FRAMES_DIR = "/clip_frames"
 RENDER_FRAMES_DIR = "/render_frames"
 PREVIEW_FILE = "preview.png"
+SHM_DIR = "/dev/shm"
+PIPELINE_MAX_PENDING_FRAMES = 32 # decoded clip frames waiting for effect render
 NO_PREVIEW_FILE = "fallback_thumb.png"
 
 _session_id = None
@@ -174,7 +176,7 @@ def main(root_path, force_launch=False):
 
 def init_frames_dirs():
     os.mkdir(get_clip_frames_dir())
-    os.mkdir(get_render_frames_dir())
+    os.makedirs(get_render_frames_dir())
 
 #----------------------------------------------- session folders and files
 def get_session_folder():
@@ -183,7 +185,16 @@ def get_session_folder():
 def get_clip_frames_dir():
     return get_session_folder() + CLIP_FRAMES_DIR
 
+def get_shm_session_folder():
+    # Decoded clip frames are only kept until effect has been rendered for them,
+    # so they are written in shared memory file system if there is one.
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR + "/flowblade_gmic_session_" + str(_session_id)
+    return None
+
 def get_render_frames_dir():
+    if get_shm_session_folder() != None:
+        return get_shm_session_folder() + RENDER_FRAMES_DIR
     return get_session_folder() + RENDER_FRAMES_DIR
     
 def get_current_frame_file():
@@ -467,8 +478,10 @@ def _shutdown():
     if _effect_renderer != None:
         _effect_renderer.shutdown()
 
-    # Delete session folder
+    # Delete session folders
     shutil.rmtree(get_session_folder())
+    if get_shm_session_folder() != None and os.path.exists(get_shm_session_folder()):
+        shutil.rmtree(get_shm_session_folder())
     
     # Exit gtk main loop.
     Gtk.main_quit()
@@ -1028,30 +1041,22 @@ class GmicPreviewRendererer(threading.Thread):
         view_text = buf.get_text(buf.get_start_iter(), buf.get_end_iter(), False)
         Gdk.threads_leave()
         
-        script_str = "gmic " + get_current_frame_file() + " " + view_text + " -output " +  get_preview_file()
-
-        print "Render preview:", script_str
+        print "Render preview:", view_text
         
-        FLOG = open(utils.get_hidden_user_dir_path() + "log_gmic_preview", 'w')
-        p = subprocess.Popen(script_str, shell=True, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-        p.wait()
-        FLOG.close()
-     
-        # read log
-        f = open(utils.get_hidden_user_dir_path() + "log_gmic_preview", 'r')
-        out = f.read()
-        f.close()
+        batch_renderer = gmicbatch.GmicBatchRenderer(view_text, 1, 1)
+        batch_renderer.render_frames([(get_current_frame_file(), get_preview_file())])
+        out, returncode = batch_renderer.get_output()
 
         global _current_preview_surface
         _current_preview_surface = cairo.ImageSurface.create_from_png(get_preview_file())
 
         Gdk.threads_enter()
-        if p.returncode != 0:
+        if returncode != 0:
            _window.out_view.override_color((Gtk.StateFlags.NORMAL and Gtk.StateFlags.ACTIVE), Gdk.RGBA(red=1.0, green=0.0, blue=0.0))
         else:
             _window.out_view.override_color((Gtk.StateFlags.NORMAL and Gtk.StateFlags.ACTIVE), None)
             
-        _window.out_view.get_buffer().set_text(out + "Return code:" + str(p.returncode))
+        _window.out_view.get_buffer().set_text(out + "Return code:" + str(returncode))
 
         render_time = time.time() - start_time
         time_str = "{0:.2f}".format(round(render_time,2))
@@ -1070,6 +1075,7 @@ class GmicEffectRendererer(threading.Thread):
     def run(self):
         self.render_player = None
         self.frames_range_writer = None
+        self.batch_renderer = None
         
         self.abort = False
         
@@ -1102,7 +1108,7 @@ class GmicEffectRendererer(threading.Thread):
             file_path = os.path.join(folder, frame_file)
             os.remove(file_path)
         
-        # Render clipm frames for range
+        # Frames range
         mark_in = _player.producer.mark_in
         mark_out = _player.producer.mark_out
         self.length = mark_out - mark_in + 1
@@ -1112,74 +1118,43 @@ class GmicEffectRendererer(threading.Thread):
         frame_name = _window.frame_name.get_text()
         
         # jotain controllii frame_namelle
+        self.out_folder = out_folder
+        self.frame_name = frame_name
 
-        self.frames_range_writer = gmicplayer.FramesRangeWriter(_current_path, self.frames_update)
-        self.frames_range_writer.write_frames(get_render_frames_dir() + "/", frame_name, mark_in, mark_out)
-
-        if self.abort == True:
-            return
-        
-        # Render effect for frames
         # Get user script 
         Gdk.threads_enter()
         buf = _window.script_view.get_buffer()
         user_script = buf.get_text(buf.get_start_iter(), buf.get_end_iter(), False)
-        _window.render_percentage.set_markup("<small>" + _("Waiting for frames write to complete...") + "</small>")
         Gdk.threads_leave()
 
-        while len(os.listdir(folder)) != self.length:
-            time.sleep(0.5)
-            
-        clip_frames = os.listdir(folder)
-
-        frame_count = 1
-        for clip_frame in clip_frames:
-            if self.abort == True:
-                return
-            
-            update_info = "Rendering frame: " + str(frame_count) + "/" +  str(self.length)
-
-            Gdk.threads_enter()
-            _window.render_percentage.set_markup("<small>" + update_info + "</small>")
-            _window.render_progress_bar.set_fraction(float(frame_count)/float(self.length))
-            Gdk.threads_leave()
- 
-            file_numbers_list = re.findall(r'\d+', clip_frame)
-            filled_number_str = str(file_numbers_list[0]).zfill(3)
+        # Clip frames are decoded in this thread and each frame is given to effect render workers
+        # as soon as it has been written, rendered clip frames are deleted.
+        self.batch_renderer = gmicbatch.GmicBatchRenderer(user_script, self.length, remove_inputs=True, 
+                                                          max_pending_frames=PIPELINE_MAX_PENDING_FRAMES)
+        if self.abort == True:
+            return
+        self.batch_renderer.start()
 
-            clip_frame_path = os.path.join(folder, clip_frame)
-            rendered_file_path = out_folder + frame_name + "_" + filled_number_str + ".png"
-            
-            script_str = "gmic " + clip_frame_path + " " + user_script + " -output " +  rendered_file_path
+        self.frames_range_writer = gmicplayer.FramesRangeWriter(_current_path, self.clip_frame_written)
+        self.frames_range_writer.write_frames(get_render_frames_dir() + "/", frame_name, mark_in, mark_out)
 
-            if frame_count == 1: # first frame displays shell output and does error checking
-                FLOG = open(utils.get_hidden_user_dir_path() + "log_gmic_preview", 'w')
-                p = subprocess.Popen(script_str, shell=True, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-                p.wait()
-                FLOG.close()
-                
-                # read log
-                f = open(utils.get_hidden_user_dir_path() + "log_gmic_preview", 'r')
-                out = f.read()
-                f.close()
-                
-                Gdk.threads_enter()
-                _window.out_view.get_buffer().set_text(out + "Return code:" + str(p.returncode))
-                if p.returncode != 0:
-                    _window.out_view.override_color((Gtk.StateFlags.NORMAL and Gtk.StateFlags.ACTIVE), Gdk.RGBA(red=1.0, green=0.0, blue=0.0))
-                    _window.render_percentage.set_text(_("Render error!"))
-                    Gdk.threads_leave()
-                    return
-                else:
-                    _window.out_view.override_color((Gtk.StateFlags.NORMAL and Gtk.StateFlags.ACTIVE), None)
-                    Gdk.threads_leave()
-            else:
-                FLOG = open(utils.get_hidden_user_dir_path() + "log_gmic_preview", 'w')
-                p = subprocess.Popen(script_str, shell=True, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-                p.wait()
-                FLOG.close()
+        render_succeeded = self.batch_renderer.wait(self.effect_frames_update)
+        if self.abort == True:
+            return
 
-            frame_count = frame_count + 1
+        # Shell output is displayed for first frames chunk, or for the chunk that failed.
+        out, returncode = self.batch_renderer.get_output()
+        Gdk.threads_enter()
+        _window.out_view.get_buffer().set_text(out + "Return code:" + str(returncode))
+        if render_succeeded == False:
+            _window.out_view.override_color((Gtk.StateFlags.NORMAL and Gtk.StateFlags.ACTIVE), Gdk.RGBA(red=1.0, green=0.0, blue=0.0))
+            _window.render_percentage.set_text(_("Render error!"))
+            self.set_render_stopped_gui_state()
+            Gdk.threads_leave()
+            return
+        else:
+            _window.out_view.override_color((Gtk.StateFlags.NORMAL and Gtk.StateFlags.ACTIVE), None)
+            Gdk.threads_leave()
 
         # Render video
         if _window.encode_check.get_active() == True:
@@ -1199,7 +1174,7 @@ class GmicEffectRendererer(threading.Thread):
             resource_path = out_folder + "/" + resource_name_str
             producer = mlt.Producer(profile, str(resource_path))
 
-            self.render_player = renderconsumer.FileRenderPlayer("", producer, consumer, 0, len(clip_frames) - 1)
+            self.render_player = renderconsumer.FileRenderPlayer("", producer, consumer, 0, self.length - 1)
             self.render_player.wait_for_producer_end_stop = False
             self.render_player.start()
 
@@ -1223,17 +1198,29 @@ class GmicEffectRendererer(threading.Thread):
         self.set_render_stopped_gui_state()
         Gdk.threads_leave()
         
-    def frames_update(self, frame):
-        if frame - self.mark_in < 0:
-            frame = self.length # hack fix, producer suddenly changes the frame i thinks it is in
-        else:
-            frame = frame - self.mark_in # producer returns original clip frames
-        
-        update_info = "Writing clip frame: " + str(frame) + "/" +  str(self.length)
+    def clip_frame_written(self, frame_index, frame_path):
+        if self.batch_renderer.is_stopped():
+            self.frames_range_writer.shutdown() # render failed or was aborted
+            return
+
+        rendered_file_path = self.out_folder + self.frame_name + "_" + str(frame_index).zfill(4) + ".png"
+        self.batch_renderer.add_frame(frame_path, rendered_file_path) # blocks if effect render is behind
+
+        frames_done = self.batch_renderer.get_frames_done()
+        update_info = "Writing clip frame: " + str(frame_index + 1) + "/" +  str(self.length) + \
+                      ", rendering frame: " + str(frames_done) + "/" +  str(self.length)
+
+        Gdk.threads_enter()
+        _window.render_percentage.set_markup("<small>" + update_info + "</small>")
+        _window.render_progress_bar.set_fraction(float(frames_done)/float(self.length))
+        Gdk.threads_leave()
+
+    def effect_frames_update(self, frames_done, frames_count):
+        update_info = "Rendering frame: " + str(frames_done) + "/" +  str(frames_count)
 
         Gdk.threads_enter()
         _window.render_percentage.set_markup("<small>" + update_info + "</small>")
-        _window.render_progress_bar.set_fraction(float(frame + 1)/float(self.length))
+        _window.render_progress_bar.set_fraction(float(frames_done)/float(frames_count))
         Gdk.threads_leave()
 
     def abort_render(self):
@@ -1259,6 +1246,9 @@ class GmicEffectRendererer(threading.Thread):
     def shutdown(self):
         if self.frames_range_writer != None:
             self.frames_range_writer.shutdown()
+
+        if self.batch_renderer != None:
+            self.batch_renderer.abort()
         
         if self.render_player != None:
             self.render_player.shutdown()        
@@ -0,0 +1,246 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module applies G'MIC scripts to frame image files in batches.
+
+Frames are split into chunks and each chunk is processed by a single gmic process that
+loads, processes, writes and removes its frames one after another, so process start and
+G'MIC library initialization are done once per chunk instead of once per frame.
+Chunks are processed concurrently by a pool of worker threads, each running one gmic process at a time.
+
+Frames can be added while workers are running, so that effect rendering starts as soon as
+first input frames have been extracted from source clip.
+"""
+
+import multiprocessing
+import os
+import pipes
+import subprocess
+import threading
+import time
+
+CHUNK_SIZE = 8 # frames per gmic process
+PROGRESS_POLL_DELAY = 0.1
+
+
+class GmicBatchChunk:
+
+    def __init__(self, frames):
+        self.frames = frames # list of (input path, output path)
+        self.frames_done = 0
+        self.process = None
+        self.output = None
+        self.returncode = None
+
+
+class GmicBatchRenderer:
+    """
+    Applies script to (input path, output path) frames given to add_frame().
+
+    Script is given to shell as is, same way as when running gmic from command line.
+    If remove_inputs is True input files are deleted after their chunk has been rendered,
+    and add_frame() blocks while max_pending_frames frames are waiting to be rendered.
+    """
+    def __init__(self, script, frames_count, workers_count=None, remove_inputs=False, max_pending_frames=None):
+        if workers_count == None:
+            workers_count = get_cpu_count()
+        self.workers_count = max(1, min(workers_count, frames_count))
+
+        # Chunks are made smaller for short ranges so that all workers get something to do.
+        self.chunk_size = min(CHUNK_SIZE, max(1, -(-frames_count // self.workers_count)))
+        if max_pending_frames == None:
+            max_pending_frames = frames_count
+        self.max_pending_frames = max(max_pending_frames, self.chunk_size * self.workers_count)
+
+        self.script = script
+        self.frames_count = frames_count
+        self.remove_inputs = remove_inputs
+        self.pending_frames = [] # added frames not yet taken by a worker
+        self.rendering_frames_count = 0 # frames taken by workers and not yet done
+        self.added_frames_count = 0
+        self.input_done = (frames_count == 0)
+        self.chunks = []
+        self.aborted = False
+        self.failed_chunk = None
+        self.workers = []
+        self.start_time = None
+        self.lock = threading.Condition()
+
+    def render_frames(self, frames, frames_done_callback=None):
+        """
+        Renders list of frames and blocks until done. Returns True if all frames were rendered.
+        """
+        self.start()
+        for input_path, output_path in frames:
+            self.add_frame(input_path, output_path)
+        return self.wait(frames_done_callback)
+
+    def start(self):
+        self.start_time = time.time()
+        for i in range(0, self.workers_count):
+            worker = threading.Thread(target=self._worker_run)
+            worker.start()
+            self.workers.append(worker)
+
+    def add_frame(self, input_path, output_path):
+        """
+        Adds frame with complete input file to be rendered, after last frame is added input is done.
+        """
+        self.lock.acquire()
+        while self.is_stopped() == False \
+              and len(self.pending_frames) + self.rendering_frames_count >= self.max_pending_frames:
+            self.lock.wait()
+        self.pending_frames.append((input_path, output_path))
+        self.added_frames_count += 1
+        if self.added_frames_count >= self.frames_count:
+            self.input_done = True
+        self.lock.notify_all()
+        self.lock.release()
+
+    def wait(self, frames_done_callback=None):
+        """
+        Blocks until all frames are rendered, render fails or abort() is called.
+        Calls frames_done_callback(frames_done, frames_count) from this thread as frames
+        get written. Returns True if all frames were rendered.
+        """
+        last_done = -1
+        while len([w for w in self.workers if w.is_alive()]) > 0:
+            time.sleep(PROGRESS_POLL_DELAY)
+            frames_done = self.get_frames_done()
+            if frames_done != last_done and frames_done_callback != None:
+                frames_done_callback(frames_done, self.frames_count)
+                last_done = frames_done
+
+        for worker in self.workers:
+            worker.join()
+
+        return self.aborted == False and self.failed_chunk == None
+
+    def abort(self):
+        self.lock.acquire()
+        self.aborted = True
+        self._terminate_running()
+        self.lock.notify_all()
+        self.lock.release()
+
+    def get_output(self):
+        """
+        Returns shell output and return code of failed chunk, or of first chunk if render succeeded.
+        """
+        if self.failed_chunk != None:
+            chunk = self.failed_chunk
+        else:
+            chunk = self.chunks[0]
+        return (chunk.output, chunk.returncode)
+
+    def get_frames_done(self):
+        # gmic writes frames of a chunk in order, so checking next expected output file is enough.
+        self.lock.acquire()
+        frames_done = 0
+        for chunk in self.chunks:
+            while chunk.frames_done < len(chunk.frames) \
+                  and self._is_written(chunk.frames[chunk.frames_done][1]):
+                chunk.frames_done += 1
+            frames_done += chunk.frames_done
+        self.lock.release()
+        return frames_done
+
+    def is_stopped(self):
+        return self.aborted == True or self.failed_chunk != None
+
+    def _worker_run(self):
+        while True:
+            self.lock.acquire()
+            chunk = self._take_chunk()
+            if chunk == None:
+                self.lock.release()
+                return
+            # exec replaces shell with gmic, so that terminating process stops gmic.
+            chunk.process = subprocess.Popen("exec " + self._get_chunk_command(chunk), shell=True,
+                                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            self.lock.release()
+
+            chunk.output = chunk.process.communicate()[0]
+            chunk.returncode = chunk.process.returncode
+
+            if chunk.returncode == 0 and self.remove_inputs == True:
+                for input_path, output_path in chunk.frames:
+                    os.remove(input_path)
+
+            self.lock.acquire()
+            if chunk.returncode == 0:
+                chunk.frames_done = len(chunk.frames)
+            elif self.aborted == False and self.failed_chunk == None:
+                self.failed_chunk = chunk
+                self._terminate_running()
+            self.rendering_frames_count -= len(chunk.frames)
+            self.lock.notify_all()
+            self.lock.release()
+
+    def _take_chunk(self):
+        # Called holding lock. Waits until there are enough frames for a full chunk or input is done,
+        # returns None when there is nothing left to render.
+        while True:
+            if self.is_stopped():
+                return None
+            if len(self.pending_frames) >= self.chunk_size or (self.input_done and len(self.pending_frames) > 0):
+                break
+            if self.input_done:
+                return None
+            self.lock.wait()
+
+        chunk = GmicBatchChunk(self.pending_frames[0:self.chunk_size])
+        del self.pending_frames[0:self.chunk_size]
+        self.chunks.append(chunk)
+        self.rendering_frames_count += len(chunk.frames)
+        return chunk
+
+    def _get_chunk_command(self, chunk):
+        # Each frame gets its own image list, so script sees the same input as with one gmic process per frame.
+        command = "gmic"
+        for input_path, output_path in chunk.frames:
+            command += " -input " + pipes.quote(input_path) + " " + self.script \
+                        + " -output " + pipes.quote(output_path) + " -remove"
+        return command
+
+    def _terminate_running(self):
+        # Called holding lock. Processes are waited by worker threads, so they are not polled here.
+        for chunk in self.chunks:
+            if chunk.process != None and chunk.returncode == None:
+                try:
+                    chunk.process.terminate()
+                except OSError:
+                    pass # already exited
+
+    def _is_written(self, output_path):
+        # Output files left from earlier renders are older than this render.
+        try:
+            return os.path.getmtime(output_path) >= self.start_time - 1.0
+        except OSError:
+            return False
+
+
+# ------------------------------------------------ module funcs
+def get_cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
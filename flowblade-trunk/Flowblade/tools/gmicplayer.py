@@ -26,7 +26,6 @@ from gi.repository import Gdk
 
 import mlt
 import os
-import time
 
 import mltprofiles
 import utils
@@ -146,51 +145,42 @@ class PreviewFrameWriter:
         
         
 class FramesRangeWriter:
-
+    """
+    Writes frames range of clip as PPM image files one frame at a time and calls
+    callback(frame_index, frame_path) when each frame file is complete, so that frames
+    can be processed while later frames are still being decoded.
+    """
     def __init__(self, file_path, callback):
         self.producer = mlt.Producer(_current_profile, str(file_path))
         self.callback = callback
         self.running = True
 
     def write_frames(self, clip_folder, frame_name, mark_in, mark_out):
-        """
-        Writes thumbnail image from file producer
-        """
-        # Get data
-        render_path = clip_folder + frame_name + "_%04d." + "png"
+        size = (_current_profile.width(), _current_profile.height())
+        ppm_header = "P6\n" + str(size[0]) + " " + str(size[1]) + "\n255\n"
 
-        self.consumer = mlt.Consumer(_current_profile, "avformat", str(render_path))
-        self.consumer.set("real_time", -1)
-        self.consumer.set("rescale", "bicubic")
-        self.consumer.set("vcodec", "png")
-    
-        self.frame_producer = self.producer.cut(mark_in, mark_out)
+        print "Rendering frames range"
 
-        self.consumer.connect(self.frame_producer)
-        self.frame_producer.set_speed(0)
-        self.frame_producer.seek(0)
-        self.frame_producer.set_speed(1)
-        self.consumer.start()
+        for frame in range(mark_in, mark_out + 1):
+            if self.running == False: # set false at shutdown() for abort
+                return
 
-        print "Rendering frames range"
-                
-        while self.running: # set false at shutdown() for abort
-            if self.frame_producer.frame() >= mark_out:
-                
-                self.callback(self.frame_producer.frame() - mark_in)
-                time.sleep(2.0) # This seems enough, other methods produced bad waits
+            self.producer.seek(frame)
+            mlt_frame = self.producer.get_frame()
+            mlt_frame.set("consumer_deinterlace", 1)
+            mlt_frame.set("rescale.interp", "bicubic")
+            rgb = mlt_frame.get_image(mlt.mlt_image_rgb24, *size)
 
-                self.running = False
-            else:
-                self.callback(self.frame_producer.frame())
-                time.sleep(0.2)
-    
-    def shutdown(self):
-        if self.running == False:
-            return
+            frame_index = frame - mark_in
+            frame_path = clip_folder + frame_name + "_" + str(frame_index).zfill(4) + ".ppm"
+            frame_file = open(frame_path, "wb")
+            frame_file.write(ppm_header)
+            frame_file.write(rgb)
+            frame_file.close()
+
+            self.callback(frame_index, frame_path)
 
-        self.consumer.stop()
-        self.frame_producer.set_speed(0)
         self.running = False
-        
-        
+
+    def shutdown(self):
+        self.running = False
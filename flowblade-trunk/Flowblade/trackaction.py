@@ -30,6 +30,7 @@ import editorstate
 from editorstate import get_track
 from editorstate import current_sequence
 import tlinewidgets
+import undo
 import updater
 
 # --------------------------------------- menu events
@@ -44,11 +45,13 @@ def _track_menu_item_activated(widget, data):
 def lock_track(track_index):
     track = get_track(track_index)
     track.edit_freedom = appconsts.LOCKED
+    undo.project_changed()
     updater.repaint_tline()
 
 def unlock_track(track_index):
     track = get_track(track_index)
     track.edit_freedom = appconsts.FREE
+    undo.project_changed()
     updater.repaint_tline()
 
 def set_track_normal_height(track_index):
@@ -84,6 +87,7 @@ def set_track_small_height(track_index):
 def mute_track(track, new_mute_state):
     # NOTE: THIS IS A SAVED EDIT OF SEQUENCE, BUT IS NOT AN UNDOABLE EDIT
     current_sequence().set_track_mute_state(track.id, new_mute_state)
+    undo.project_changed()
     gui.tline_column.widget.queue_draw()
     
 def all_tracks_menu_launch_pressed(widget, event):
@@ -192,6 +196,7 @@ def track_center_pressed(data):
                     return 
             # Update track mute state
             current_sequence().set_track_mute_state(track.id, new_mute_state)
+            undo.project_changed()
             gui.tline_column.widget.queue_draw()
     
     if data.event.button == 3:
@@ -444,7 +444,7 @@ def one_roll_trim_undo_done(track, index, is_to_side_edit):
     Callback if initial edit done. Undo and redo do not cause this to be called
     """
     # reinit edit mode to correct side
-    frame = track.clip_start(index)
+    frame = track.clips_index.clip_start(index)
     success = set_oneroll_mode(track, frame, is_to_side_edit)
     if not success:
         set_no_edit_mode_func()
@@ -760,9 +760,9 @@ def _get_two_roll_first_and_last():
     
     index = edit_data["index"]
     track = edit_data["track_object"]
-    first = track.clip_start(index - 1) + 1
+    first = track.clips_index.clip_start(index - 1) + 1
     end_clip = track.clips[index]
-    last = track.clip_start(index) + end_clip.clip_out - end_clip.clip_in
+    last = track.clips_index.clip_start(index) + end_clip.clip_out - end_clip.clip_in
                  
     return (first, last)
 
@@ -831,7 +831,7 @@ def _set_slide_mode_edit_data(track, edit_frame):
     trim_limits = {}
     trim_limits["start_handle"] = clip.clip_in
     trim_limits["end_handle"] = clip.get_length() - clip.clip_out
-    trim_limits["clip_start"] = track.clip_start(index)
+    trim_limits["clip_start"] = track.clips_index.clip_start(index)
     trim_limits["media_length"] = clip.get_length()
 
     global edit_data
@@ -981,9 +981,9 @@ def _do_slide_edit():
 def _slide_trim_first_do_callback(track, clip, index, start_frame_being_viewed):
     # If in one roll mode, reinit edit mode to correct side
     if start_frame_being_viewed:
-        frame = track.clip_start(index) + 1 # +1 because cut frame selects previous clip
+        frame = track.clips_index.clip_start(index) + 1 # +1 because cut frame selects previous clip
     else:
-        frame = track.clip_start(index) + clip.clip_out - clip.clip_in - 1
+        frame = track.clips_index.clip_start(index) + clip.clip_out - clip.clip_in - 1
     set_slide_mode(track, frame)
 
 def slide_play_pressed():
@@ -22,6 +22,8 @@
 Module manages undo and redo stacks and executes edit actions from them
 on user requests.
 """
+import types
+
 import editorstate
 
 set_post_undo_redo_edit_mode = None # This is set at startup to avoid circular imports
@@ -30,6 +32,10 @@ repaint_tline = None
 # Max stack size
 MAX_UNDOS = 35
 
+# Incremented when edits are registered, undone or redone,
+# autosave uses this to skip saving when project has not changed.
+changes_count = 0
+
 # EditActions are placed in this stack after their do_edit()
 # method has been called
 undo_stack = []
@@ -75,11 +81,54 @@ def register_edit(undo_edit):
     # Add to stack and grow index
     undo_stack.append(undo_edit);
     index = index + 1
+    project_changed()
     
     save_item.set_sensitive(True) # Disabled at load and save, first edit enables
     undo_item.set_sensitive(True)
     redo_item.set_sensitive(False)
 
+def project_changed():
+    global changes_count
+    changes_count += 1
+
+def replace_objects(get_replacement):
+    """
+    Replaces objects referenced by edit actions in undo stack without undoing them.
+    get_replacement(obj) returns replacing object or None if obj is kept.
+
+    Used when clips are replaced outside of edits, e.g. when switching between
+    proxy and original media.
+    """
+    visited = set()
+    for edit_action in undo_stack:
+        _replace_in_value(edit_action, get_replacement, visited)
+
+def _replace_in_value(value, get_replacement, visited):
+    replacement = get_replacement(value)
+    if replacement != None:
+        return replacement
+
+    if id(value) in visited:
+        return value
+
+    # Only containers and old style class instances (edit actions and their data objects)
+    # are walked, MLT objects and GTK widgets are new style objects and are left as is.
+    if isinstance(value, list):
+        visited.add(id(value))
+        for i in range(0, len(value)):
+            value[i] = _replace_in_value(value[i], get_replacement, visited)
+    elif isinstance(value, dict):
+        visited.add(id(value))
+        for key in value.keys():
+            value[key] = _replace_in_value(value[key], get_replacement, visited)
+    elif isinstance(value, tuple):
+        return tuple([_replace_in_value(item, get_replacement, visited) for item in value])
+    elif isinstance(value, types.InstanceType):
+        visited.add(id(value))
+        _replace_in_value(value.__dict__, get_replacement, visited)
+
+    return value
+
 def do_undo_and_repaint(widget=None, data=None):
     do_undo()
     repaint_tline()
@@ -107,6 +156,7 @@ def do_undo():
     index = index - 1
     undo_edit = undo_stack[index]
     undo_edit.undo()
+    project_changed()
     
     if index == 0:
         undo_item.set_sensitive(False)
@@ -133,6 +183,7 @@ def do_redo():
     redo_edit = undo_stack[index]
     redo_edit.redo()
     index = index + 1
+    project_changed()
 
     if index == len(undo_stack):
         redo_item.set_sensitive(False)
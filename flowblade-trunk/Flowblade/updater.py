@@ -143,9 +143,18 @@ def repaint_tline():
     """
     Repaints timeline canvas and scale
     """
+    # Changes other then edits do not report which tracks need redrawing
+    if not tlinewidgets.edit_damage_pending():
+        tlinewidgets.damage_all_track_layers()
     gui.tline_canvas.widget.queue_draw()
     gui.tline_scale.widget.queue_draw()
 
+def damage_tline_tracks(track_ids):
+    """
+    Called after edits with ids of tracks that need to be redrawn.
+    """
+    tlinewidgets.edit_damage_reported(track_ids)
+
 # --- SCROLL AND LENGTH EVENTS
 def update_tline_scrollbar():
     """
@@ -443,7 +452,7 @@ def display_tline_cut_frame(track, index):
     if index > (len(track.clips) - 1):
         index = len(track.clips) - 1
     
-    clip_start_frame = track.clip_start(index)
+    clip_start_frame = track.clips_index.clip_start(index)
     PLAYER().seek_frame(clip_start_frame)
 
 def media_file_row_double_clicked(treeview, tree_path, col):